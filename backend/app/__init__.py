@@ -22,6 +22,15 @@ def create_app(config_class=Config):
     app.register_blueprint(api_bp)
 
     from app import models
+    from app.services.ingest_queue import ingest_queue
+    ingest_queue.init_app(app)
+    from app.services.interface_log_sink import interface_log_sink
+    interface_log_sink.init_app(app)
+    from app.services.interface_health import interface_health
+    interface_health.init_app(app)
+    from app.services.partition_service import partition_maintainer
+    partition_maintainer.init_app(app)
+
     from app import commands
     commands.register_commands(app)
     
@@ -1,6 +1,6 @@
 from . import bp
-from flask import jsonify, request
-from app.services import auxiliary_service
+from flask import jsonify, request, Response, stream_with_context
+from app.services import auxiliary_service, export_service
 from .auth import token_required
 
 #==============================================================================
@@ -86,8 +86,23 @@ def query_data_endpoint(current_user):
     """ 5.5.2.1 多条件查询 """
     query_params = request.json
     data = auxiliary_service.query_data(query_params)
+    if isinstance(data, dict) and 'error' in data:
+        return jsonify(data), 400
     return jsonify(data)
 
+@bp.route('/query/export', methods=['POST'])
+@token_required
+def export_query_endpoint(current_user):
+    """ 多条件查询结果流式导出 (format: csv / ndjson / parquet)，按时间升序导出全部匹配行 (/query 为倒序取最新) """
+    query_params = request.get_json(silent=True) or {}
+    fmt = request.args.get('format') or query_params.get('format', 'csv')
+    try:
+        chunks, mimetype, filename = export_service.stream_export(query_params, fmt)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
 @bp.route('/logs/system', methods=['GET'])
 @token_required
 def get_system_logs(current_user):
@@ -1,12 +1,36 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from . import bp
 from app.services import integration_service
+from app.services.ingest_queue import ingest_queue, IngestQueueFull
 from .auth import token_required
 
 #==============================================================================
 # 5.1 集成接口模块
 #==============================================================================
 
+def _async_requested():
+    """mode=async|sync 查询参数优先，否则取 INGEST_ASYNC_MODE 配置"""
+    mode = request.args.get('mode')
+    if mode:
+        return mode == 'async'
+    return current_app.config.get('INGEST_ASYNC_MODE', False)
+
+def _enqueue(kind, data):
+    """异步模式：校验后入队，返回 202 及批次号；队列满时返回 429"""
+    try:
+        batch = ingest_queue.submit(kind, data or {})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except IngestQueueFull as e:
+        response = jsonify({'status': 'error', 'message': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+    return jsonify({
+        'status': 'accepted',
+        'batch_id': batch['batch_id'],
+        'message': f"Queued {batch['rows']} {kind.upper()} rows."
+    }), 202
+
 @bp.route('/ingest/kj653', methods=['POST'])
 @token_required
 def ingest_kj653_data(current_user):
@@ -14,9 +38,16 @@ def ingest_kj653_data(current_user):
     5.1.1 (1) KJ653 煤矿顶板动态监测系统对接接口
     """
     data = request.json
-    success, message = integration_service.save_kj653_data(data)
+    if _async_requested():
+        return _enqueue('kj653', data)
+    success, message, stats = integration_service.save_kj653_data(data)
     if success:
-        return jsonify({'status': 'success', 'message': message}), 201
+        return jsonify({
+            'status': 'success',
+            'message': message,
+            'inserted': stats['inserted'],
+            'duplicates': stats['duplicates']
+        }), 201
     else:
         return jsonify({'status': 'error', 'message': message}), 500
 
@@ -27,12 +58,60 @@ def ingest_sos_data(current_user):
     5.1.1 (2) SOS 微震系统对接接口
     """
     data = request.json
-    success, message = integration_service.save_sos_data(data)
+    if _async_requested():
+        return _enqueue('sos', data)
+    success, message, stats = integration_service.save_sos_data(data)
     if success:
-        return jsonify({'status': 'success', 'message': message}), 201
+        return jsonify({
+            'status': 'success',
+            'message': message,
+            'inserted': stats['inserted'],
+            'duplicates': stats['duplicates']
+        }), 201
     else:
         return jsonify({'status': 'error', 'message': message}), 500
 
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+def _stream(kind):
+    """逐行读取请求体 (支持 chunked 传输)，分块写库并返回逐块进度"""
+    if request.mimetype not in NDJSON_MIMETYPES:
+        return jsonify({'status': 'error', 'message': 'Content-Type must be application/x-ndjson'}), 415
+    batch_size = request.args.get('batch_size', current_app.config.get('INGEST_STREAM_BATCH_SIZE', 5000), type=int)
+    success, message, result = integration_service.stream_ingest(kind, request.stream, max(1, batch_size))
+    # 失败前已提交的分块不回滚：status 为 partial，并给出已提交计数与续传行号
+    status = 'success' if success else 'partial' if result.get('partial') else 'error'
+    body = {'status': status, 'message': message}
+    body.update(result)
+    return jsonify(body), 201 if success else 400
+
+@bp.route('/ingest/kj653/stream', methods=['POST'])
+@token_required
+def ingest_kj653_stream(current_user):
+    """ KJ653 大批量回填 (NDJSON 流式) """
+    return _stream('kj653')
+
+@bp.route('/ingest/sos/stream', methods=['POST'])
+@token_required
+def ingest_sos_stream(current_user):
+    """ SOS 大批量回填 (NDJSON 流式) """
+    return _stream('sos')
+
+@bp.route('/ingest/batches/<batch_id>', methods=['GET'])
+@token_required
+def get_ingest_batch(current_user, batch_id):
+    """ 异步摄入批次状态 """
+    batch = ingest_queue.get_batch(batch_id)
+    if not batch:
+        return jsonify({'message': 'Batch not found'}), 404
+    return jsonify(batch)
+
+@bp.route('/ingest/queue/stats', methods=['GET'])
+@token_required
+def get_ingest_queue_stats(current_user):
+    """ 异步摄入队列深度与延迟计数器 """
+    return jsonify(ingest_queue.stats())
+
 @bp.route('/interfaces/status', methods=['GET'])
 @token_required
 def get_interface_status(current_user):
@@ -42,6 +121,14 @@ def get_interface_status(current_user):
     statuses = integration_service.get_all_interface_statuses()
     return jsonify(statuses)
 
+@bp.route('/interfaces/health', methods=['GET'])
+@token_required
+def get_interface_health(current_user):
+    """
+    接口健康详情 (最后成功/失败时间、滚动成功率、记录速率、数据滞后与同步成功率 KPI)
+    """
+    return jsonify(integration_service.get_interface_health())
+
 @bp.route('/interfaces/logs', methods=['GET'])
 @token_required
 def get_interface_logs(current_user):
@@ -1,15 +1,21 @@
 import datetime
+import json
 import pandas as pd
 import io
 from flask import request, jsonify
 from . import bp
 from .auth import token_required
 from app import db
+from sqlalchemy import select, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app.services import ingest_service, visualization_service
+from app.services.history_loader import parse_workbook, frame_to_columns
 from app.models import (
-    WorkingFace, DrillingSite, Borehole, BoreholeTrajectory,
+    WorkingFace, DrillingSite, Borehole, BoreholeTrajectory, FractureSegment,
     SupportPressureData, MicroseismicEvent, RoadwayDeformation,
     FractureConstructionData, SystemConfig, MonitoringStation,
-    InterfaceLog, AlarmRecord
+    InterfaceLog, AlarmRecord, AnchorBoltLoad, RockDisplacement
 )
 
 MODEL_MAP = {
@@ -17,9 +23,12 @@ MODEL_MAP = {
     'drilling-site': DrillingSite,
     'borehole': Borehole,
     'borehole-trajectory': BoreholeTrajectory,
+    'fracture-segment': FractureSegment,
     'support-pressure': SupportPressureData,
     'microseismic': MicroseismicEvent,
     'deformation': RoadwayDeformation,
+    'anchor-bolt-load': AnchorBoltLoad,
+    'rock-displacement': RockDisplacement,
     'fracture-construction': FractureConstructionData,
     'system-config': SystemConfig,
     'monitoring-station': MonitoringStation,
@@ -27,6 +36,16 @@ MODEL_MAP = {
     'alarm-record': AlarmRecord
 }
 
+# 写入后需使三维场景缓存失效的表
+SCENE_TABLES = {'drilling-site', 'borehole', 'borehole-trajectory'}
+
+# 可直接导入监测系统导出格式工作簿的表 -> history_loader 数据类型
+WORKBOOK_KINDS = {
+    'support-pressure': 'kj653',
+    'anchor-bolt-load': 'bolt',
+    'rock-displacement': 'rock'
+}
+
 def serialize_model(item):
     """通用序列化函数，处理 datetime 对象"""
     data = {}
@@ -38,6 +57,11 @@ def serialize_model(item):
             data[c.name] = value
     return data
 
+def touch_scene(table_name):
+    """钻场/钻孔/轨迹写入提交后更新场景版本戳"""
+    if table_name in SCENE_TABLES:
+        visualization_service.touch_drilling_version()
+
 def validate_data(model, data):
     """通用数据校验"""
     errors = []
@@ -58,9 +82,50 @@ def validate_data(model, data):
                 
     return errors
 
+# 列表接口中不作为字段过滤条件的参数
+LIST_CONTROL_PARAMS = {'page', 'per_page', 'after_id', 'before_id', 'count'}
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+class ExplainJSON(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) <查询>：随查询一同编译，过滤值以绑定参数传递 (不拼接进 SQL 文本)"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(ExplainJSON, 'postgresql')
+def _compile_explain(element, compiler, **kw):
+    return 'EXPLAIN (FORMAT JSON) ' + compiler.process(element.statement, **kw)
+
+def estimate_count(query):
+    """
+    估算查询结果行数。PostgreSQL 下读取 EXPLAIN 的规划器行数估计 (基于 ANALYZE 统计，分区表自动汇总各分区)，
+    不扫描数据；其他数据库退回精确 COUNT。
+    """
+    statement = query.order_by(None).statement
+    if db.engine.dialect.name != 'postgresql':
+        return db.session.execute(select(func.count()).select_from(statement.subquery())).scalar()
+    plan = db.session.execute(ExplainJSON(statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+def count_rows(query, mode):
+    if mode == 'none':
+        return None
+    if mode == 'estimate':
+        return estimate_count(query)
+    return query.order_by(None).count()
+
 @bp.route('/management/<table_name>', methods=['GET'])
 @token_required
 def get_data_list(current_user, table_name):
+    """
+    分页列表。默认按 page/per_page 偏移分页；传入 after_id / before_id 时按 id 游标 (keyset) 分页，
+    不产生 OFFSET 扫描：after_id 取该 id 之后 (更早) 的一页，before_id 取之前 (更新) 的一页。
+    count=estimate 时总数取规划器估计值，count=none 时不统计总数。
+    响应保留 items/total/page/pages，并附 next_after_id / prev_before_id 游标 (无更多数据时为 null)。
+    """
     model = MODEL_MAP.get(table_name)
     if not model:
         return jsonify({'message': 'Invalid table name'}), 404
@@ -68,32 +133,55 @@ def get_data_list(current_user, table_name):
     # Pagination
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    if per_page < 1:
+        per_page = 20
+    after_id = request.args.get('after_id', type=int)
+    before_id = request.args.get('before_id', type=int)
+    count_mode = request.args.get('count', 'exact')
+    if count_mode not in COUNT_MODES:
+        return jsonify({'message': f"count must be one of {', '.join(COUNT_MODES)}"}), 400
+    if after_id is not None and before_id is not None:
+        return jsonify({'message': 'after_id and before_id are mutually exclusive'}), 400
     
     # Basic filtering
     query = model.query
     for key, value in request.args.items():
-        if key in ['page', 'per_page']:
+        if key in LIST_CONTROL_PARAMS:
             continue
         if hasattr(model, key):
             query = query.filter(getattr(model, key) == value)
     
-    # Add default ordering if possible
-    if hasattr(model, 'id'):
-        query = query.order_by(model.id.desc())
-    elif hasattr(model, 'timestamp'):
-        query = query.order_by(model.timestamp.desc())
-    elif hasattr(model, 'record_time'):
-        query = query.order_by(model.record_time.desc())
-        
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    if after_id is None and before_id is None:
+        pagination = query.order_by(model.id.desc()).paginate(
+            page=page, per_page=per_page, error_out=False, count=False)
+        rows, page = pagination.items, pagination.page
+        has_newer = page > 1
+        has_older = len(rows) == per_page and query.filter(model.id < rows[-1].id).first() is not None
+    else:
+        # 多取一行判断是否还有下一页；before_id 方向按升序取出后翻转为降序
+        if after_id is not None:
+            rows = query.filter(model.id < after_id).order_by(model.id.desc()).limit(per_page + 1).all()
+            has_older, has_newer = len(rows) > per_page, True
+            rows = rows[:per_page]
+        else:
+            rows = query.filter(model.id > before_id).order_by(model.id.asc()).limit(per_page + 1).all()
+            has_newer, has_older = len(rows) > per_page, True
+            rows = rows[:per_page][::-1]
+        page = None
+        if not rows:
+            has_older = has_newer = False
     
-    items = [serialize_model(item) for item in pagination.items]
+    total = count_rows(query, count_mode)
+    pages = -(-total // per_page) if total is not None else None
+    items = [serialize_model(item) for item in rows]
     
     return jsonify({
         'items': items,
-        'total': pagination.total,
-        'page': pagination.page,
-        'pages': pagination.pages
+        'total': total,
+        'page': page,
+        'pages': pages,
+        'next_after_id': rows[-1].id if rows and has_older else None,
+        'prev_before_id': rows[0].id if rows and has_newer else None
     })
 
 @bp.route('/management/<table_name>', methods=['POST'])
@@ -128,6 +216,7 @@ def create_data(current_user, table_name):
         
         db.session.add(new_item)
         db.session.commit()
+        touch_scene(table_name)
         
         return jsonify(serialize_model(new_item)), 201
     except Exception as e:
@@ -165,6 +254,7 @@ def update_data(current_user, table_name, id):
                 setattr(item, key, value)
         
         db.session.commit()
+        touch_scene(table_name)
         return jsonify(serialize_model(item)), 200
     except Exception as e:
         db.session.rollback()
@@ -184,6 +274,7 @@ def delete_data(current_user, table_name, id):
     try:
         db.session.delete(item)
         db.session.commit()
+        touch_scene(table_name)
         return jsonify({'message': 'Deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -208,6 +299,7 @@ def bulk_delete_data(current_user, table_name):
     try:
         model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
         db.session.commit()
+        touch_scene(table_name)
         return jsonify({'message': f'Successfully deleted {len(ids)} items'}), 200
     except Exception as e:
         db.session.rollback()
@@ -235,6 +327,25 @@ def get_manageable_tables(current_user):
         })
     return jsonify(tables)
 
+def import_export_workbook(model, content, kind):
+    """
+    监测系统导出格式的工作簿：整表向量化解析后一次批量写入 (按自然键幂等)。
+    不是导出格式 (找不到表头行) 时返回 None，由通用逐行导入处理。
+    """
+    try:
+        df, _ = parse_workbook(io.BytesIO(content), kind)
+    except ValueError:
+        return None
+    stats = ingest_service.insert_columns(model, frame_to_columns(df), len(df))
+    db.session.commit()
+    return {
+        'message': 'Import completed',
+        'imported': stats['inserted'],
+        'duplicates': stats['duplicates'],
+        'failed': 0,
+        'errors': []
+    }
+
 @bp.route('/management/import/<table_name>', methods=['POST'])
 @token_required
 def import_data(current_user, table_name):
@@ -257,7 +368,12 @@ def import_data(current_user, table_name):
         if filename.endswith('.csv'):
             df = pd.read_csv(io.BytesIO(file.read()))
         elif filename.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(io.BytesIO(file.read()))
+            content = file.read()
+            if table_name in WORKBOOK_KINDS:
+                result = import_export_workbook(model, content, WORKBOOK_KINDS[table_name])
+                if result is not None:
+                    return jsonify(result), 200
+            df = pd.read_excel(io.BytesIO(content))
         else:
             return jsonify({'message': 'Unsupported file format'}), 400
             
@@ -298,6 +414,7 @@ def import_data(current_user, table_name):
                 errors.append({'row': index + 2, 'errors': [str(e)]})
         
         db.session.commit()
+        touch_scene(table_name)
         
         return jsonify({
             'message': 'Import completed',
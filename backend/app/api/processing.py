@@ -1,6 +1,7 @@
 from . import bp
 from flask import jsonify, request
-from app.services import processing_service
+from app import db
+from app.services import processing_service, trajectory_service, deviation_service, visualization_service
 from .auth import token_required
 
 #==============================================================================
@@ -50,3 +51,30 @@ def fuse_data_endpoint(current_user):
     
     fusion_result = processing_service.fuse_data(pressure, seismic, deformation)
     return jsonify(fusion_result)
+
+@bp.route('/processing/trajectories', methods=['POST'])
+@token_required
+def compute_trajectories_endpoint(current_user):
+    """
+    以最小曲率法由测斜数据重算钻孔轨迹坐标并写回，同时更新各钻孔相对设计线的最大 / 均方根偏差。
+    请求体可选 site_id 或 borehole_ids 限定范围，缺省为全部钻孔。
+    """
+    if current_user.role != 'ADMIN':
+        return jsonify({'message': 'Permission denied'}), 403
+    body = request.get_json(silent=True) or {}
+    borehole_ids = body.get('borehole_ids')
+    if borehole_ids is not None and not isinstance(borehole_ids, list):
+        return jsonify({'message': 'borehole_ids must be a list'}), 400
+    try:
+        stats = trajectory_service.compute_trajectories(site_id=body.get('site_id'), borehole_ids=borehole_ids)
+        deviation = deviation_service.analyze_deviation(site_id=body.get('site_id'), borehole_ids=borehole_ids, persist=True)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    visualization_service.touch_drilling_version()
+    stats['deviation'] = [
+        {k: b[k] for k in ('borehole_id', 'borehole_no', 'max_deviation', 'rms_deviation', 'within_tolerance')}
+        for b in deviation['boreholes']
+    ]
+    return jsonify(stats)
@@ -1,6 +1,6 @@
 from . import bp
-from flask import jsonify, request
-from app.services import visualization_service
+from flask import jsonify, request, Response
+from app.services import visualization_service, scene_binary
 from .auth import token_required
 
 #==============================================================================
@@ -10,9 +10,29 @@ from .auth import token_required
 @bp.route('/visualize/drilling_design', methods=['GET'])
 @token_required
 def get_drilling_design_data(current_user):
-    """ 5.3.1 压裂设计可视化 """
-    data = visualization_service.get_drilling_design_data()
-    return jsonify(data)
+    """
+    5.3.1 压裂设计可视化。
+    format=binary 或 Accept: application/octet-stream 时返回二进制轨迹 (见 scene_binary)，
+    客户端接受 gzip 时压缩传输。响应带 ETag (随钻场/钻孔/轨迹数据版本变化)，If-None-Match 命中时返回 304。
+    """
+    binary = request.args.get('format') == 'binary' or \
+        request.accept_mimetypes.best == scene_binary.MIMETYPE
+    fmt = 'binary' if binary else 'json'
+    version = visualization_service.drilling_version()
+    etag = visualization_service.drilling_scene_etag(version, fmt)
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        compress = 'gzip' in request.accept_encodings
+        payload = visualization_service.get_drilling_scene(fmt, version, compress)
+        response = Response(payload, mimetype=scene_binary.MIMETYPE if binary else 'application/json')
+        if compress:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['Vary'] = 'Accept, Accept-Encoding, Authorization'
+    return response
 
 @bp.route('/visualization/fracture-data/<int:borehole_id>', methods=['GET'])
 @token_required
@@ -21,11 +41,35 @@ def get_borehole_fracture_data(current_user, borehole_id):
     data = visualization_service.get_borehole_fracture_data(borehole_id)
     return jsonify(data)
 
+@bp.route('/visualization/fracture-segments', methods=['GET'])
+@token_required
+def get_fracture_segments(current_user):
+    """ 钻场 (site_id) 或工作面 (working_face_id) 下全部钻孔的压裂段位置，一次返回 """
+    data = visualization_service.get_fracture_segments(
+        request.args.get('site_id', type=int), request.args.get('working_face_id', type=int))
+    return jsonify(data)
+
+@bp.route('/visualization/trajectory-deviation', methods=['GET'])
+@token_required
+def get_trajectory_deviation(current_user):
+    """ 实钻轨迹相对设计线的偏差：可按 site_id 或 borehole_id (可重复) 过滤，数组与场景轨迹测点对应 """
+    borehole_ids = request.args.getlist('borehole_id', type=int) or None
+    data = visualization_service.get_trajectory_deviation(request.args.get('site_id', type=int), borehole_ids)
+    return jsonify(data)
+
 @bp.route('/visualization/microseismic-points', methods=['GET'])
 @token_required
 def get_microseismic_points(current_user):
-    """ 获取微震事件 3D 点数据 """
-    data = visualization_service.get_microseismic_points()
+    """
+    获取微震事件 3D 点数据。
+    空间筛选 (三选一)：bbox=xmin,ymin[,zmin],xmax,ymax[,zmax] | center=x,y,z&radius= | borehole_id=&distance=；
+    另可带 start、end、min_energy、limit。坐标为原始测量坐标 (E, N, Z)。
+    lod=auto|points|voxels (可带 voxel_size) 时按相机区域 bbox 分级返回原始点或体素聚合。
+    """
+    try:
+        data = visualization_service.get_microseismic_points(request.args.to_dict())
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     return jsonify(data)
 
 @bp.route('/dashboard/core_metrics', methods=['GET'])
@@ -47,7 +91,12 @@ def get_dashboard_fusion_score(current_user):
 def get_pressure_trends(current_user):
     """ 5.3.3 数据趋势图 - 矿压 """
     time_range = request.args.get('range', '24h')
-    data = visualization_service.get_pressure_trend_data(time_range)
+    try:
+        data = visualization_service.get_pressure_trend_data(
+            time_range, request.args.get('max_points', type=int), request.args.get('mode', 'lttb'),
+            request.args.get('station', type=int), request.args.get('support', type=int))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     return jsonify(data)
 
 @bp.route('/trends/microseismic_frequency', methods=['GET'])
@@ -55,7 +104,11 @@ def get_pressure_trends(current_user):
 def get_microseismic_frequency(current_user):
     """ 数据趋势图 - 微震频次 """
     time_range = request.args.get('range', '24h')
-    data = visualization_service.get_microseismic_frequency_data(time_range)
+    try:
+        data = visualization_service.get_microseismic_frequency_data(
+            time_range, request.args.get('max_points', type=int), request.args.get('mode', 'lttb'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     return jsonify(data)
 
 @bp.route('/trends/deformation', methods=['GET'])
@@ -63,5 +116,9 @@ def get_microseismic_frequency(current_user):
 def get_deformation_trends(current_user):
     """ 数据趋势图 - 巷道变形 """
     time_range = request.args.get('range', '24h')
-    data = visualization_service.get_deformation_trend_data(time_range)
+    try:
+        data = visualization_service.get_deformation_trend_data(
+            time_range, request.args.get('max_points', type=int), request.args.get('mode', 'lttb'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     return jsonify(data)
@@ -1,7 +1,13 @@
+import os
+import time
 import click
+import pandas as pd
 from app import db
 from app.models import User
 
+# cache-history --bench 中用于列裁剪测试的数值列
+HISTORY_VALUE_FIELDS = {"kj653": "p1", "bolt": "load", "rock": "separation", "sos": "energy"}
+
 def register_commands(app):
     @app.cli.command("create-admin")
     @click.argument("username")
@@ -29,3 +35,268 @@ def register_commands(app):
             db.session.add(user)
             db.session.commit()
             print("Default admin user 'admin' created successfully.")
+
+    @app.cli.command("load-history")
+    @click.argument("paths", nargs=-1, type=click.Path(exists=True))
+    @click.option("--kind", type=click.Choice(["kj653", "bolt", "rock", "sos", "all"]), default="kj653",
+                  help="Data kind: kj653 (矿压), bolt (锚杆索), rock (围岩移动), sos (微震) or all.")
+    @click.option("--workers", type=int, default=None, help="Parser processes (default: CPU count).")
+    @click.option("--force", is_flag=True, help="Reload files already recorded in the import manifest.")
+    def load_history(paths, kind, workers, force):
+        """Bulk-loads historical monitoring workbooks (default: database/<kind dir>)."""
+        from app.services.history_loader import HISTORY_KINDS, load_history, default_paths
+        if kind == "all" and paths:
+            raise click.UsageError("PATHS cannot be combined with --kind all.")
+        kinds = list(HISTORY_KINDS) if kind == "all" else [kind]
+
+        results = []
+        started = time.perf_counter()
+        for k in kinds:
+            results.extend(load_history(k, paths or default_paths(k, app.config['HISTORY_DATA_DIR']),
+                                        workers=workers, force=force,
+                                        cache_dir=app.config['PARQUET_CACHE_DIR']))
+        elapsed = time.perf_counter() - started
+
+        loaded = [r for r in results if 'error' not in r]
+        rows = sum(r['rows'] for r in loaded)
+        print(f"Loaded {len(loaded)} file(s), {sum(r['inserted'] for r in loaded)} of {rows} rows inserted"
+              f" in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s); {len(results) - len(loaded)} failed.")
+
+    @app.cli.command("cache-history")
+    @click.argument("paths", nargs=-1, type=click.Path(exists=True))
+    @click.option("--kind", type=click.Choice(["kj653", "bolt", "rock", "sos"]), default="kj653",
+                  help="Data kind of the workbooks.")
+    @click.option("--bench", is_flag=True, help="Compare cold xls parsing with cached Parquet reads.")
+    def cache_history(paths, kind, bench):
+        """Converts source workbooks to the Parquet cache (default: database/<kind dir>)."""
+        from app.services import parquet_cache
+        from app.services.history_loader import HISTORY_KINDS, find_workbooks, default_paths
+        if not parquet_cache.available():
+            raise click.ClickException("pyarrow is not installed.")
+        cache_dir = app.config['PARQUET_CACHE_DIR']
+        if not cache_dir:
+            raise click.ClickException("PARQUET_CACHE_DIR is not configured.")
+
+        for path in find_workbooks(paths or default_paths(kind, app.config['HISTORY_DATA_DIR'])):
+            name = os.path.basename(path)
+            if not bench:
+                started = time.perf_counter()
+                _, hit = parquet_cache.ensure_cached(path, kind, cache_dir)
+                print(f"{name}: {'up to date' if hit else 'converted'} ({time.perf_counter() - started:.2f}s).")
+                continue
+
+            # 典型分析读取：只取时间与第一个数值列，且只取最后 7 天
+            time_field = HISTORY_KINDS[kind]['time_field']
+            df, _ = parquet_cache.read_workbook(path, kind, cache_dir, columns=[time_field])
+            since = df[time_field].max() - pd.Timedelta(days=7)
+            value_field = HISTORY_VALUE_FIELDS[kind]
+            r = parquet_cache.benchmark(path, kind, cache_dir, columns=[time_field, value_field],
+                                        filters=[(time_field, '>=', since)])
+            print(f"{name}: {r['rows']} rows, xls {r['xls_parse'] * 1000:.0f} ms, "
+                  f"parquet {r['parquet_read'] * 1000:.1f} ms ({r['speedup']:.0f}x), "
+                  f"projected+filtered {r['parquet_projected'] * 1000:.1f} ms ({r['projected_rows']} rows).")
+
+    @app.cli.command("digitize-fracture")
+    @click.argument("root", required=False, type=click.Path(exists=True, file_okay=False))
+    @click.option("--calibration", type=click.Path(exists=True, dir_okay=False), default=None,
+                  help="Axis calibration JSON (default: ROOT/calibration.json).")
+    @click.option("--workers", type=int, default=None, help="Digitizer processes (default: CPU count).")
+    @click.option("--force", is_flag=True, help="Re-digitize images already recorded in the import manifest.")
+    def digitize_fracture(root, calibration, workers, force):
+        """Digitizes fracture pressure/flow curve images (default: database/流量/1-6号孔压裂曲线)."""
+        from app.services.fracture_digitizer import load_fracture_curves
+        root = root or os.path.join(app.config['HISTORY_DATA_DIR'], '流量', '1-6号孔压裂曲线')
+
+        started = time.perf_counter()
+        results = load_fracture_curves(root, calibration_path=calibration, workers=workers, force=force)
+        elapsed = time.perf_counter() - started
+
+        loaded = [r for r in results if 'error' not in r]
+        rows = sum(r['rows'] for r in loaded)
+        print(f"Digitized {len(loaded)} image(s), {rows} samples in {elapsed:.1f}s "
+              f"({rows / elapsed if elapsed > 0 else 0:.0f} rows/s); {len(results) - len(loaded)} failed.")
+
+    @app.cli.command("replay")
+    @click.option("--kind", type=click.Choice(["kj653", "sos", "all"]), default="all",
+                  help="Feeds to replay: kj653 (database/矿压), sos (database/微震) or all.")
+    @click.option("--speed", default="60", help="Time compression factor (1, 60, ...) or 'max' for no pacing.")
+    @click.option("--start", type=click.DateTime(), default=None, help="Replay window start (data time).")
+    @click.option("--end", type=click.DateTime(), default=None, help="Replay window end (data time).")
+    @click.option("--limit", type=int, default=None, help="Replay at most this many batches.")
+    @click.option("--mode", type=click.Choice(["sync", "async"]), default="sync", help="Ingest API mode.")
+    @click.option("--url", default=None, help="Replay against a running server (default: in-process). "
+                                                "Alarm latency needs INGEST_ALARM_CHECK=true on that server.")
+    @click.option("--token", default=None, help="API token for --url.")
+    @click.option("--user", default="admin", help="User to issue the in-process token for.")
+    @click.option("--report", type=click.Path(dir_okay=False, writable=True), default=None,
+                  help="Also write the report as JSON to this file.")
+    def replay(kind, speed, start, end, limit, mode, url, token, user, report):
+        """Replays historical KJ653/SOS exports through the ingest API on their original timeline."""
+        import json
+        from app.services import replay_service
+        if speed == "max":
+            factor = None
+        else:
+            try:
+                factor = float(speed)
+            except ValueError:
+                raise click.BadParameter("must be a number or 'max'.", param_hint="--speed")
+            if factor <= 0:
+                raise click.BadParameter("must be positive.", param_hint="--speed")
+
+        if url:
+            if not token:
+                raise click.UsageError("--token is required with --url.")
+            transport = replay_service.HttpTransport(url, token)
+        else:
+            try:
+                transport = replay_service.FlaskTransport(app, replay_service.issue_token(user))
+            except ValueError as e:
+                raise click.ClickException(str(e))
+
+        kinds = list(replay_service.REPLAY_KINDS) if kind == "all" else [kind]
+        timeline = replay_service.load_timeline(kinds, app.config['HISTORY_DATA_DIR'],
+                                                cache_dir=app.config['PARQUET_CACHE_DIR'], start=start, end=end)
+        if limit:
+            timeline = timeline[:limit]
+        if not timeline:
+            raise click.ClickException("No data in the selected window.")
+        print(f"Replaying {len(timeline)} batches ({sum(len(b.records) for b in timeline)} rows) "
+              f"from {timeline[0].time} to {timeline[-1].time} at {speed if factor is None else f'{factor:g}x'} speed, {mode} mode.")
+
+        r = replay_service.replay(timeline, transport, speed=factor, mode=mode)
+        print(f"Sent {r['rows']} rows in {r['batches']} requests over {r['elapsed']:.1f}s: "
+              f"{r['rows_per_sec']:.0f} rows/s, {r['batches_per_sec']:.1f} req/s, max lag {r['max_lag_ms']:.0f} ms.")
+        print(f"Request latency ms p50/p95/max: {r['request_ms']['p50']}/{r['request_ms']['p95']}/{r['request_ms']['max']}.")
+        print(f"Alarms: {r['alarms']} matched ({r['unmatched_alarms']} unmatched), ingest-to-alarm ms p50/p95/max: "
+              f"{r['alarm_latency_ms']['p50']}/{r['alarm_latency_ms']['p95']}/{r['alarm_latency_ms']['max']}.")
+        print(f"Errors: {r['errors']} (status counts {r['status_counts']}).")
+        for sample in r['error_samples']:
+            print(f"  {sample['time']} {sample['kind']}: {sample['status']} {sample['message']}")
+        if report:
+            with open(report, 'w', encoding='utf-8') as f:
+                json.dump(r, f, ensure_ascii=False, indent=2)
+
+    @app.cli.command("partitions")
+    @click.option("--months-ahead", type=int, default=None,
+                  help="Months of future partitions to create (default: PARTITION_MONTHS_AHEAD).")
+    @click.option("--drop-before", type=click.DateTime(), default=None,
+                  help="Retention: drop whole-month partitions older than this date's month.")
+    @click.option("--explain", is_flag=True, help="Check partition pruning of the main time-range queries.")
+    def partitions(months_ahead, drop_before, explain):
+        """Maintains monthly partitions of the time-series tables (PostgreSQL only)."""
+        from app.services import partition_service
+        if not partition_service.is_postgresql():
+            print("Database is not PostgreSQL; time-series tables are not partitioned.")
+            return
+
+        if months_ahead is None:
+            months_ahead = app.config['PARTITION_MONTHS_AHEAD']
+        created = partition_service.ensure_partitions(months_ahead)
+        print(f"Created {len(created)} partition(s){': ' + ', '.join(created) if created else '.'}")
+        if drop_before:
+            dropped = partition_service.drop_partitions_before(drop_before)
+            print(f"Dropped {len(dropped)} partition(s){': ' + ', '.join(dropped) if dropped else '.'}")
+
+        for table in partition_service.PARTITIONED_TABLES:
+            state = f"{len(partition_service.list_partitions(table))} partitions" \
+                if partition_service.is_partitioned(table) else "not partitioned (run flask db upgrade)"
+            print(f"{table}: {state}")
+
+        if explain:
+            for r in partition_service.explain_partition_pruning():
+                print(f"{r['name']}: scans {len(r['scanned'])}/{r['partitions']} partitions "
+                      f"({'pruned' if r['pruned'] else 'NOT pruned'}) {', '.join(r['scanned'])}")
+
+    @app.cli.command("rollup-backfill")
+    @click.option("--metric", type=click.Choice(["pressure", "seismic", "deformation", "all"]), default="all",
+                  help="Metric to rebuild.")
+    @click.option("--start", type=click.DateTime(), default=None, help="Rebuild window start (default: earliest data).")
+    @click.option("--end", type=click.DateTime(), default=None, help="Rebuild window end (default: latest data).")
+    def rollup_backfill(metric, start, end):
+        """Rebuilds the 1m/1h/1d rollups of the monitoring data from the raw tables."""
+        from app.services import rollup_service
+        metrics = list(rollup_service.ROLLUP_SPECS) if metric == "all" else [metric]
+        for name in metrics:
+            try:
+                stats = rollup_service.backfill(name, start, end)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            print(f"{name}: {stats['rows']} rows -> {stats['buckets']} buckets in {stats['elapsed']:.1f}s.")
+
+    @app.cli.command("bench-downsample")
+    @click.option("--points", type=int, default=1_000_000, help="Length of the synthetic series.")
+    @click.option("--max-points", type=int, default=1000, help="Downsampling target.")
+    @click.option("--repeat", type=int, default=5, help="Timed runs per mode.")
+    def bench_downsample(points, max_points, repeat):
+        """Benchmarks LTTB and min/max envelope downsampling of trend series."""
+        from app.services import downsample_service
+        for mode, r in downsample_service.benchmark(points, max_points, repeat).items():
+            print(f"{mode}: {r['points']} -> {r['output']} points, best {r['best_ms']:.1f} ms, "
+                  f"mean {r['mean_ms']:.1f} ms")
+
+    @app.cli.command("compute-trajectories")
+    @click.option("--site", "site_id", type=int, default=None, help="Only boreholes of this drilling site.")
+    @click.option("--borehole", "borehole_ids", type=int, multiple=True, help="Borehole id (repeatable).")
+    @click.option("--bench", type=int, default=0, help="Benchmark on this many synthetic survey stations instead.")
+    def compute_trajectories(site_id, borehole_ids, bench):
+        """Recomputes borehole trajectory coordinates from survey data (minimum curvature)."""
+        from app.services import trajectory_service, deviation_service, visualization_service
+        if bench:
+            r = trajectory_service.benchmark(stations=bench)
+            print(f"{r['stations']} stations / {r['boreholes']} boreholes: best {r['best_ms']:.1f} ms, "
+                  f"mean {r['mean_ms']:.1f} ms")
+            return
+        try:
+            stats = trajectory_service.compute_trajectories(site_id=site_id, borehole_ids=list(borehole_ids) or None)
+            deviation_service.analyze_deviation(site_id=site_id, borehole_ids=list(borehole_ids) or None, persist=True)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        visualization_service.touch_drilling_version()
+        print(f"{stats['stations']} stations in {stats['boreholes']} boreholes updated in {stats['elapsed']:.2f}s "
+              f"(minimum curvature {stats['compute_ms']:.1f} ms).")
+
+    @app.cli.command("trajectory-deviation")
+    @click.option("--site", "site_id", type=int, default=None, help="Only boreholes of this drilling site.")
+    @click.option("--borehole", "borehole_ids", type=int, multiple=True, help="Borehole id (repeatable).")
+    def trajectory_deviation(site_id, borehole_ids):
+        """Stores and reports max/RMS deviation of actual trajectories from the design line."""
+        from app.services import deviation_service, visualization_service
+        try:
+            result = deviation_service.analyze_deviation(site_id=site_id, borehole_ids=list(borehole_ids) or None,
+                                                         persist=True)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        visualization_service.touch_drilling_version()
+        failed = 0
+        for b in result["boreholes"]:
+            if b["max_deviation"] is None:
+                print(f"{b['borehole_no']}: no surveyed coordinates")
+                continue
+            failed += not b["within_tolerance"]
+            print(f"{b['borehole_no']}: {b['stations']} stations, max {b['max_deviation']:.3f} m, "
+                  f"rms {b['rms_deviation']:.3f} m, along-hole {b['max_along_offset']:.3f} m"
+                  f"{'' if b['within_tolerance'] else '  EXCEEDS'}")
+        print(f"{failed} of {len(result['boreholes'])} boreholes exceed ±{result['tolerance']} m.")
+
+    @app.cli.command("archive")
+    @click.option("--days", type=int, default=None,
+                  help="Archive rows older than this many days (default: ARCHIVE_RETENTION_DAYS).")
+    @click.option("--before", type=click.DateTime(), default=None, help="Archive rows older than this time.")
+    @click.option("--target", type=click.Choice(["pressure", "seismic", "deformation", "bolt", "rock_displacement",
+                                                 "all"]), default="all", help="Monitoring table to archive.")
+    def archive(days, before, target):
+        """Moves old monitoring rows into the Parquet cold archive and deletes them from the database."""
+        from datetime import datetime, timedelta
+        from app.services import archive_service
+        if before is None:
+            before = datetime.now() - timedelta(days=days if days is not None else app.config['ARCHIVE_RETENTION_DAYS'])
+        targets = archive_service.ARCHIVE_TARGETS if target == "all" else (target,)
+        for name, r in archive_service.archive_before(before, targets).items():
+            print(f"{name}: archived {r['rows']} rows in {r['months']} month(s); horizon {r['horizon']:%Y-%m-%d %H:%M:%S}.")
@@ -1,5 +1,7 @@
 from app import db
+import math
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(db.Model):
@@ -60,6 +62,8 @@ class Borehole(db.Model):
     azimuth = db.Column(db.Float, comment='设计方位角')
     dip_angle = db.Column(db.Float, comment='设计倾角')
     segments = db.Column(db.Integer, comment='计划压裂段数')
+    max_deviation = db.Column(db.Float, comment='实钻轨迹偏离设计线的最大距离(m)')
+    rms_deviation = db.Column(db.Float, comment='实钻轨迹偏离设计线的均方根距离(m)')
     trajectories = db.relationship('BoreholeTrajectory', backref='borehole', lazy='dynamic')
 
     def __repr__(self):
@@ -81,12 +85,31 @@ class BoreholeTrajectory(db.Model):
     def __repr__(self):
         return f'<BoreholeTrajectory {self.borehole_id} @ {self.measured_depth}m>'
 
+class FractureSegment(db.Model):
+    """压裂段位置 (沿测深的起止深度)"""
+    __tablename__ = 'fracture_segment'
+    __table_args__ = (
+        db.UniqueConstraint('borehole_id', 'segment_no', name='uq_fracture_segment_borehole_segment'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    borehole_id = db.Column(db.Integer, db.ForeignKey('borehole.id'), nullable=False, comment='所属钻孔ID')
+    segment_no = db.Column(db.Integer, nullable=False, comment='压裂段号')
+    start_depth = db.Column(db.Float, nullable=False, comment='起始测深(m)')
+    end_depth = db.Column(db.Float, nullable=False, comment='终止测深(m)')
+
+    def __repr__(self):
+        return f'<FractureSegment {self.borehole_id} Seg {self.segment_no} {self.start_depth}-{self.end_depth}m>'
+
 class SupportPressureData(db.Model):
     """支架压力数据 (KJ653)"""
     __tablename__ = 'support_pressure_data'
+    __table_args__ = (
+        db.UniqueConstraint('station_no', 'support_no', 'record_time', name='uq_support_pressure_data_natural_key'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    record_time = db.Column(db.DateTime, index=True, default=datetime.now, comment='记录时间')
-    station_no = db.Column(db.Integer, comment='测站号')
+    record_time = db.Column(db.DateTime, index=True, nullable=False, default=datetime.now, comment='记录时间')
+    # 自然键列：未上报测站号时记为 0，使重发的同一记录仍能按自然键去重
+    station_no = db.Column(db.Integer, nullable=False, default=0, server_default='0', comment='测站号 (未上报为 0)')
     support_no = db.Column(db.Integer, comment='支架号')
     position = db.Column(db.String(50), comment='位置')
     p1 = db.Column(db.Float, comment='压力P1(MPa)')
@@ -102,21 +125,77 @@ class SupportPressureData(db.Model):
 class MicroseismicEvent(db.Model):
     """微震事件数据 (SOS)"""
     __tablename__ = 'microseismic_event'
+    __table_args__ = (
+        # 坐标可能缺失 (NULL 不参与唯一性比较)，自然键使用非空的位置键
+        db.UniqueConstraint('event_time', 'location_key', name='uq_microseismic_event_natural_key'),
+        db.Index('ix_microseismic_event_grid', 'grid_cell', 'event_time'),
+    )
+    # 平面网格边长 (m)；修改后需重算 grid_cell
+    GRID_CELL_SIZE = 50.0
+    # 网格编号 = 列号 * GRID_SPAN + 行号 + GRID_SPAN // 2，同一列的网格编号连续
+    GRID_SPAN = 1 << 20
+
     id = db.Column(db.Integer, primary_key=True)
-    event_time = db.Column(db.DateTime, index=True, default=datetime.now, comment='事件时间')
+    event_time = db.Column(db.DateTime, index=True, nullable=False, default=datetime.now, comment='事件时间')
     coord_x = db.Column(db.Float, comment='X坐标')
     coord_y = db.Column(db.Float, comment='Y坐标')
     coord_z = db.Column(db.Float, comment='Z坐标')
     energy = db.Column(db.Float, comment='能量(J)')
+    grid_cell = db.Column(db.BigInteger, comment='平面网格编号(空间索引)')
+    location_key = db.Column(db.String(100), nullable=False, comment='位置键(自然键，坐标缺失为空)')
+
+    @classmethod
+    def grid_index(cls, x, y):
+        """坐标所在网格的 (列号, 行号)"""
+        return math.floor(x / cls.GRID_CELL_SIZE), math.floor(y / cls.GRID_CELL_SIZE)
+
+    @classmethod
+    def cell_id(cls, column, row):
+        return column * cls.GRID_SPAN + row + cls.GRID_SPAN // 2
+
+    @classmethod
+    def cell_of(cls, x, y):
+        if x is None or y is None:
+            return None
+        return cls.cell_id(*cls.grid_index(x, y))
+
+    @staticmethod
+    def location_of(x, y, z):
+        """
+        位置键 "x|y|z"：坐标按 PostgreSQL ROUND(x::numeric, 3) 的规则保留三位小数 (15 位有效数字、四舍五入)，
+        缺失为空串。迁移在数据库中以同样规则回填，重发的旧事件可命中自然键。
+        """
+        def text(v):
+            if v is None:
+                return ""
+            value = Decimal(f"{float(v):.15g}").quantize(Decimal("0.001"), rounding=ROUND_HALF_UP)
+            return str(value.copy_abs() if value == 0 else value)
+        return f"{text(x)}|{text(y)}|{text(z)}"
+
+    @classmethod
+    def derive_columns(cls, columns):
+        """按列批量写入前补齐派生列 (ingest_service.insert_columns 调用)"""
+        # 批次不含平面坐标时网格编号为空，不补列 (否则空列会使整批被截断)
+        if 'grid_cell' not in columns and 'coord_x' in columns and 'coord_y' in columns:
+            columns['grid_cell'] = [cls.cell_of(x, y) for x, y in zip(columns['coord_x'], columns['coord_y'])]
+        size = len(next(iter(columns.values())))
+        xs, ys, zs = (columns.get(name, [None] * size) for name in ('coord_x', 'coord_y', 'coord_z'))
+        columns['location_key'] = [cls.location_of(x, y, z) for x, y, z in zip(xs, ys, zs)]
 
     def __repr__(self):
         return f'<MicroseismicEvent {self.event_time} {self.energy}J>'
 
+@db.event.listens_for(MicroseismicEvent, 'before_insert')
+@db.event.listens_for(MicroseismicEvent, 'before_update')
+def _set_grid_cell(mapper, connection, target):
+    target.grid_cell = MicroseismicEvent.cell_of(target.coord_x, target.coord_y)
+    target.location_key = MicroseismicEvent.location_of(target.coord_x, target.coord_y, target.coord_z)
+
 class RoadwayDeformation(db.Model):
     """巷道变形数据"""
     __tablename__ = 'roadway_deformation'
     id = db.Column(db.Integer, primary_key=True)
-    record_time = db.Column(db.DateTime, index=True, default=datetime.now, comment='记录时间')
+    record_time = db.Column(db.DateTime, index=True, nullable=False, default=datetime.now, comment='记录时间')
     station_id = db.Column(db.String(100), comment='测站ID')
     top_bottom_deformation = db.Column(db.Float, comment='顶底板变形量(mm)')
     left_right_deformation = db.Column(db.Float, comment='两帮变形量(mm)')
@@ -129,7 +208,7 @@ class FractureConstructionData(db.Model):
     """压裂施工实时数据"""
     __tablename__ = 'fracture_construction_data'
     id = db.Column(db.Integer, primary_key=True)
-    record_time = db.Column(db.DateTime, index=True, default=datetime.now, comment='记录时间')
+    record_time = db.Column(db.DateTime, index=True, nullable=False, default=datetime.now, comment='记录时间')
     borehole_id = db.Column(db.Integer, db.ForeignKey('borehole.id'), nullable=False, comment='所属钻孔ID')
     segment_no = db.Column(db.Integer, comment='压裂段号')
     pressure = db.Column(db.Float, comment='施工压力(MPa)')
@@ -140,6 +219,43 @@ class FractureConstructionData(db.Model):
     def __repr__(self):
         return f'<FractureConstructionData {self.borehole_id} Seg {self.segment_no}>'
 
+class AnchorBoltLoad(db.Model):
+    """锚杆(索)受力数据"""
+    __tablename__ = 'anchor_bolt_load'
+    __table_args__ = (
+        db.UniqueConstraint('sensor_no', 'record_time', name='uq_anchor_bolt_load_natural_key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    record_time = db.Column(db.DateTime, index=True, default=datetime.now, comment='记录时间')
+    sensor_no = db.Column(db.Integer, index=True, comment='传感器编号')
+    sensor_type = db.Column(db.String(20), comment='传感器类型(锚杆/锚索)')
+    position = db.Column(db.String(50), comment='安装位置')
+    diameter = db.Column(db.Float, comment='传感器直径(mm)')
+    load = db.Column(db.Float, comment='应力值(kN)')
+    status = db.Column(db.String(50), comment='状态')
+
+    def __repr__(self):
+        return f'<AnchorBoltLoad {self.sensor_no} {self.load}kN>'
+
+class RockDisplacement(db.Model):
+    """围岩移动(顶板离层)数据"""
+    __tablename__ = 'rock_displacement'
+    __table_args__ = (
+        db.UniqueConstraint('sensor_no', 'record_time', name='uq_rock_displacement_natural_key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    record_time = db.Column(db.DateTime, index=True, default=datetime.now, comment='记录时间')
+    sensor_no = db.Column(db.Integer, index=True, comment='传感器编号')
+    position = db.Column(db.String(50), comment='安装位置')
+    deep_anchor_depth = db.Column(db.Float, comment='深基点深度(m)')
+    shallow_anchor_depth = db.Column(db.Float, comment='浅基点深度(m)')
+    deep_displacement = db.Column(db.Float, comment='深基点位移(mm)')
+    shallow_displacement = db.Column(db.Float, comment='浅基点位移(mm)')
+    separation = db.Column(db.Float, comment='离层量|深-浅|(mm)')
+
+    def __repr__(self):
+        return f'<RockDisplacement {self.sensor_no} {self.separation}mm>'
+
 class InterfaceLog(db.Model):
     """接口调用日志"""
     __tablename__ = 'interface_log'
@@ -196,3 +312,38 @@ class MonitoringStation(db.Model):
 
     def __repr__(self):
         return f'<MonitoringStation {self.station_id} ({self.type})>'
+
+class ImportManifest(db.Model):
+    """历史文件导入清单 (按文件内容哈希去重)"""
+    __tablename__ = 'import_manifest'
+    id = db.Column(db.Integer, primary_key=True)
+    file_hash = db.Column(db.String(64), unique=True, nullable=False, index=True, comment='文件SHA-256')
+    file_name = db.Column(db.String(255), nullable=False, comment='文件名')
+    data_type = db.Column(db.String(50), nullable=False, comment='数据类型(kj653/...)')
+    row_count = db.Column(db.Integer, comment='解析行数')
+    inserted_count = db.Column(db.Integer, comment='实际写入行数')
+    loaded_at = db.Column(db.DateTime, default=datetime.now, comment='导入时间')
+
+    def __repr__(self):
+        return f'<ImportManifest {self.file_name} {self.row_count} rows>'
+
+class MetricRollup(db.Model):
+    """监测数据时间聚合 (1分钟/1小时/1天，按支架、测站与工作面)"""
+    __tablename__ = 'metric_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('metric', 'resolution', 'scope', 'series_key', 'bucket_start', name='uq_metric_rollup_bucket'),
+        db.Index('ix_metric_rollup_lookup', 'metric', 'resolution', 'scope', 'bucket_start'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(20), nullable=False, comment='指标(pressure/seismic/deformation)')
+    resolution = db.Column(db.String(4), nullable=False, comment='粒度(1m/1h/1d)')
+    scope = db.Column(db.String(10), nullable=False, comment='聚合层级(support/station/face)')
+    series_key = db.Column(db.String(50), nullable=False, comment='序列标识(支架"测站-支架"、测站号，工作面为ALL)')
+    bucket_start = db.Column(db.DateTime, nullable=False, comment='时间桶起点')
+    sample_count = db.Column(db.Integer, nullable=False, default=0, comment='样本数')
+    value_sum = db.Column(db.Float, comment='数值和')
+    value_min = db.Column(db.Float, comment='最小值')
+    value_max = db.Column(db.Float, comment='最大值')
+
+    def __repr__(self):
+        return f'<MetricRollup {self.metric} {self.resolution} {self.series_key} @ {self.bucket_start}>'
@@ -0,0 +1,390 @@
+import glob
+import os
+import time
+from datetime import datetime
+import pandas as pd
+from flask import current_app
+from sqlalchemy import select, func
+from app import db
+from app.services import partition_service
+from app.services.auxiliary_service import QUERY_TARGETS, get_system_config, set_system_config
+from app.services.export_service import arrow_schema, rows_to_arrow
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 为可选依赖，缺失时不归档
+    pq = None
+
+#==============================================================================
+# 监测数据冷归档
+# 早于保留期的原始行按月写入 ZSTD 压缩的 Parquet (<归档目录>/<表>/month=YYYY-MM/part-*.parquet)，
+# 随后按主键从数据库删除已写入归档的行 (分区表整月清空后删除空分区)。
+# 每张表的归档水位 (horizon) 记录在 system_config：
+# 早于水位的数据在归档中。查询范围跨过水位时，读取按月目录裁剪，文件内按时间列的行组统计跳过无关数据，
+# 结果与数据库中的实时数据合并。
+# 归档文件先于 DELETE 提交落盘：两步之间中断时同一行既在归档又在库中，
+# 读取归档时剔除库中仍存在的 id (以库中为准)，合并结果不重复计数，下次归档再删除库中的行。
+# metric_rollup 不归档，趋势图不受影响；rollup-backfill 只读实时表，不应覆盖已归档的时间范围。
+#==============================================================================
+
+ARCHIVE_TARGETS = ("pressure", "seismic", "deformation", "bolt", "rock_displacement")
+HORIZON_KEY = "archive_horizon:{table}"
+ROW_GROUP_SIZE = 50000
+# 按主键删除已归档行时每条 DELETE 的 id 数
+DELETE_CHUNK = 10000
+COMPRESSION = "zstd"
+
+def _parse_time(value):
+    return datetime.fromisoformat(value) if value else None
+
+def available():
+    return pq is not None and bool(current_app.config.get('ARCHIVE_DIR'))
+
+def table_dir(table):
+    return os.path.join(current_app.config['ARCHIVE_DIR'], table.name)
+
+def month_dir(table, month):
+    return os.path.join(table_dir(table), f"month={month:%Y-%m}")
+
+def horizon(target):
+    """归档水位：早于该时间的数据已移入归档；未归档过时为 None"""
+    if target not in ARCHIVE_TARGETS:
+        return None
+    value = get_system_config(HORIZON_KEY.format(table=QUERY_TARGETS[target][0].__tablename__))
+    return datetime.fromisoformat(value) if value else None
+
+def covers(target, start=None):
+    """查询范围是否需要读取归档"""
+    mark = horizon(target)
+    return mark is not None and available() and (start is None or start < mark)
+
+def archive_months(target, start=None, end=None):
+    """
+    与 [start, end] 相交的归档月份 (按月目录裁剪)。
+
+    Returns:
+        list: [(月份, [文件路径])]，按月份升序。
+    """
+    table = QUERY_TARGETS[target][0].__table__
+    months = []
+    for path in sorted(glob.glob(os.path.join(table_dir(table), "month=*"))):
+        month = datetime.strptime(os.path.basename(path)[len("month="):], "%Y-%m")
+        if (start is not None and partition_service.add_months(month, 1) <= start) or (end is not None and month > end):
+            continue
+        files = sorted(glob.glob(os.path.join(path, "*.parquet")))
+        if files:
+            months.append((month, files))
+    return months
+
+PARQUET_OPERATORS = {"eq": "==", "ne": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "in": "in"}
+
+def _parquet_filters(time_field, start, end, filters, include_start=True, include_end=True):
+    """时间范围与 query_data 的 filters -> pyarrow 谓词 (用于行组统计裁剪)"""
+    predicates = []
+    if start is not None:
+        predicates.append((time_field, ">=" if include_start else ">", start))
+    if end is not None:
+        predicates.append((time_field, "<=" if include_end else "<", end))
+    for name, condition in (filters or {}).items():
+        if not isinstance(condition, dict):
+            condition = {"in" if isinstance(condition, list) else "eq": condition}
+        for op, value in condition.items():
+            if op not in PARQUET_OPERATORS:
+                raise ValueError(f"Unknown filter operator: {op}")
+            if isinstance(value, str) and name == time_field:
+                value = datetime.fromisoformat(value)
+            predicates.append((name, PARQUET_OPERATORS[op], value))
+    return predicates
+
+def _drop_live(table, time_field, frame):
+    """剔除库中仍存在的行 (归档写入后、删除提交前中断留下的副本)"""
+    if frame.empty:
+        return frame
+    time_col = table.c[time_field]
+    # 已归档时段的库中行只有迟到数据与中断残留，按归档行的时间跨度查询即可
+    live = db.session.execute(select(table.c.id).where(
+        time_col >= frame[time_field].min().to_pydatetime(),
+        time_col <= frame[time_field].max().to_pydatetime())).scalars().all()
+    return frame[~frame["id"].isin(live)] if live else frame
+
+def read_archive(target, start=None, end=None, columns=None, filters=None, include_start=True, include_end=True,
+                 newest=None):
+    """
+    读取归档中 [start, end] 范围的行 (不含库中仍存在的行，见 _drop_live)。
+
+    Args:
+        newest: 只需最新的若干行时指定，从最近的月份向前读取，够数即停。
+
+    Returns:
+        pd.DataFrame: 按时间升序；无归档文件时为空表 (列为 columns)。
+    """
+    model, time_field = QUERY_TARGETS[target]
+    table = model.__table__
+    columns = columns or [c.name for c in table.columns]
+    for name in columns:
+        if name not in table.c:
+            raise ValueError(f"Unknown field: {name}")
+    read_columns = list(dict.fromkeys(columns + [time_field, "id"]))
+    predicates = _parquet_filters(time_field, start, end, filters, include_start, include_end) or None
+    schema = arrow_schema(table)
+
+    months = archive_months(target, start, end)
+    frames, count = [], 0
+    for _, files in (reversed(months) if newest else months):
+        frame = pq.read_table(files, columns=read_columns, schema=schema, filters=predicates).to_pandas()
+        frame = _drop_live(table, time_field, frame)
+        frames.append(frame)
+        count += len(frame)
+        if newest and count >= newest:
+            break
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    data = pd.concat(frames, ignore_index=True).sort_values(time_field, kind="stable")
+    if newest:
+        data = data.tail(newest)
+    return data[columns].reset_index(drop=True)
+
+def _python_type(column):
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+def iter_archive_rows(target, start=None, end=None, filters=None, batch_size=ROW_GROUP_SIZE):
+    """
+    按月升序分批产出归档中 [start, end] 的整行 (列序同表，按时间与 id 排序)，
+    每次只载入一个月，供流式导出在实时数据之前输出。
+    """
+    model, time_field = QUERY_TARGETS[target]
+    for month, _ in archive_months(target, start, end):
+        next_month = partition_service.add_months(month, 1)
+        lower = month if start is None else max(start, month)
+        upper, include_end = (end, True) if end is not None and end < next_month else (next_month, False)
+        frame = read_archive(target, lower, upper, None, filters, include_end=include_end)
+        frame = frame.sort_values([time_field, "id"], kind="stable")
+        # 含空值的整数列读出为 float，还原为整数，与实时部分一致
+        for column in model.__table__.columns:
+            if _python_type(column) is int:
+                frame[column.name] = frame[column.name].astype("Int64")
+        rows = list(_plain_frame(frame).itertuples(index=False, name=None))
+        for i in range(0, len(rows), batch_size):
+            yield rows[i:i + batch_size]
+
+def _plain_frame(frame):
+    """DataFrame 中的 NaN/NaT 转为 None，便于序列化"""
+    return frame.astype(object).where(frame.notna(), None)
+
+def merge_records(target, params, live):
+    """
+    query_data 整行结果与归档合并：按时间倒序取前 limit 行。
+    实时结果已满 limit 且最早一行不早于水位时，归档中不会有更新的行，直接返回。
+    """
+    time_field = QUERY_TARGETS[target][1]
+    limit = params.get('limit', 100)
+    mark = horizon(target)
+    if len(live) >= limit and live and datetime.fromisoformat(live[-1][time_field]) >= mark:
+        return live
+    frame = read_archive(target, _parse_time(params.get('start_time')), _parse_time(params.get('end_time')),
+                         None, params.get('filters'), newest=limit)
+    archived = _plain_frame(frame).to_dict("records")
+    for row in archived:
+        for key, value in row.items():
+            if isinstance(value, datetime):
+                row[key] = value.isoformat()
+            elif hasattr(value, "item"):
+                row[key] = value.item()
+    merged = sorted(live + archived, key=lambda r: datetime.fromisoformat(r[time_field]), reverse=True)
+    return merged[:limit]
+
+def merge_select(target, params, columns, rows):
+    """
+    投影 / 时间桶聚合结果与归档合并。实时部分由 build_select_statement(partial=True) 产生：
+    投影带 _time 列用于排序；avg 带 _n_<字段> 非空计数，用于按样本数加权合并跨水位的桶。
+
+    Returns:
+        tuple: (列名, 行列表)
+    """
+    from app.services.auxiliary_service import parse_group_by, parse_aggregates
+    time_field = QUERY_TARGETS[target][1]
+    limit = params.get('limit', 100)
+    start, end = _parse_time(params.get('start_time')), _parse_time(params.get('end_time'))
+    live = pd.DataFrame([tuple(r) for r in rows], columns=columns)
+
+    if not params.get('group_by'):
+        fields = list(params.get('fields') or [])
+        archived = read_archive(target, start, end, list(dict.fromkeys(fields + [time_field])),
+                                params.get('filters'), newest=limit)
+        archived = archived.assign(_time=archived[time_field])[columns]
+        frames = [df for df in (live, archived) if not df.empty]
+        merged = pd.concat(frames, ignore_index=True) if frames else live
+        merged = merged.sort_values("_time", ascending=False, kind="stable").head(limit)
+        return columns, list(_plain_frame(merged).itertuples(index=False, name=None))
+
+    seconds, group_fields = parse_group_by(params)
+    outputs = parse_aggregates(params)
+    value_fields = [name for _, name, _ in outputs if name is not None]
+    raw = read_archive(target, start, end, list(dict.fromkeys(group_fields + value_fields + [time_field])),
+                       params.get('filters'))
+    if raw.empty:
+        return columns, rows
+    keys = ["bucket"] + group_fields
+    raw["bucket"] = pd.to_datetime(raw[time_field]).dt.floor(f"{seconds}s")
+    grouped = raw.groupby(keys, dropna=False)
+    part = {}
+    for label, name, agg in outputs:
+        if name is None:
+            part[label] = grouped.size()
+        elif agg == "sum":
+            part[label] = grouped[name].sum(min_count=1)
+        else:
+            part[label] = grouped[name].agg({"avg": "mean"}.get(agg, agg))
+        if agg == "avg":
+            part[f"_n_{name}"] = grouped[name].count()
+    archived = pd.DataFrame(part).reset_index()
+    live["bucket"] = pd.to_datetime(live["bucket"])
+
+    merged = pd.concat([df for df in (archived, live) if not df.empty], ignore_index=True)
+    for label, name, agg in outputs:
+        if agg == "avg":
+            merged[f"_w_{label}"] = merged[label].fillna(0) * merged[f"_n_{name}"]
+    grouped = merged.groupby(keys, dropna=False)
+    combined = {}
+    for label, name, agg in outputs:
+        if agg in ("min", "max"):
+            combined[label] = grouped[label].agg(agg)
+        elif agg in ("sum", "count"):
+            combined[label] = grouped[label].sum(min_count=1)
+        else:
+            weight = grouped[f"_n_{name}"].sum()
+            combined[label] = grouped[f"_w_{label}"].sum() / weight.where(weight > 0)
+        if agg == "avg":
+            combined[f"_n_{name}"] = grouped[f"_n_{name}"].sum()
+    result = pd.DataFrame(combined).reset_index().sort_values(keys, kind="stable").head(limit)
+    return columns, list(_plain_frame(result[columns]).itertuples(index=False, name=None))
+
+def _archived_ids(table, month):
+    files = glob.glob(os.path.join(month_dir(table, month), "*.parquet"))
+    if not files:
+        return set()
+    return set(pq.read_table(files, columns=["id"]).column("id").to_pylist())
+
+def _write_month(table, time_col, month, upper, batch_size):
+    """
+    将 [month, upper) 的行写为一个归档文件 (先写临时文件再改名)。
+    已在归档中的 id 跳过，中断后重跑不会产生重复行。
+
+    Returns:
+        tuple: (写入的行数, 该月归档中的全部 id)。
+    """
+    stmt = select(table).where(time_col >= month, time_col < upper).order_by(time_col, table.c.id)
+    archived = _archived_ids(table, month)
+    schema = arrow_schema(table)
+    directory = month_dir(table, month)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".part-{os.getpid()}-{time.time_ns()}.tmp")
+    written, first_id, last_id = 0, None, None
+    writer = None
+    try:
+        result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+        for rows in result.partitions():
+            rows = [r for r in rows if r.id not in archived]
+            if not rows:
+                continue
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, schema, compression=COMPRESSION)
+            writer.write_table(rows_to_arrow(table, schema, rows))
+            written += len(rows)
+            ids = [r.id for r in rows]
+            archived.update(ids)
+            first_id = min(ids) if first_id is None else min(first_id, min(ids))
+            last_id = max(ids) if last_id is None else max(last_id, max(ids))
+    except Exception:
+        if writer is not None:
+            writer.close()
+            os.remove(tmp_path)
+        raise
+    if writer is not None:
+        writer.close()
+    if written:
+        os.replace(tmp_path, os.path.join(directory, f"part-{first_id}-{last_id}.parquet"))
+    return written, archived
+
+def _delete_archived(table, time_col, month, upper, ids):
+    """
+    只删除已写入归档的行 (按主键)，读取之后才提交到该时段的迟到数据保留在库中，
+    由下次归档写入。
+
+    Returns:
+        bool: 该时段已无剩余行。
+    """
+    window = (time_col >= month, time_col < upper)
+    ids = sorted(ids)
+    for i in range(0, len(ids), DELETE_CHUNK):
+        db.session.execute(table.delete().where(*window, table.c.id.in_(ids[i:i + DELETE_CHUNK])))
+    return not db.session.execute(select(table.c.id).where(*window).limit(1)).first()
+
+def _raise_horizon(target, mark):
+    """水位只前移不后退"""
+    current = horizon(target)
+    if current is None or mark > current:
+        set_system_config(HORIZON_KEY.format(table=QUERY_TARGETS[target][0].__tablename__), mark.isoformat(),
+                          "冷归档水位 (早于该时间的数据在 Parquet 归档中)")
+
+def archive_before(cutoff, targets=ARCHIVE_TARGETS, batch_size=ROW_GROUP_SIZE, echo=print):
+    """
+    归档并删除早于 cutoff 的原始行，逐月提交。
+
+    Returns:
+        dict: {target: {"rows", "months", "horizon"}}
+    """
+    if pq is None:
+        raise RuntimeError("Archiving requires pyarrow")
+    if not current_app.config.get('ARCHIVE_DIR'):
+        raise RuntimeError("ARCHIVE_DIR is not configured")
+    report = {}
+    for target in targets:
+        model, time_name = QUERY_TARGETS[target]
+        table = model.__table__
+        time_col = table.c[time_name]
+        rows = months = 0
+        first = db.session.execute(select(func.min(time_col)).where(time_col < cutoff)).scalar()
+        month = partition_service.month_start(first) if first else cutoff
+        while month < cutoff:
+            next_month = partition_service.add_months(month, 1)
+            upper = min(next_month, cutoff)
+            written, ids = _write_month(table, time_col, month, upper, batch_size)
+            emptied = _delete_archived(table, time_col, month, upper, ids)
+            if emptied and next_month <= cutoff and partition_service.is_partitioned(table.name):
+                # 整月已全部归档且无迟到数据：移除空的月分区
+                partition_service.drop_month_partition(table.name, month)
+            _raise_horizon(target, upper)
+            db.session.commit()
+            if written:
+                rows += written
+                months += 1
+                echo(f"{table.name} {month:%Y-%m}: archived {written} rows.")
+            month = next_month
+        _raise_horizon(target, cutoff)
+        db.session.commit()
+        report[target] = {"rows": rows, "months": months, "horizon": horizon(target)}
+    return report
+
+def window_mean(target, field, start, end, include_start=True, include_end=True):
+    """
+    时间窗口内某列的均值，窗口跨过归档水位时合并归档与实时数据。
+
+    Returns:
+        float | None: 无数据时为 None。
+    """
+    model, time_name = QUERY_TARGETS[target]
+    column = getattr(model, field)
+    time_col = getattr(model, time_name)
+    total, count = db.session.query(func.sum(column), func.count(column)).filter(
+        time_col >= start if include_start else time_col > start,
+        time_col <= end if include_end else time_col < end).one()
+    total, count = float(total or 0), int(count or 0)
+    if covers(target, start):
+        values = read_archive(target, start, end, [field], None, include_start, include_end)[field].dropna()
+        total += float(values.sum())
+        count += len(values)
+    return total / count if count else None
@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta
+from decimal import Decimal
 import random
+from sqlalchemy import select, func, cast
 from app import db, socketio
-from app.models import AlarmRecord, SupportPressureData, MicroseismicEvent, RoadwayDeformation, FractureConstructionData, SystemConfig
+from app.models import AlarmRecord, SupportPressureData, MicroseismicEvent, RoadwayDeformation, FractureConstructionData, SystemConfig, AnchorBoltLoad, RockDisplacement
 
 def get_system_config(key, default=None):
     """获取单个配置项"""
@@ -36,6 +38,15 @@ def check_and_trigger_alarms(data_type, value, threshold_red, threshold_yellow,
     检查数值是否超过阈值，并触发报警记录。
     如果提供了 sid，则仅向该会话发送；否则全局广播。
     """
+    alarm_data = trigger_alarm(data_type, value, threshold_red, threshold_yellow, sid=sid)
+    if alarm_data:
+        return True, alarm_data["level"]
+    return False, None
+
+def trigger_alarm(data_type, value, threshold_red, threshold_yellow, sid=None):
+    """
+    同 check_and_trigger_alarms，返回已推送的报警数据 dict；未超限或写入失败时返回 None。
+    """
     level = None
     msg = ""
     
@@ -75,12 +86,39 @@ def check_and_trigger_alarms(data_type, value, threshold_red, threshold_yellow,
             else:
                 socketio.emit('new_alarm', alarm_data)
             
-            return True, level
+            return alarm_data
         except Exception as e:
             db.session.rollback()
             print(f"FAILED TO TRIGGER ALARM: {e}")
             
-    return False, None
+    return None
+
+# 摄入类型 -> (报警类型, 参与判定的数值列)
+INGEST_ALARM_FIELDS = {
+    "kj653": ("pressure", ("p1", "p2", "p3")),
+    "sos": ("seismic", ("energy",))
+}
+
+def batch_alarm_value(kind, columns):
+    """摄入批次 (按列) 中参与报警判定的最大值，无有效数值时返回 None"""
+    _, fields = INGEST_ALARM_FIELDS[kind]
+    values = [float(v) for f in fields for v in columns.get(f, ()) if v is not None]
+    return max(values, default=None)
+
+def check_ingest_alarms(kind, value):
+    """
+    摄入数据的实时报警判定：每个批次取最大值与阈值比较，至多产生一条报警，避免报警风暴。
+    调用方须已提交摄入事务。
+
+    Returns:
+        list: 产生的报警数据 (0 或 1 条)。
+    """
+    if value is None:
+        return []
+    data_type, _ = INGEST_ALARM_FIELDS[kind]
+    config = get_alarm_configs()[data_type]
+    alarm = trigger_alarm(data_type, value, config["red"], config["yellow"])
+    return [alarm] if alarm else []
 
 def get_alarm_configs():
     """
@@ -120,55 +158,237 @@ def get_alarm_history(limit=50):
         } for r in records
     ]
 
+# 查询目标 -> (模型类, 时间字段名)
+QUERY_TARGETS = {
+    "pressure": (SupportPressureData, "record_time"),
+    "seismic": (MicroseismicEvent, "event_time"),
+    "deformation": (RoadwayDeformation, "record_time"),
+    "bolt": (AnchorBoltLoad, "record_time"),
+    "rock_displacement": (RockDisplacement, "record_time"),
+    "fracture": (FractureConstructionData, "record_time"),
+    "alarm": (AlarmRecord, "timestamp")
+}
+
+# 过滤运算符与聚合函数 (query_data 的 filters / aggregates)
+FILTER_OPERATORS = {
+    "eq": lambda col, v: col == v,
+    "ne": lambda col, v: col != v,
+    "gt": lambda col, v: col > v,
+    "gte": lambda col, v: col >= v,
+    "lt": lambda col, v: col < v,
+    "lte": lambda col, v: col <= v,
+    "in": lambda col, v: col.in_(v)
+}
+QUERY_AGGREGATES = {"min": func.min, "max": func.max, "avg": func.avg, "sum": func.sum, "count": func.count}
+BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def _table_column(table, name):
+    if name not in table.c:
+        raise ValueError(f"Unknown field: {name}")
+    return table.c[name]
+
+def _coerce(column, value):
+    """时间列的字符串条件按 ISO 时间解析"""
+    if isinstance(value, list):
+        return [_coerce(column, v) for v in value]
+    if isinstance(value, str) and column.type.python_type is datetime:
+        return datetime.fromisoformat(value)
+    return value
+
+def compile_filters(table, filters):
+    """
+    filters -> WHERE 条件列表。
+    {"station_no": 1} 为等值；{"p1": {"gte": 30, "lt": 45}} 使用运算符 (eq/ne/gt/gte/lt/lte/in)。
+
+    Raises:
+        ValueError: 字段或运算符无效。
+    """
+    clauses = []
+    for name, condition in (filters or {}).items():
+        column = _table_column(table, name)
+        if not isinstance(condition, dict):
+            condition = {"in" if isinstance(condition, list) else "eq": condition}
+        for op, value in condition.items():
+            if op not in FILTER_OPERATORS:
+                raise ValueError(f"Unknown filter operator: {op}")
+            clauses.append(FILTER_OPERATORS[op](column, _coerce(column, value)))
+    return clauses
+
+def parse_bucket(spec):
+    """时间桶宽度 ('15m'/'1h'/'1d') -> 秒"""
+    try:
+        seconds = int(spec[:-1]) * BUCKET_UNITS[spec[-1].lower()]
+    except (TypeError, ValueError, KeyError, IndexError):
+        seconds = 0
+    if seconds <= 0:
+        raise ValueError(f"Invalid time bucket: {spec}")
+    return seconds
+
+def time_bucket(column, seconds):
+    """时间列向下取整到 seconds 宽的桶 (按 Unix 纪元对齐，与数据库方言无关的结果)"""
+    if db.engine.dialect.name == "postgresql":
+        epoch = func.floor(func.extract("epoch", column) / seconds) * seconds
+        return func.timezone("UTC", func.to_timestamp(epoch))
+    epoch = (cast(func.strftime("%s", column), db.Integer) // seconds) * seconds
+    return func.datetime(epoch, "unixepoch")
+
+def build_data_query(target, start_time=None, end_time=None, limit=100, filters=None):
+    """
+    构建 query_data 的查询 (时间条件直接作用于时间列，分区表可在规划期裁剪)。
+
+    Returns:
+        tuple: (Query, 时间列)；target 无效时 Query 为 None。
+    """
+    if target not in QUERY_TARGETS:
+        return None, None
+    model_class, time_field_name = QUERY_TARGETS[target]
+    query = model_class.query
+    
+    # 时间过滤
+    time_field = getattr(model_class, time_field_name)
+    if start_time:
+        query = query.filter(time_field >= datetime.fromisoformat(start_time))
+    if end_time:
+        query = query.filter(time_field <= datetime.fromisoformat(end_time))
+    for clause in compile_filters(model_class.__table__, filters):
+        query = query.filter(clause)
+    return query.order_by(time_field.desc()).limit(limit), time_field
+
+def parse_group_by(params):
+    """group_by: "1d" 或 {"time": "1d", "fields": ["station_no"]} -> (桶宽秒数, 分组字段)"""
+    group_by = params.get('group_by')
+    if isinstance(group_by, str):
+        group_by = {"time": group_by}
+    return parse_bucket(group_by.get("time", "1d")), list(group_by.get("fields", []))
+
+def parse_aggregates(params):
+    """
+    aggregates: {"p1": ["max", "avg"], "*": ["count"]}，缺省为 count。
+
+    Returns:
+        list: [(输出列名, 字段名 (行计数为 None), 聚合函数名)]
+    """
+    outputs = []
+    for name, aggregates in (params.get('aggregates') or {"*": ["count"]}).items():
+        for agg in ([aggregates] if isinstance(aggregates, str) else aggregates):
+            if agg not in QUERY_AGGREGATES or (name == "*" and agg != "count"):
+                raise ValueError(f"Invalid aggregate: {name} {agg}")
+            outputs.append(("count", None, agg) if name == "*" else (f"{name}_{agg}", name, agg))
+    return outputs
+
+def build_select_statement(target, params, partial=False):
+    """
+    将 fields 投影或 group_by 时间桶聚合编译为一条 SELECT。
+
+    partial=True 时附加以下划线开头的辅助列，供与冷归档数据合并：
+    投影附加时间列 _time，avg 聚合附加非空计数 _n_<字段>。
+
+    Returns:
+        Select: 结果列依次为输出列 (及辅助列)。
+    """
+    query, time_field = build_data_query(target, params.get('start_time'), params.get('end_time'),
+                                         params.get('limit', 100), params.get('filters'))
+    table = QUERY_TARGETS[target][0].__table__
+    where = query.statement.whereclause
+    if not params.get('group_by'):
+        columns = [_table_column(table, name) for name in params.get('fields') or []]
+        if partial:
+            columns.append(table.c[time_field.key].label("_time"))
+        stmt = select(*columns).select_from(table)
+        if where is not None:
+            stmt = stmt.where(where)
+        return stmt.order_by(time_field.desc()).limit(params.get('limit', 100))
+
+    seconds, group_fields = parse_group_by(params)
+    bucket = time_bucket(table.c[time_field.key], seconds).label("bucket")
+    keys = [bucket] + [_table_column(table, name) for name in group_fields]
+    outputs = []
+    for label, name, agg in parse_aggregates(params):
+        column = None if name is None else _table_column(table, name)
+        outputs.append((QUERY_AGGREGATES[agg]() if column is None else QUERY_AGGREGATES[agg](column)).label(label))
+        if partial and agg == "avg":
+            outputs.append(func.count(column).label(f"_n_{name}"))
+    stmt = select(*keys, *outputs).select_from(table)
+    if where is not None:
+        stmt = stmt.where(where)
+    return stmt.group_by(*keys).order_by(*keys).limit(params.get('limit', 100))
+
+def _json_value(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "item"):
+        # numpy 标量 (与冷归档合并后的结果)
+        return _json_value(value.item())
+    return value
+
+def _parse_time(value):
+    return datetime.fromisoformat(value) if value else None
+
 def query_data(params):
     """
     通用多维数据查询服务。
     params: {
-        "target": "pressure" | "seismic" | "deformation" | "fracture" | "alarm",
+        "target": "pressure" | "seismic" | "deformation" | "bolt" | "rock_displacement" | "fracture" | "alarm",
         "start_time": iso_str,
         "end_time": iso_str,
-        "filters": { "key": "value" },
+        "filters": { "key": "value" } | { "key": {"gte": 1, "lt": 2} },
+        "fields": ["record_time", "p1"],
+        "group_by": "1d" | { "time": "1d", "fields": ["station_no"] },
+        "aggregates": { "p1": ["max", "avg"], "*": ["count"] },
         "limit": int
     }
+    未指定 fields/group_by 时返回整行列表；否则过滤、投影与聚合编译为一条 SQL 在数据库执行，
+    返回列式结果 {"columns": [...], "data": {列名: [值, ...]}, "count": 行数}。
+    查询范围早于冷归档水位时，透明合并归档中的数据。
     """
+    from app.services import archive_service
+
     target = params.get('target')
-    start_time = params.get('start_time')
-    end_time = params.get('end_time')
-    limit = params.get('limit', 100)
-    
-    # 映射目标到模型类和时间字段名
-    mapping = {
-        "pressure": (SupportPressureData, "record_time"),
-        "seismic": (MicroseismicEvent, "event_time"),
-        "deformation": (RoadwayDeformation, "record_time"),
-        "fracture": (FractureConstructionData, "record_time"),
-        "alarm": (AlarmRecord, "timestamp")
-    }
-    
-    if target not in mapping:
+    if target not in QUERY_TARGETS:
         return {"error": f"Invalid query target: {target}"}
+
+    try:
+        archived = archive_service.covers(target, _parse_time(params.get('start_time')))
+        if params.get('fields') or params.get('group_by'):
+            result = db.session.execute(build_select_statement(target, params, partial=archived))
+            columns = list(result.keys())
+            rows = result.all()
+            if archived:
+                columns, rows = archive_service.merge_select(target, params, columns, rows)
+            bucketed = bool(params.get('group_by'))
+            visible = [i for i, name in enumerate(columns) if not name.startswith("_")]
+            data = {columns[i]: [] for i in visible}
+            for row in rows:
+                for i in visible:
+                    value = row[i]
+                    # SQLite 的时间桶表达式返回字符串
+                    if bucketed and columns[i] == "bucket" and isinstance(value, str):
+                        value = datetime.fromisoformat(value)
+                    data[columns[i]].append(_json_value(value))
+            return {"columns": list(data), "data": data, "count": len(rows)}
+
+        query, _ = build_data_query(target, params.get('start_time'), params.get('end_time'),
+                                    params.get('limit', 100), params.get('filters'))
         
-    model_class, time_field_name = mapping[target]
-    query = model_class.query
-    
-    # 时间过滤
-    time_field = getattr(model_class, time_field_name)
-    if start_time:
-        query = query.filter(time_field >= datetime.fromisoformat(start_time))
-    if end_time:
-        query = query.filter(time_field <= datetime.fromisoformat(end_time))
+        # 执行查询
+        records = query.all()
         
-    # 执行查询
-    records = query.order_by(time_field.desc()).limit(limit).all()
-    
-    # 简单序列化
-    results = []
-    for r in records:
-        data = {c.name: getattr(r, c.name) for c in r.__table__.columns}
-        for k, v in data.items():
-            if isinstance(v, datetime):
-                data[k] = v.isoformat()
-        results.append(data)
+        # 简单序列化
+        results = []
+        for r in records:
+            data = {c.name: getattr(r, c.name) for c in r.__table__.columns}
+            for k, v in data.items():
+                if isinstance(v, datetime):
+                    data[k] = v.isoformat()
+            results.append(data)
+        if archived:
+            results = archive_service.merge_records(target, params, results)
+    except ValueError as e:
+        return {"error": str(e)}
         
     return results
 
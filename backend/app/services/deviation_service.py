@@ -0,0 +1,156 @@
+import numpy as np
+from flask import current_app
+from sqlalchemy import bindparam
+from app import db
+from app.models import DrillingSite, Borehole, BoreholeTrajectory
+from app.services.trajectory_service import direction_vectors
+
+#==============================================================================
+# 设计轨迹与实钻轨迹偏差分析
+# 设计线自钻场坐标 (孔口) 起，沿钻孔设计倾角 / 方位角延伸 (与前端设计轨迹一致)。
+# 对每个实钻测点 p，设孔口 c、设计方向单位向量 d、测深 md：
+#   沿孔投影 along = (p - c)·d，垂向偏差 perpendicular = |p - c - along·d|，
+#   沿孔偏差 along_offset = along - md (正值表示实际位置比设计同测深处更靠前)。
+# 所有钻孔的测点一次查询后整体向量化计算，按钻孔以 reduceat / bincount 汇总最大值与均方根。
+# 每个钻孔的偏差数组与三维场景轨迹缓冲区 (按测深排序的全部测点) 一一对应，
+# 坐标缺失的测点为 None，前端可直接按下标着色。
+#==============================================================================
+
+def deviation_offsets(points, collars, dip, azimuth, measured_depth):
+    """
+    测点相对设计线的垂向与沿孔偏差。
+
+    Args:
+        points (np.ndarray): (n, 3) 实钻测点坐标 (E, N, Z)。
+        collars (np.ndarray): (n, 3) 各测点所属钻孔的孔口坐标。
+        dip, azimuth (np.ndarray): (n,) 所属钻孔的设计倾角与方位角 (度)。
+        measured_depth (np.ndarray): (n,) 测深。
+
+    Returns:
+        tuple: (perpendicular, along_offset)，均为 (n,)
+    """
+    d = direction_vectors(dip, azimuth)
+    v = np.asarray(points, dtype=float) - np.asarray(collars, dtype=float)
+    along = np.einsum('ij,ij->i', v, d)
+    perpendicular = np.linalg.norm(v - along[:, None] * d, axis=1)
+    return perpendicular, along - np.asarray(measured_depth, dtype=float)
+
+def group_statistics(values, group):
+    """
+    按连续分组汇总 NaN 以外的值。
+
+    Returns:
+        tuple: (分组标识, 有效点数, 最大值, 均方根)；无有效点的组最大值与均方根为 NaN
+    """
+    values = np.asarray(values, dtype=float)
+    group = np.asarray(group)
+    if not len(values):
+        return group[:0], np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    labels = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(values)]))
+    valid = ~np.isnan(values)
+    counts = np.bincount(labels, weights=valid, minlength=len(starts)).astype(np.int64)
+    squares = np.bincount(labels, weights=np.where(valid, values, 0.0) ** 2, minlength=len(starts))
+    peaks = np.fmax.reduceat(values, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rms = np.sqrt(squares / counts)
+    return group[starts], counts, peaks, np.where(counts > 0, rms, np.nan)
+
+def _load_points(site_id=None, borehole_ids=None):
+    """
+    有设计倾角与方位角的钻孔的全部测点，按钻孔与测深排序 (坐标缺失的测点保留，值为 NaN)。
+
+    Returns:
+        tuple: (钻孔列表, (n, 9) 数组 [borehole_id, md, e, n, z, 孔口 e, n, z, 设计行下标])
+    """
+    query = db.session.query(Borehole, DrillingSite.coord_e, DrillingSite.coord_n, DrillingSite.coord_z) \
+        .join(DrillingSite, Borehole.drilling_site_id == DrillingSite.id) \
+        .filter(Borehole.dip_angle.isnot(None), Borehole.azimuth.isnot(None))
+    if site_id is not None:
+        query = query.filter(Borehole.drilling_site_id == site_id)
+    if borehole_ids is not None:
+        query = query.filter(Borehole.id.in_(borehole_ids))
+    designs = query.order_by(Borehole.id).all()
+    if not designs:
+        return [], np.empty((0, 9))
+
+    ids = np.array([bh.id for bh, *_ in designs])
+    rows = db.session.query(
+        BoreholeTrajectory.borehole_id, BoreholeTrajectory.measured_depth,
+        BoreholeTrajectory.coord_e, BoreholeTrajectory.coord_n, BoreholeTrajectory.coord_z
+    ).filter(BoreholeTrajectory.borehole_id.in_(ids.tolist())) \
+        .order_by(BoreholeTrajectory.borehole_id, BoreholeTrajectory.measured_depth).all()
+    table = np.array([tuple(r) for r in rows], dtype=float).reshape(-1, 5)
+    # 钻场坐标缺失时以 0 为孔口，与轨迹计算一致
+    collars = np.nan_to_num(np.array([tuple(c) for _, *c in designs], dtype=float).reshape(-1, 3))
+    row = np.searchsorted(ids, table[:, 0])
+    return [bh for bh, *_ in designs], np.column_stack((table, collars[row], row))
+
+def _store(ids, peaks, rms):
+    table = Borehole.__table__
+    db.session.execute(
+        table.update().where(table.c.id == bindparam("_id")).values(
+            max_deviation=bindparam("_max"), rms_deviation=bindparam("_rms")),
+        [{"_id": int(i), "_max": None if np.isnan(p) else float(p), "_rms": None if np.isnan(r) else float(r)}
+         for i, p, r in zip(ids, peaks, rms)])
+
+def _as_list(values, digits=4):
+    """数组 -> JSON 列表，NaN 转为 None"""
+    values = np.round(values, digits)
+    missing = np.isnan(values)
+    if not missing.any():
+        return values.tolist()
+    values = values.astype(object)
+    values[missing] = None
+    return values.tolist()
+
+def analyze_deviation(site_id=None, borehole_ids=None, persist=False):
+    """
+    计算钻孔实钻轨迹相对设计线的偏差。未设置设计倾角或方位角的钻孔不参与。
+
+    Args:
+        site_id (int): 仅分析该钻场的钻孔。
+        borehole_ids (list): 仅分析这些钻孔。
+        persist (bool): 将最大 / 均方根垂向偏差写回 borehole (调用方负责 commit)。
+
+    Returns:
+        dict: {"tolerance", "boreholes": [
+                 {"borehole_id", "borehole_no", "drilling_site_id", "stations", "max_deviation",
+                  "rms_deviation", "max_along_offset", "within_tolerance",
+                  "measured_depth": [...], "perpendicular": [...], "along_offset": [...]}]}
+              数组与场景轨迹测点一一对应；无有效测点的钻孔统计值为 None。
+    """
+    tolerance = current_app.config.get('TRAJECTORY_DEVIATION_TOLERANCE', 0.5)
+    boreholes, data = _load_points(site_id, borehole_ids)
+    rows = data[:, 8].astype(np.int64)
+    dip = np.array([bh.dip_angle for bh in boreholes], dtype=float)[rows]
+    azimuth = np.array([bh.azimuth for bh in boreholes], dtype=float)[rows]
+    perpendicular, along_offset = deviation_offsets(data[:, 2:5], data[:, 5:8], dip, azimuth, data[:, 1])
+    groups, counts, peaks, rms = group_statistics(perpendicular, rows)
+    _, _, along_peaks, _ = group_statistics(np.abs(along_offset), rows)
+
+    if persist and len(groups):
+        _store([boreholes[g].id for g in groups], peaks, rms)
+
+    summary = {int(g): k for k, g in enumerate(groups)}
+    starts = np.r_[0, np.cumsum(np.bincount(rows, minlength=len(boreholes)))]
+    results = []
+    for g, bh in enumerate(boreholes):
+        a, b = starts[g], starts[g + 1]
+        k = summary.get(g)
+        valid = k is not None and counts[k] > 0
+        peak = float(peaks[k]) if valid else None
+        results.append({
+            "borehole_id": bh.id,
+            "borehole_no": bh.borehole_no,
+            "drilling_site_id": bh.drilling_site_id,
+            "stations": int(counts[k]) if k is not None else 0,
+            "max_deviation": peak,
+            "rms_deviation": float(rms[k]) if valid else None,
+            "max_along_offset": float(along_peaks[k]) if valid else None,
+            "within_tolerance": peak <= tolerance if valid else None,
+            "measured_depth": _as_list(data[a:b, 1]),
+            "perpendicular": _as_list(perpendicular[a:b]),
+            "along_offset": _as_list(along_offset[a:b])
+        })
+    return {"tolerance": tolerance, "boreholes": results}
@@ -0,0 +1,126 @@
+import time
+import numpy as np
+
+#==============================================================================
+# 趋势曲线服务端降采样
+# lttb: Largest-Triangle-Three-Buckets，保留形状与峰值，输出 max_points 个原始点；
+# minmax: 包络模式，每桶保留最小值与最大值两个点，适合需要完整显示波动范围的曲线。
+# 各函数返回所选点在原序列中的下标 (升序)，调用方据此取时间与数值。
+#==============================================================================
+
+DOWNSAMPLE_MODES = ("lttb", "minmax")
+MIN_POINTS = 3
+
+def lttb_indices(x, y, max_points):
+    """
+    LTTB 降采样。首尾点固定保留，中间点均分为 max_points - 2 个桶，
+    每桶选与上一选中点、下一桶均值构成三角形面积最大的点。
+
+    各桶均值由前缀和一次算出；逐桶选点依赖上一桶的结果，循环次数为 max_points，
+    与原序列长度无关，桶内面积计算全部向量化。
+
+    Args:
+        x (np.ndarray): 横坐标 (升序，时间取时间戳)。
+        y (np.ndarray): 纵坐标，不含 NaN。
+        max_points (int): 输出点数上限 (不小于 3)。
+
+    Returns:
+        np.ndarray: 选中点的下标。
+    """
+    n = len(y)
+    if n <= max_points or max_points < MIN_POINTS:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # 中间点 [1, n-1) 均分为 max_points-2 个桶，n > max_points 保证每桶至少一个点
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    sum_x = np.concatenate(([0.0], np.cumsum(x)))
+    sum_y = np.concatenate(([0.0], np.cumsum(y)))
+    widths = edges[1:] - edges[:-1]
+    avg_x = (sum_x[edges[1:]] - sum_x[edges[:-1]]) / widths
+    avg_y = (sum_y[edges[1:]] - sum_y[edges[:-1]]) / widths
+    # 第 i 桶的"下一桶"为第 i+1 桶，最后一桶的下一桶为末点
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[start:end] - ay) - (ax - x[start:end]) * (next_y[i] - ay))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def minmax_indices(y, max_points):
+    """
+    最小/最大值包络降采样：序列按等长分为 max_points // 2 个桶，每桶保留最小值点与最大值点。
+
+    Args:
+        y (np.ndarray): 纵坐标，不含 NaN。
+        max_points (int): 输出点数上限。
+
+    Returns:
+        np.ndarray: 选中点的下标 (升序去重)。
+    """
+    n = len(y)
+    if n <= max_points or max_points < 2:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    size = -(-n // (max_points // 2))
+    buckets = -(-n // size)
+    # 末桶以 NaN 补齐后整形为二维，逐行取极值下标
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    grid = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    return np.unique(np.concatenate((offsets + np.nanargmin(grid, axis=1), offsets + np.nanargmax(grid, axis=1))))
+
+def downsample_indices(x, y, max_points, mode="lttb"):
+    """
+    按模式降采样；y 中的 NaN (无数据的桶) 不参与选点。
+
+    Returns:
+        np.ndarray: 选中点在原序列中的下标。
+    """
+    if mode not in DOWNSAMPLE_MODES:
+        raise ValueError(f"Unknown downsample mode: {mode}")
+    y = np.asarray(y, dtype=float)
+    valid = np.flatnonzero(~np.isnan(y))
+    if not max_points or len(valid) <= max_points:
+        return valid
+    if mode == "minmax":
+        chosen = minmax_indices(y[valid], max_points)
+    else:
+        chosen = lttb_indices(np.asarray(x, dtype=float)[valid], y[valid], max(max_points, MIN_POINTS))
+    return valid[chosen]
+
+def benchmark(points=1_000_000, max_points=1000, repeat=5, seed=0):
+    """
+    在合成的随机游走序列 (含尖峰) 上测量各模式降采样耗时。
+
+    Returns:
+        dict: {mode: {"points", "max_points", "output", "best_ms", "mean_ms"}}
+    """
+    rng = np.random.default_rng(seed)
+    x = np.arange(points, dtype=float) * 60.0
+    y = 30 + np.cumsum(rng.normal(0, 0.05, points))
+    y[rng.integers(0, points, max(points // 10000, 1))] += 20
+    results = {}
+    for mode in DOWNSAMPLE_MODES:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            chosen = downsample_indices(x, y, max_points, mode)
+            timings.append((time.perf_counter() - started) * 1000)
+        results[mode] = {
+            "points": points,
+            "max_points": max_points,
+            "output": len(chosen),
+            "best_ms": min(timings),
+            "mean_ms": sum(timings) / len(timings)
+        }
+    return results
@@ -116,7 +116,8 @@ def calculate_evaluation_metrics(borehole_id):
     """
     研发评价算法核心逻辑：基于数据库真实数据量化计算压裂有效率和顶板稳定性。
     """
-    from app.models import Borehole, FractureConstructionData, SupportPressureData, RoadwayDeformation
+    from app.models import Borehole, FractureConstructionData
+    from app.services import archive_service
     import numpy as np
 
     # 1. 获取钻孔基本信息
@@ -127,9 +128,13 @@ def calculate_evaluation_metrics(borehole_id):
     borehole_no = bh.borehole_no
 
     # 2. 获取该钻孔的压裂施工时间范围
-    frac_records = FractureConstructionData.query.filter_by(borehole_id=borehole_id).order_by(FractureConstructionData.record_time).all()
+    # 数字化后的施工曲线每段有上千个采样点，只取时间范围，不加载全部记录
+    start_time, end_time = db.session.query(
+        func.min(FractureConstructionData.record_time),
+        func.max(FractureConstructionData.record_time)
+    ).filter(FractureConstructionData.borehole_id == borehole_id).one()
     
-    if not frac_records:
+    if start_time is None:
         # 如果没有压裂记录，基于 ID 生成确定的伪随机但差异化的数据，防止“全屏一致”
         seed = borehole_id * 123
         random.seed(seed)
@@ -157,47 +162,38 @@ def calculate_evaluation_metrics(borehole_id):
             "is_simulated": True
         }
 
-    # 获取施工起始和结束时间
-    start_time = frac_records[0].record_time
-    end_time = frac_records[-1].record_time
-    
     # 定义对比窗口 (施工前 7 天 vs 施工后 7 天)
     pre_window_start = start_time - timedelta(days=7)
     post_window_end = end_time + timedelta(days=7)
 
     # 3. 计算矿压降低率 (以支架压力 P1 为例)
-    pre_p_query = db.session.query(func.avg(SupportPressureData.p1)).filter(
-        SupportPressureData.record_time >= pre_window_start,
-        SupportPressureData.record_time < start_time
-    ).scalar()
+    # 窗口早于冷归档水位时，均值合并归档中的数据
+    pre_p_query = archive_service.window_mean("pressure", "p1", pre_window_start, start_time, include_end=False)
     pre_p = float(pre_p_query) if pre_p_query is not None else 35.0
     
-    post_p_query = db.session.query(func.avg(SupportPressureData.p1)).filter(
-        SupportPressureData.record_time > end_time,
-        SupportPressureData.record_time <= post_window_end
-    ).scalar()
+    post_p_query = archive_service.window_mean("pressure", "p1", end_time, post_window_end, include_start=False)
     post_p = float(post_p_query) if post_p_query is not None else 30.0
 
     p_reduction = max(0, (pre_p - post_p) / pre_p * 100) if pre_p > 0 else 0
 
     # 4. 计算变形控制率 (以巷道变形速率为例)
-    pre_d_query = db.session.query(func.avg(RoadwayDeformation.deformation_rate)).filter(
-        RoadwayDeformation.record_time >= pre_window_start,
-        RoadwayDeformation.record_time < start_time
-    ).scalar()
+    pre_d_query = archive_service.window_mean("deformation", "deformation_rate", pre_window_start, start_time,
+                                              include_end=False)
     pre_d = float(pre_d_query) if pre_d_query is not None else 5.0
     
-    post_d_query = db.session.query(func.avg(RoadwayDeformation.deformation_rate)).filter(
-        RoadwayDeformation.record_time > end_time,
-        RoadwayDeformation.record_time <= post_window_end
-    ).scalar()
+    post_d_query = archive_service.window_mean("deformation", "deformation_rate", end_time, post_window_end,
+                                               include_start=False)
     post_d = float(post_d_query) if post_d_query is not None else 2.0
 
     d_control = max(0, (pre_d - post_d) / pre_d * 100) if pre_d > 0 else 0
 
     # 5. 综合计算压裂有效率
     # 结合施工规模 (总排量) 进行加权
-    total_vol = sum(r.total_volume for r in frac_records)
+    # total_volume 为段内累计排量，各段取最大值后求和
+    segment_volumes = db.session.query(func.max(FractureConstructionData.total_volume)).filter(
+        FractureConstructionData.borehole_id == borehole_id
+    ).group_by(FractureConstructionData.segment_no).all()
+    total_vol = sum(v for v, in segment_volumes if v is not None)
     vol_factor = min(1.2, total_vol / 500) # 排量越大，影响因子越高
     
     eff_value = (p_reduction * 0.5 + d_control * 0.5) * vol_factor
@@ -0,0 +1,201 @@
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select
+from app import db
+from app.services.auxiliary_service import QUERY_TARGETS, compile_filters
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 为可选依赖，缺失时不提供 Parquet 导出
+    pa = pq = None
+
+#==============================================================================
+# 查询结果流式导出 (CSV / NDJSON / Parquet)
+# 与 /query 相同的 target、时间与字段过滤，按业务时间升序导出 (/query 为倒序取最新 limit 行)。
+# 时间范围跨过冷归档水位时先逐月输出归档中的行，再输出数据库中的实时数据，limit 跨两部分计数。
+# 以 yield_per 分批取数 (PostgreSQL 下为服务端游标)，每批编码后立即发送，
+# 内存占用与导出总行数无关，只取决于批大小。
+#==============================================================================
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet")
+}
+DEFAULT_BATCH_SIZE = 5000
+
+def available_formats():
+    return [f for f in EXPORT_FORMATS if f != "parquet" or pq is not None]
+
+def build_export_statement(target, start_time=None, end_time=None, limit=None, filters=None):
+    """
+    导出查询：只取表的列 (Core select，不构造 ORM 对象)。filters 格式同 query_data。
+
+    Returns:
+        tuple: (Select, 表)；target 无效时为 (None, None)。
+    """
+    if target not in QUERY_TARGETS:
+        return None, None
+    model_class, time_field_name = QUERY_TARGETS[target]
+    table = model_class.__table__
+    time_field = table.c[time_field_name]
+    stmt = select(table)
+    if start_time:
+        stmt = stmt.where(time_field >= datetime.fromisoformat(start_time))
+    if end_time:
+        stmt = stmt.where(time_field <= datetime.fromisoformat(end_time))
+    for clause in compile_filters(table, filters):
+        stmt = stmt.where(clause)
+    stmt = stmt.order_by(time_field, table.c.id)
+    if limit:
+        stmt = stmt.limit(limit)
+    return stmt, table
+
+def iter_batches(stmt, batch_size=DEFAULT_BATCH_SIZE):
+    """按批产出结果行 (yield_per：PostgreSQL 使用服务端游标，SQLite 逐批 fetchmany)"""
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+def iter_export_batches(params, batch_size=DEFAULT_BATCH_SIZE):
+    """归档部分 (范围跨过水位时) 在前、实时表在后，按批产出导出行"""
+    from app.services import archive_service
+    target = params.get("target")
+    start, end = params.get("start_time"), params.get("end_time")
+    remaining = params.get("limit") or None
+    start_dt = datetime.fromisoformat(start) if start else None
+    if archive_service.covers(target, start_dt):
+        for rows in archive_service.iter_archive_rows(target, start_dt, datetime.fromisoformat(end) if end else None,
+                                                      params.get("filters"), batch_size):
+            if remaining is not None:
+                rows = rows[:remaining]
+                remaining -= len(rows)
+            if rows:
+                yield rows
+            if remaining == 0:
+                return
+    stmt, _ = build_export_statement(target, start, end, remaining, params.get("filters"))
+    yield from iter_batches(stmt, batch_size)
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def encode_csv(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    # 带 BOM，Excel 可直接识别 UTF-8 中文
+    yield "\ufeff" + buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_plain(v) for v in row] for row in rows)
+        yield buffer.getvalue()
+
+def encode_ndjson(columns, batches):
+    for rows in batches:
+        yield "".join(json.dumps(dict(zip(columns, map(_plain, row))), ensure_ascii=False) + "\n" for row in rows)
+
+def _arrow_type(column):
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return pa.timestamp("us")
+    if python_type is bool:
+        return pa.bool_()
+    if python_type is int:
+        return pa.int64()
+    if python_type is float:
+        return pa.float64()
+    return pa.string()
+
+def arrow_schema(table):
+    """表结构 -> Arrow schema (Parquet 导出与冷数据归档共用)"""
+    return pa.schema([(c.name, _arrow_type(c)) for c in table.columns])
+
+def rows_to_arrow(table, schema, rows):
+    columns = [c.name for c in table.columns]
+    return pa.Table.from_pydict({name: [row[i] for row in rows] for i, name in enumerate(columns)}, schema=schema)
+
+class _ChunkSink:
+    """ParquetWriter 的输出目标：缓存已写出的字节，由生成器逐段取走"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def encode_parquet(table, batches):
+    """每批写为一个行组，写完即发送该行组的字节"""
+    schema = arrow_schema(table)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    try:
+        for rows in batches:
+            writer.write_table(rows_to_arrow(table, schema, rows))
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.take()
+
+def stream_export(params, fmt="csv", batch_size=DEFAULT_BATCH_SIZE):
+    """
+    流式导出查询结果。
+
+    Args:
+        params (dict): 与 query_data 相同的 target/start_time/end_time/filters；limit 可选 (默认全部)。
+        fmt (str): csv | ndjson | parquet。
+
+    Returns:
+        tuple: (数据块生成器, MIME 类型, 文件名)
+
+    Raises:
+        ValueError: target 或格式无效。
+    """
+    target = params.get("target")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid export format: {fmt}")
+    if fmt not in available_formats():
+        raise ValueError("Parquet export requires pyarrow")
+    stmt, table = build_export_statement(target, params.get("start_time"), params.get("end_time"),
+                                         params.get("limit"), params.get("filters"))
+    if stmt is None:
+        raise ValueError(f"Invalid query target: {target}")
+
+    batches = iter_export_batches(params, batch_size)
+    columns = [c.name for c in table.columns]
+    if fmt == "csv":
+        chunks = encode_csv(columns, batches)
+    elif fmt == "ndjson":
+        chunks = encode_ndjson(columns, batches)
+    else:
+        chunks = encode_parquet(table, batches)
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f"{target}_{datetime.now():%Y%m%d%H%M%S}.{extension}"
+    return chunks, mimetype, filename
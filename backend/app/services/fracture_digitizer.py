@@ -0,0 +1,309 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+from app import db
+from app.models import DrillingSite, Borehole, FractureConstructionData, ImportManifest
+from app.services import ingest_service
+from app.services.history_loader import file_hash
+
+#==============================================================================
+# 压裂曲线图像数字化
+# database/流量/1-6号孔压裂曲线/<n>号孔/第<k>段.png 是各段泵压/流量曲线的唯一记录。
+# 逐列向量化提取曲线像素 (按配置颜色估计抗锯齿透明度)，再按轴标定换算为时间序列；
+# 多张图像在进程池中并行处理，结果批量写入 FractureConstructionData。
+#==============================================================================
+
+BOREHOLE_DIR_PATTERN = re.compile(r"(\d+)号孔")
+SEGMENT_FILE_PATTERN = re.compile(r"第(\d+)段")
+CALIBRATION_FILE = "calibration.json"
+
+# 抗锯齿像素与曲线颜色的最大残差，以及计为曲线像素的最小不透明度
+COLOR_TOLERANCE = 24.0
+MIN_ALPHA = 0.35
+# 坐标轴内侧刻度线的宽度 (像素)，提取曲线时跳过
+AXIS_TICK_MARGIN = 8
+
+def load_calibration(path):
+    """读取图像集标定配置 (JSON)"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def image_calibration(calibration, rel_path):
+    """
+    合并图像集默认标定与单张图像的覆盖项。
+
+    Returns:
+        dict: {"first_tick", "last_tick", "pressure": {...}, "flow": {...}}
+
+    Raises:
+        KeyError: 图像未配置时间轴标定。
+    """
+    key = rel_path.replace(os.sep, "/")
+    overrides = calibration.get("images", {})[key]
+    curves = {}
+    for name in ("pressure", "flow"):
+        curve = dict(calibration[name])
+        for field in ("min", "max"):
+            if f"{name}_{field}" in overrides:
+                curve[field] = overrides[f"{name}_{field}"]
+        curves[name] = curve
+    return {"first_tick": overrides["first_tick"], "last_tick": overrides["last_tick"], **curves}
+
+def color_alpha(rgb, color):
+    """
+    按 "曲线颜色与白色混合" 模型估计每个像素的不透明度。
+    残差超过 COLOR_TOLERANCE 的像素 (其他颜色或两条曲线的混色) 记为 0。
+    """
+    ink = 255.0 - np.asarray(color, dtype=float)
+    darkness = 255.0 - rgb
+    alpha = np.clip((darkness @ ink) / (ink @ ink), 0.0, 1.0)
+    residual = np.abs(darkness - alpha[..., None] * ink).max(axis=-1)
+    return np.where((residual <= COLOR_TOLERANCE) & (alpha >= MIN_ALPHA), alpha, 0.0)
+
+def detect_frame(rgb, frame_color):
+    """
+    定位绘图区边框：上下边为占宽度 60% 以上的边框色行，左边为边框色列，右边为非白色列。
+
+    Returns:
+        tuple: (top, bottom, left, right) 像素坐标
+    """
+    h, w, _ = rgb.shape
+    framed = color_alpha(rgb, frame_color) > 0.9
+    rows = np.flatnonzero(framed[:, 3:w - 3].mean(axis=1) >= 0.6)
+    rows = rows[(rows > 2) & (rows < h - 3)]
+    if len(rows) < 2:
+        raise ValueError("Plot frame not found.")
+    top, bottom = rows[0], rows[-1]
+
+    inside = slice(top, bottom + 1)
+    cols = np.flatnonzero(framed[inside].mean(axis=0) >= 0.6)
+    dark = np.flatnonzero((rgb[inside].sum(axis=-1) < 700).mean(axis=0) >= 0.6)
+    cols, dark = cols[(cols > 2) & (cols < w - 4)], dark[(dark > 2) & (dark < w - 4)]
+    if not len(cols) or not len(dark):
+        raise ValueError("Plot frame not found.")
+    return top, bottom, cols[0], dark[-1]
+
+def detect_time_ticks(rgb, bottom, left, right, depth=20):
+    """
+    定位时间轴主刻度：底边下方最长的竖直刻度线，返回各刻度中心列 (升序)。
+    """
+    below = rgb[bottom + 1:bottom + 1 + depth, left - 1:right + 2].sum(axis=-1) < 700
+    run = np.where(below.all(axis=0), depth, np.argmin(below, axis=0))
+    major = np.flatnonzero(run >= max(3, 0.8 * run.max()))
+    if len(major) < 2:
+        raise ValueError("Time axis ticks not found.")
+    groups = np.split(major, np.flatnonzero(np.diff(major) > 1) + 1)
+    return np.array([g.mean() for g in groups]) + left - 1
+
+def _column_rows(alpha):
+    """每列曲线像素的加权平均行号 (无曲线像素的列为 NaN)"""
+    weight = alpha.sum(axis=0)
+    rows = np.arange(alpha.shape[0], dtype=float)[:, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(weight > 0, (alpha * rows).sum(axis=0) / weight, np.nan)
+
+def _fill_gaps(values):
+    """线性插补缺失列，两端缺失沿用最近值"""
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return np.zeros_like(values)
+    idx = np.arange(len(values))
+    return np.interp(idx, idx[valid], values[valid])
+
+def digitize_image(path, calib):
+    """
+    从一张压裂曲线图中提取泵压与瞬时流量时间序列 (在子进程中执行，须为模块级函数)。
+
+    压力曲线与边框同色，零值落在底边上不可见；某列没有压力像素时，
+    若该列有流量曲线 (流量曲线绘制在上层) 则视为被遮挡并取流量曲线所在行，否则取零值。
+
+    Args:
+        path: 图像路径。
+        calib: image_calibration 返回的标定。
+
+    Returns:
+        dict: {"time": datetime64[ms] 数组, "pressure": MPa, "flow": m3/h, "elapsed": 秒}
+    """
+    started = time.perf_counter()
+    rgb = np.asarray(Image.open(path).convert("RGB"), dtype=float)
+    pressure_cfg, flow_cfg = calib["pressure"], calib["flow"]
+
+    top, bottom, left, right = detect_frame(rgb, pressure_cfg["color"])
+    ticks = detect_time_ticks(rgb, bottom, left, right)
+
+    x0, x1 = left + AXIS_TICK_MARGIN, right - AXIS_TICK_MARGIN
+    # 压力：不含上下边框；流量：含底边 (零流量画在底边之上)
+    pressure_rows = _column_rows(color_alpha(rgb[top + 1:bottom, x0:x1], pressure_cfg["color"])) + top + 1
+    flow_rows = _column_rows(color_alpha(rgb[top + 1:bottom + 1, x0:x1], flow_cfg["color"])) + top + 1
+
+    occluded = np.isnan(pressure_rows) & ~np.isnan(flow_rows)
+    pressure_rows = np.where(occluded, flow_rows, pressure_rows)
+    pressure_rows = np.where(np.isnan(pressure_rows), bottom, pressure_rows)
+    flow_rows = _fill_gaps(flow_rows)
+
+    def to_value(rows, cfg):
+        return cfg["min"] + (bottom - rows) / (bottom - top) * (cfg["max"] - cfg["min"])
+
+    first = np.datetime64(calib["first_tick"], "ms")
+    last = np.datetime64(calib["last_tick"], "ms")
+    ms_per_px = (last - first).astype(float) / (ticks[-1] - ticks[0])
+    cols = np.arange(x0, x1, dtype=float)
+    times = first + np.round((cols - ticks[0]) * ms_per_px).astype("timedelta64[ms]")
+
+    return {
+        "time": times,
+        "pressure": np.clip(to_value(pressure_rows, pressure_cfg), pressure_cfg["min"], pressure_cfg["max"]),
+        "flow": np.clip(to_value(flow_rows, flow_cfg), flow_cfg["min"], flow_cfg["max"]),
+        "elapsed": time.perf_counter() - started
+    }
+
+def find_images(root):
+    """
+    按目录结构列出图像：<n>号孔/第<k>段.png。
+
+    Returns:
+        list: (相对路径, 钻孔目录名, 段号) 元组，按孔号、段号排序
+    """
+    images = []
+    for dirpath, _, filenames in os.walk(root):
+        hole = BOREHOLE_DIR_PATTERN.fullmatch(os.path.basename(dirpath))
+        if not hole:
+            continue
+        for name in filenames:
+            seg = SEGMENT_FILE_PATTERN.search(name)
+            if seg and name.lower().endswith(".png"):
+                rel = os.path.relpath(os.path.join(dirpath, name), root)
+                images.append((rel, os.path.basename(dirpath), int(seg.group(1))))
+    return sorted(images, key=lambda item: (int(BOREHOLE_DIR_PATTERN.fullmatch(item[1]).group(1)), item[2]))
+
+def _digitize_all(root, items, workers):
+    """按输入顺序产出 (item, 结果, 错误)"""
+    if (workers is not None and workers <= 1) or len(items) <= 1:
+        for item in items:
+            try:
+                yield item, digitize_image(os.path.join(root, item[0]), item[3]), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(digitize_image, os.path.join(root, item[0]), item[3]) for item in items]
+        for item, future in zip(items, futures):
+            try:
+                yield item, future.result(), None
+            except Exception as e:
+                yield item, None, e
+
+def _resolve_borehole(borehole_no, site_name, cache):
+    """按钻孔编号查找钻孔；不存在时在配置的钻场下创建"""
+    if borehole_no in cache:
+        return cache[borehole_no]
+    borehole = Borehole.query.filter_by(borehole_no=borehole_no).first()
+    if borehole is None:
+        site = DrillingSite.query.filter_by(name=site_name).first()
+        if site is None:
+            site = DrillingSite(name=site_name, location=site_name)
+            db.session.add(site)
+            db.session.flush()
+        borehole = Borehole(drilling_site_id=site.id, borehole_no=borehole_no)
+        db.session.add(borehole)
+        db.session.flush()
+    cache[borehole_no] = borehole
+    return borehole
+
+def load_fracture_curves(root, calibration_path=None, workers=None, force=False, echo=print):
+    """
+    数字化图像集并写入 FractureConstructionData。需在应用上下文中调用。
+
+    钻孔由目录名 (<n>号孔，可经配置 borehole_map 映射为库中钻孔编号) 确定，段号取自文件名；
+    图像按内容哈希记入 import_manifest，重复执行时跳过；force 时先删除该段已有数据再写入。
+
+    Args:
+        root: 图像集根目录。
+        calibration_path: 标定配置路径，默认 root/calibration.json。
+        workers: 进程数 (默认 CPU 核数)。
+        force: 重新处理已登记的图像。
+        echo: 进度输出函数。
+
+    Returns:
+        list: 每张图像的结果 dict。
+    """
+    calibration = load_calibration(calibration_path or os.path.join(root, CALIBRATION_FILE))
+    borehole_map = calibration.get("borehole_map", {})
+    site_name = calibration.get("drilling_site", "压裂钻场")
+
+    results, pending = [], []
+    for rel, hole_dir, segment in find_images(root):
+        digest = file_hash(os.path.join(root, rel))
+        if not force and ImportManifest.query.filter_by(file_hash=digest).first():
+            echo(f"{rel}: already loaded, skipped.")
+            continue
+        try:
+            calib = image_calibration(calibration, rel)
+        except KeyError:
+            echo(f"{rel}: no time-axis calibration configured, skipped.")
+            results.append({"file": rel, "error": "not calibrated"})
+            continue
+        pending.append((rel, hole_dir, segment, calib, digest))
+
+    boreholes = {}
+    for (rel, hole_dir, segment, _, digest), curves, error in _digitize_all(root, pending, workers):
+        if error is not None:
+            echo(f"{rel}: FAILED to digitize ({error}).")
+            results.append({"file": rel, "error": str(error)})
+            continue
+
+        started = time.perf_counter()
+        try:
+            borehole = _resolve_borehole(borehole_map.get(hole_dir, hole_dir), site_name, boreholes)
+            if force:
+                FractureConstructionData.query.filter_by(borehole_id=borehole.id, segment_no=segment).delete()
+
+            size = len(curves["time"])
+            seconds = np.diff(curves["time"]).astype("timedelta64[ms]").astype(float) / 1000.0
+            # 累计排量 (m3)：流量 m3/h 按梯形积分
+            volume = np.concatenate([[0.0], np.cumsum((curves["flow"][1:] + curves["flow"][:-1]) / 2 * seconds / 3600.0)])
+            columns = {
+                "record_time": curves["time"].astype("datetime64[us]").tolist(),
+                "borehole_id": [borehole.id] * size,
+                "segment_no": [segment] * size,
+                "pressure": np.round(curves["pressure"], 3).tolist(),
+                "flow_rate": np.round(curves["flow"] / 60.0, 4).tolist(),
+                "total_volume": np.round(volume, 3).tolist()
+            }
+            stats = ingest_service.insert_columns(FractureConstructionData, columns, size)
+
+            manifest = ImportManifest.query.filter_by(file_hash=digest).first() or \
+                ImportManifest(file_hash=digest, data_type="fracture")
+            manifest.file_name = rel
+            manifest.row_count = size
+            manifest.inserted_count = stats["inserted"]
+            db.session.add(manifest)
+            if borehole.segments is None or borehole.segments < segment:
+                borehole.segments = segment
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            boreholes.clear()
+            echo(f"{rel}: FAILED to load ({e}).")
+            results.append({"file": rel, "error": str(e)})
+            continue
+
+        elapsed = curves["elapsed"] + time.perf_counter() - started
+        result = {
+            "file": rel,
+            "borehole_no": borehole.borehole_no,
+            "segment_no": segment,
+            "rows": size,
+            "max_pressure": float(curves["pressure"].max()),
+            "total_volume": float(volume[-1]),
+            "elapsed": elapsed
+        }
+        results.append(result)
+        echo(f"{rel}: {size} samples, max {result['max_pressure']:.1f} MPa, "
+             f"{result['total_volume']:.1f} m3 ({size / elapsed:.0f} rows/s).")
+    return results
@@ -0,0 +1,282 @@
+import glob
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from app import db
+from app.models import SupportPressureData, AnchorBoltLoad, RockDisplacement, MicroseismicEvent, ImportManifest
+from app.services import ingest_service
+
+#==============================================================================
+# 历史工作簿批量导入 (KJ653 矿压、锚杆索受力、围岩移动、SOS 微震)
+# 子进程并行解析 xls 导出文件 (纯 pandas，不触碰数据库)，
+# 主进程按自然键去除重叠时段后走批量摄入引擎写库；
+# 已导入的文件按内容哈希记入 import_manifest，重复执行时跳过。
+#==============================================================================
+
+# 历史数据类型 -> 导出格式定义
+#   model: 目标模型；subdir: HISTORY_DATA_DIR 下的默认目录；
+#   header_map: 导出表头 -> 模型字段 (设备编码、电量等列不入库)；key: 自然键；
+#   time_field: 业务时间字段；first_header: 表头行首列 (默认 "时间")；
+#   time_parts: 日期、时刻分两列导出时的 (日期列, 时刻列)，合并为 time_field
+HISTORY_KINDS = {
+    "kj653": {
+        "model": SupportPressureData,
+        "subdir": "矿压",
+        "header_map": {
+            "时间": "record_time",
+            "分站编号": "station_no",
+            "支架编号": "support_no",
+            "安装位置": "position",
+            "P1(MPa)": "p1",
+            "P2(MPa)": "p2",
+            "P3(MPa)": "p3",
+            "X(度)": "angle_x",
+            "Y(度)": "angle_y",
+            "状态": "status"
+        },
+        "int_fields": ["station_no", "support_no"],
+        "float_fields": ["p1", "p2", "p3", "angle_x", "angle_y"],
+        "key": ["station_no", "support_no", "record_time"],
+        "time_field": "record_time"
+    },
+    "bolt": {
+        "model": AnchorBoltLoad,
+        "subdir": os.path.join("变形", "回风锚杆索数据"),
+        "header_map": {
+            "时间": "record_time",
+            "传感器编号": "sensor_no",
+            "传感器类型": "sensor_type",
+            "安装位置": "position",
+            "传感器直径(mm)": "diameter",
+            "应力值(kN)": "load",
+            "状态": "status"
+        },
+        "int_fields": ["sensor_no"],
+        "float_fields": ["diameter", "load"],
+        "key": ["sensor_no", "record_time"],
+        "time_field": "record_time"
+    },
+    "rock": {
+        "model": RockDisplacement,
+        "subdir": os.path.join("变形", "围岩移动数据"),
+        "header_map": {
+            "时间": "record_time",
+            "传感器编号": "sensor_no",
+            "安装位置": "position",
+            "深基点深度(m)": "deep_anchor_depth",
+            "浅基点深度(m)": "shallow_anchor_depth",
+            "深(mm)": "deep_displacement",
+            "浅(mm)": "shallow_displacement",
+            "|深-浅|(mm)": "separation"
+        },
+        "int_fields": ["sensor_no"],
+        "float_fields": ["deep_anchor_depth", "shallow_anchor_depth", "deep_displacement",
+                         "shallow_displacement", "separation"],
+        "key": ["sensor_no", "record_time"],
+        "time_field": "record_time"
+    },
+    "sos": {
+        "model": MicroseismicEvent,
+        "subdir": "微震",
+        "first_header": "Data",
+        "header_map": {
+            "Data": "event_date",
+            "CZAS": "event_clock",
+            "X": "coord_x",
+            "Y": "coord_y",
+            "Z": "coord_z",
+            "ENERGIA": "energy"
+        },
+        "int_fields": [],
+        "float_fields": ["coord_x", "coord_y", "coord_z", "energy"],
+        "key": ["event_time", "coord_x", "coord_y", "coord_z"],
+        "time_field": "event_time",
+        "time_parts": ("event_date", "event_clock")
+    }
+}
+
+# 导出文件中表示缺测的占位符
+MISSING_VALUES = ["--", ""]
+WORKBOOK_PATTERNS = ("*.xls", "*.xlsx")
+
+def file_hash(path, chunk_size=1 << 20):
+    """文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def find_workbooks(paths):
+    """展开目录为其中的 xls/xlsx 文件，按文件名排序"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in WORKBOOK_PATTERNS:
+                files.extend(glob.glob(os.path.join(path, pattern)))
+        else:
+            files.append(path)
+    return sorted(set(files))
+
+def _locate_header(raw, first_header):
+    """导出文件前几行为标题/查询条件，定位首列等于 first_header 的表头行"""
+    first_col = raw.iloc[:, 0].astype(str).str.strip()
+    hits = np.flatnonzero(first_col.to_numpy() == first_header)
+    if not len(hits):
+        raise ValueError(f"Header row starting with '{first_header}' not found.")
+    return hits[0]
+
+def parse_workbook(source, kind):
+    """
+    解析一个导出工作簿 (在子进程中执行，须为模块级函数)。
+    仅读取第一个工作表；部分文件附带的对比摘录工作表与主表重复，不解析。
+
+    Args:
+        source: 工作簿路径或文件对象。
+        kind: HISTORY_KINDS 中的数据类型。
+
+    Returns:
+        tuple: (DataFrame, 解析耗时秒)。DataFrame 列为模型字段，
+        已剔除自然键不完整的行，并在文件内按自然键去重。
+
+    Raises:
+        ValueError: 找不到表头行。
+    """
+    started = time.perf_counter()
+    spec = HISTORY_KINDS[kind]
+    raw = pd.read_excel(source, header=None, dtype=str)
+    header_row = _locate_header(raw, spec.get("first_header", "时间"))
+
+    df = raw.iloc[header_row + 1:].copy()
+    df.columns = [str(c).strip() for c in raw.iloc[header_row]]
+    df = df[[c for c in df.columns if c in spec["header_map"]]].rename(columns=spec["header_map"])
+    df = df.replace(MISSING_VALUES, None)
+
+    time_field = spec["time_field"]
+    if "time_parts" in spec:
+        date_col, clock_col = spec["time_parts"]
+        dates = pd.to_datetime(df.pop(date_col), errors="coerce", format="mixed").dt.normalize()
+        df[time_field] = dates + pd.to_timedelta(df.pop(clock_col), errors="coerce")
+    else:
+        df[time_field] = pd.to_datetime(df[time_field], errors="coerce", format="mixed")
+    for field in spec["int_fields"]:
+        df[field] = pd.to_numeric(df[field], errors="coerce").astype("Int64")
+    for field in spec["float_fields"]:
+        if field in df:
+            df[field] = pd.to_numeric(df[field], errors="coerce")
+
+    df = df.dropna(subset=spec["key"]).drop_duplicates(subset=spec["key"], keep="last")
+    return df, time.perf_counter() - started
+
+def frame_to_columns(df):
+    """DataFrame -> ingest_service 按列批次 (缺失值为 None，时间为 datetime)"""
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = list(series.dt.to_pydatetime())
+        else:
+            values = series.astype(object).where(series.notna(), None).tolist()
+        columns[name] = values
+    return columns
+
+def _parse_all(paths, kind, workers, cache_dir=None):
+    """按输入顺序产出 (path, DataFrame, 解析耗时, 错误)；workers<=1 时在本进程解析"""
+    from app.services.parquet_cache import read_workbook
+    if (workers is not None and workers <= 1) or len(paths) <= 1:
+        for path in paths:
+            try:
+                yield (path, *read_workbook(path, kind, cache_dir), None)
+            except Exception as e:
+                yield path, None, 0.0, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(read_workbook, path, kind, cache_dir) for path in paths]
+        for path, future in zip(paths, futures):
+            try:
+                yield (path, *future.result(), None)
+            except Exception as e:
+                yield path, None, 0.0, e
+
+def default_paths(kind, data_dir):
+    """数据类型在历史数据根目录下的默认来源目录"""
+    return [os.path.join(data_dir, HISTORY_KINDS[kind]["subdir"])]
+
+def load_history(kind, paths, workers=None, force=False, cache_dir=None, echo=print):
+    """
+    并行解析并批量导入历史工作簿。需在应用上下文中调用。
+
+    重叠时段的处理：文件内按自然键去重；跨文件时先导入的文件优先，
+    后续文件中已出现的键在写库前剔除；与库中已有数据的重复由自然键约束幂等跳过。
+
+    Args:
+        kind: HISTORY_KINDS 中的数据类型。
+        paths: 工作簿文件或目录列表。
+        workers: 解析进程数 (默认 CPU 核数)。
+        force: 忽略导入清单，重新导入已登记的文件。
+        cache_dir: Parquet 缓存目录 (见 parquet_cache)；为空时直接解析源文件。
+        echo: 进度输出函数。
+
+    Returns:
+        list: 每个文件的导入结果 dict。
+    """
+    spec = HISTORY_KINDS[kind]
+    pending = []
+    for path in find_workbooks(paths):
+        digest = file_hash(path)
+        if not force and ImportManifest.query.filter_by(file_hash=digest).first():
+            echo(f"{os.path.basename(path)}: already loaded, skipped.")
+            continue
+        pending.append((path, digest))
+
+    results = []
+    seen = set()
+    digests = dict(pending)
+    for path, df, parse_elapsed, error in _parse_all([p for p, _ in pending], kind, workers, cache_dir):
+        name = os.path.basename(path)
+        if error is not None:
+            echo(f"{name}: FAILED to parse ({error}).")
+            results.append({"file": name, "error": str(error)})
+            continue
+
+        started = time.perf_counter()
+        keys = list(zip(*(df[k].tolist() for k in spec["key"])))
+        fresh = np.fromiter((k not in seen for k in keys), dtype=bool, count=len(keys))
+        batch = df[fresh]
+
+        try:
+            stats = ingest_service.insert_columns(spec["model"], frame_to_columns(batch), len(batch))
+            manifest = ImportManifest.query.filter_by(file_hash=digests[path]).first() or \
+                ImportManifest(file_hash=digests[path], data_type=kind)
+            manifest.file_name = name
+            manifest.row_count = len(df)
+            manifest.inserted_count = stats["inserted"]
+            db.session.add(manifest)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            echo(f"{name}: FAILED to load ({e}).")
+            results.append({"file": name, "error": str(e)})
+            continue
+        # 仅已提交文件的键参与后续文件的重叠剔除；失败回滚的行留给后续文件写入
+        seen.update(keys)
+
+        elapsed = parse_elapsed + time.perf_counter() - started
+        result = {
+            "file": name,
+            "rows": len(df),
+            "overlap": len(df) - len(batch),
+            "inserted": stats["inserted"],
+            "duplicates": stats["duplicates"],
+            "elapsed": elapsed,
+            "rows_per_sec": len(df) / elapsed if elapsed > 0 else 0.0
+        }
+        results.append(result)
+        echo(f"{name}: {result['rows']} rows, {result['inserted']} inserted, "
+             f"{result['overlap'] + result['duplicates']} duplicates skipped "
+             f"({result['rows_per_sec']:.0f} rows/s).")
+    return results
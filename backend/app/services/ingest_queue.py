@@ -0,0 +1,318 @@
+import atexit
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from app import db, socketio
+from app.models import SupportPressureData, MicroseismicEvent
+from app.services import ingest_service
+
+#==============================================================================
+# 异步摄入队列
+# 接口校验后将批次放入有界进程内队列并立即返回 202；
+# 后台 drain worker 将多个排队批次合并为一个大事务写库。
+# worker 只由服务进程入口 (run.py) 显式启动；进程退出时停止 worker 并清空队列，
+# 已返回 202 的批次不会随进程丢失 (强制终止进程除外)。
+#==============================================================================
+
+# 摄入类型 -> (模型, 载荷键, 接口名称, 业务时间字段)
+INGEST_KINDS = {
+    "kj653": (SupportPressureData, "records", "KJ653_API", "record_time"),
+    "sos": (MicroseismicEvent, "events", "SOS_API", "event_time")
+}
+
+class IngestQueueFull(Exception):
+    """队列已满 (背压)"""
+
+class IngestQueue:
+    """有界摄入队列与批次状态登记"""
+
+    def __init__(self):
+        self.app = None
+        self._queue = queue.Queue()
+        self._batches = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._workers_started = False
+        self._stop = threading.Event()
+        self._atexit_registered = False
+
+    def init_app(self, app):
+        """读取配置并重置状态 (不启动 worker，见 start)"""
+        # 重复初始化时先停掉旧 worker，避免其继续消费新队列
+        self._stop.set()
+        self._stop = threading.Event()
+        self.app = app
+        self.maxsize = app.config.get('INGEST_QUEUE_MAXSIZE', 1000)
+        self.max_drain_batches = app.config.get('INGEST_DRAIN_MAX_BATCHES', 50)
+        self.poll_interval = app.config.get('INGEST_DRAIN_POLL_INTERVAL', 0.2)
+        self.history_size = app.config.get('INGEST_BATCH_HISTORY', 10000)
+        self._queue = queue.Queue(maxsize=self.maxsize)
+        self._batches = OrderedDict()
+        self._counters = {
+            "submitted": 0,
+            "rejected": 0,
+            "processed_batches": 0,
+            "processed_rows": 0,
+            "failed_batches": 0,
+            "transactions": 0,
+            "latency_ms_last": 0.0,
+            "latency_ms_max": 0.0,
+            "latency_ms_total": 0.0
+        }
+        self._workers_started = False
+        self.workers = app.config.get('INGEST_QUEUE_WORKERS', 2)
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def start(self):
+        """
+        启动 drain worker (服务进程入口调用)。worker 数为 0 时不启动，重复调用无效。
+
+        Returns:
+            bool: 本次是否启动。
+        """
+        if self._workers_started or self.workers <= 0:
+            return False
+        self._workers_started = True
+        for _ in range(self.workers):
+            socketio.start_background_task(self._worker_loop, self._stop)
+        return True
+
+    def shutdown(self):
+        """
+        停止 worker 并写完队列中剩余批次 (进程退出时由 atexit 调用)。
+        drain 产生的接口日志随后立即刷新，不依赖日志缓冲自身的退出钩子顺序。
+
+        Returns:
+            int: 停机时写入的批次数。
+        """
+        self._stop.set()
+        self._workers_started = False
+        if self.app is None or self._queue.empty():
+            return 0
+        from app.services.interface_log_sink import interface_log_sink
+        with self.app.app_context():
+            try:
+                return self.drain_all()
+            finally:
+                db.session.remove()
+                interface_log_sink.flush()
+
+    # ------------------------------------------------------------------
+    # 生产端
+    # ------------------------------------------------------------------
+    def submit(self, kind, data):
+        """
+        校验载荷并入队。
+
+        Args:
+            kind: "kj653" 或 "sos"。
+            data: 原始请求载荷。
+
+        Returns:
+            dict: 批次状态 (含 batch_id)。
+
+        Raises:
+            ValueError: 载荷字段非法。
+            IngestQueueFull: 队列已满。
+        """
+        model, key, _, _ = INGEST_KINDS[kind]
+        records = data.get(key, [])
+        columns = ingest_service.build_column_batch(model, records) if records else {}
+
+        batch = {
+            "batch_id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": "QUEUED",
+            "rows": len(records),
+            "submitted_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "message": None
+        }
+        item = (batch["batch_id"], kind, columns, len(records), time.perf_counter())
+
+        with self._lock:
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self._counters["rejected"] += 1
+                raise IngestQueueFull(f"Ingest queue is full ({self.maxsize} batches).")
+            self._counters["submitted"] += 1
+            self._remember(batch)
+        return dict(batch)
+
+    def get_batch(self, batch_id):
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            return dict(batch) if batch else None
+
+    def stats(self):
+        """队列深度与延迟计数器"""
+        with self._lock:
+            c = dict(self._counters)
+        done = c["processed_batches"] + c["failed_batches"]
+        return {
+            "depth": self._queue.qsize(),
+            "capacity": self.maxsize,
+            "workers_running": self._workers_started,
+            "submitted": c["submitted"],
+            "rejected": c["rejected"],
+            "processed_batches": c["processed_batches"],
+            "processed_rows": c["processed_rows"],
+            "failed_batches": c["failed_batches"],
+            "transactions": c["transactions"],
+            "latency_ms": {
+                "last": round(c["latency_ms_last"], 2),
+                "max": round(c["latency_ms_max"], 2),
+                "avg": round(c["latency_ms_total"] / done, 2) if done else 0.0
+            }
+        }
+
+    # ------------------------------------------------------------------
+    # 消费端
+    # ------------------------------------------------------------------
+    def drain(self, max_batches=None):
+        """
+        取出至多 max_batches 个排队批次，按类型合并后在一个事务中写入。
+        需在应用上下文中调用；返回处理的批次数。
+        """
+        items = []
+        limit = max_batches or self.max_drain_batches
+        while len(items) < limit:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not items:
+            return 0
+
+        for batch_id, *_ in items:
+            self._update(batch_id, status="PROCESSING")
+
+        try:
+            logs = self._write(items)
+            db.session.commit()
+            self._finish(items, "DONE", transactions=1)
+            committed = items
+        except Exception:
+            db.session.rollback()
+            # 合并事务失败时逐批重试，隔离问题批次
+            logs = []
+            committed = []
+            for item in items:
+                try:
+                    logs.extend(self._write([item]))
+                    db.session.commit()
+                    self._finish([item], "DONE", transactions=1)
+                    committed.append(item)
+                except Exception as e:
+                    db.session.rollback()
+                    self._finish([item], "ERROR", message=str(e))
+                    logs.append((INGEST_KINDS[item[1]][2], "ERROR", f"Queued batch {item[0]} failed: {e}", 0, None))
+
+        # 报警判定在事务之外：判定失败不影响已提交批次的状态
+        self._check_alarms(committed)
+
+        from app.services.integration_service import _log_interface_call
+        for name, status, message, records, data_time in logs:
+            _log_interface_call(name, status, message, records=records, data_time=data_time)
+        return len(items)
+
+    def drain_all(self):
+        """清空队列 (测试与 shutdown 使用)"""
+        total = 0
+        while True:
+            count = self.drain()
+            if not count:
+                return total
+            total += count
+
+    def _write(self, items):
+        """按类型合并写入 (不提交)，返回待记录的接口日志"""
+        by_kind = {}
+        for _, kind, columns, size, _ in items:
+            by_kind.setdefault(kind, []).append((columns, size))
+
+        logs = []
+        for kind, batches in by_kind.items():
+            model, _, interface_name, time_field = INGEST_KINDS[kind]
+            columns, size = ingest_service.merge_column_batches(batches)
+            stats = ingest_service.insert_columns(model, columns, size, time_field=time_field)
+            logs.append((
+                interface_name, "SUCCESS",
+                f"Drained {len(batches)} queued batches, {stats['inserted']} rows saved, "
+                f"{stats['duplicates']} duplicates skipped ({stats['rows_per_sec']:.0f} rows/s).",
+                stats['rows'], stats['latest_time']
+            ))
+        return logs
+
+    def _check_alarms(self, items):
+        """
+        已提交批次按类型取最大值判定报警 (INGEST_ALARM_CHECK 开启时，每次 drain 每种类型至多一条)。
+        判定失败只记录错误。
+        """
+        if not items or not self.app.config.get('INGEST_ALARM_CHECK', False):
+            return
+        from app.services import auxiliary_service
+        try:
+            values = {}
+            for _, kind, columns, _, _ in items:
+                value = auxiliary_service.batch_alarm_value(kind, columns)
+                if value is not None and (values.get(kind) is None or value > values[kind]):
+                    values[kind] = value
+            for kind, value in values.items():
+                auxiliary_service.check_ingest_alarms(kind, value)
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception("Ingest alarm check failed for queued batches")
+
+    def _worker_loop(self, stop):
+        with self.app.app_context():
+            while not stop.is_set():
+                try:
+                    if not self.drain():
+                        socketio.sleep(self.poll_interval)
+                except Exception as e:
+                    print(f"INGEST WORKER ERROR: {e}")
+                    socketio.sleep(self.poll_interval)
+                finally:
+                    db.session.remove()
+
+    # ------------------------------------------------------------------
+    # 状态登记
+    # ------------------------------------------------------------------
+    def _remember(self, batch):
+        self._batches[batch["batch_id"]] = batch
+        while len(self._batches) > self.history_size:
+            self._batches.popitem(last=False)
+
+    def _update(self, batch_id, **fields):
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch:
+                batch.update(fields)
+
+    def _finish(self, items, status, message=None, transactions=0):
+        now = time.perf_counter()
+        with self._lock:
+            self._counters["transactions"] += transactions
+        finished_at = datetime.now().isoformat()
+        for batch_id, _, _, size, enqueued in items:
+            latency_ms = (now - enqueued) * 1000
+            self._update(batch_id, status=status, finished_at=finished_at, message=message)
+            with self._lock:
+                c = self._counters
+                if status == "DONE":
+                    c["processed_batches"] += 1
+                    c["processed_rows"] += size
+                else:
+                    c["failed_batches"] += 1
+                c["latency_ms_last"] = latency_ms
+                c["latency_ms_max"] = max(c["latency_ms_max"], latency_ms)
+                c["latency_ms_total"] += latency_ms
+
+ingest_queue = IngestQueue()
@@ -0,0 +1,262 @@
+import csv
+import io
+import time
+from datetime import datetime
+from sqlalchemy import insert, UniqueConstraint
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+
+#==============================================================================
+# 批量摄入引擎
+# 整批记录按列解析与类型转换，再以单条多行插入写库：
+# PostgreSQL 使用 COPY，其他方言 (SQLite) 回退为 executemany；
+# 带自然键的表以 ON CONFLICT DO NOTHING 幂等写入。
+#==============================================================================
+
+_MISSING = object()
+
+def _convert_datetime(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value
+
+def _column_converter(column):
+    """根据列类型返回单值转换函数"""
+    try:
+        py_type = column.type.python_type
+    except NotImplementedError:
+        return None
+    if py_type is datetime:
+        return _convert_datetime
+    if py_type in (int, float, str):
+        return py_type
+    return None
+
+def _column_default(column):
+    """计算列的 Python 端默认值 (整批共用一次，例如 record_time=datetime.now)"""
+    default = column.default
+    if default is None or column.primary_key:
+        return _MISSING
+    if default.is_callable:
+        return default.arg(None)
+    if default.is_scalar:
+        return default.arg
+    return _MISSING
+
+def build_column_batch(model, records):
+    """
+    将记录列表转换为按列存储的批次。
+
+    Args:
+        model: 目标 ORM 模型类。
+        records: 字典列表，键为模型字段名。
+
+    Returns:
+        dict: {列名: 已转换的值列表}，所有列等长。
+
+    Raises:
+        ValueError: 记录中包含模型不存在的字段。
+    """
+    table = model.__table__
+    present = set()
+    for r in records:
+        present.update(r.keys())
+
+    unknown = present - set(table.columns.keys())
+    if unknown:
+        raise ValueError(f"Unknown field(s) for {table.name}: {', '.join(sorted(unknown))}")
+
+    columns = {}
+    for column in table.columns:
+        default = _column_default(column)
+        if column.name not in present and default is _MISSING:
+            continue
+
+        # 部分记录缺少该字段时取列默认值，无默认值则为 NULL
+        fill = None if default is _MISSING else default
+        values = [r.get(column.name, fill) for r in records]
+
+        convert = _column_converter(column)
+        if convert is not None:
+            values = [None if v is None else convert(v) for v in values]
+        columns[column.name] = values
+    return columns
+
+def _fill_required(table, columns, size):
+    """
+    NOT NULL 且有默认值的列 (如自然键中的测站号) 缺失或为 None 时以默认值补齐，
+    以免自然键含 NULL 而无法去重。
+    """
+    for column in table.columns:
+        if column.nullable:
+            continue
+        default = _column_default(column)
+        if default is _MISSING:
+            continue
+        values = columns.get(column.name)
+        if values is None:
+            columns[column.name] = [default] * size
+        elif any(v is None for v in values):
+            columns[column.name] = [default if v is None else v for v in values]
+
+def natural_key(model):
+    """返回模型自然键列名 (名为 uq_<表名>_natural_key 的唯一约束)，无则返回 None"""
+    table = model.__table__
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint) and constraint.name == f"uq_{table.name}_natural_key":
+            return [c.name for c in constraint.columns]
+    return None
+
+def _copy_rows(table, columns, conflict_keys=None):
+    """
+    PostgreSQL COPY 写入 (在当前会话事务内执行)，返回实际插入行数。
+    指定 conflict_keys 时先 COPY 到临时表，再 INSERT ... SELECT ... ON CONFLICT DO NOTHING。
+    """
+    names = list(columns.keys())
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    count = 0
+    for row in zip(*(columns[n] for n in names)):
+        count += 1
+        writer.writerow([
+            r'\N' if v is None else (v.isoformat() if isinstance(v, datetime) else v)
+            for v in row
+        ])
+    buf.seek(0)
+
+    column_list = ', '.join(names)
+    target = table.name if not conflict_keys else f"_stage_{table.name}"
+    cursor = db.session.connection().connection.cursor()
+    try:
+        if conflict_keys:
+            cursor.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS {target} (LIKE {table.name}) ON COMMIT DELETE ROWS"
+            )
+        cursor.copy_expert(
+            f"COPY {target} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buf
+        )
+        if not conflict_keys:
+            return count
+        cursor.execute(
+            f"INSERT INTO {table.name} ({column_list}) SELECT {column_list} FROM {target} "
+            f"ON CONFLICT ({', '.join(conflict_keys)}) DO NOTHING"
+        )
+        inserted = cursor.rowcount
+        cursor.execute(f"TRUNCATE {target}")
+        return inserted
+    finally:
+        cursor.close()
+
+def _supports_copy():
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    cursor = db.session.connection().connection.cursor()
+    try:
+        return hasattr(cursor, 'copy_expert')
+    finally:
+        cursor.close()
+
+def _insert_statement(table, conflict_keys):
+    """按方言构造 INSERT；有自然键时附加 ON CONFLICT DO NOTHING"""
+    dialect = db.engine.dialect.name
+    if conflict_keys and dialect == 'postgresql':
+        return pg_insert(table).on_conflict_do_nothing(index_elements=conflict_keys)
+    if conflict_keys and dialect == 'sqlite':
+        return sqlite_insert(table).on_conflict_do_nothing(index_elements=conflict_keys)
+    return insert(table)
+
+def merge_column_batches(batches):
+    """
+    合并多个按列批次 (字段集合可不同，缺失列以 None 补齐)。
+
+    Args:
+        batches: (columns, size) 元组列表。
+
+    Returns:
+        tuple: (合并后的 columns, 总行数)
+    """
+    names = []
+    for columns, _ in batches:
+        names.extend(n for n in columns if n not in names)
+
+    merged = {n: [] for n in names}
+    total = 0
+    for columns, size in batches:
+        for n in names:
+            merged[n].extend(columns.get(n, [None] * size))
+        total += size
+    return merged, total
+
+def insert_columns(model, columns, size, upsert=True, time_field=None):
+    """
+    以单条多行插入写入已按列转换的批次，不经过 ORM 对象与 identity map。
+    模型定义了自然键时按幂等方式写入：重复行只消耗一次索引探测，不产生新行。
+    调用方负责 commit/rollback。
+
+    Args:
+        time_field: 业务时间列名；指定时在结果中返回该批最新时间 latest_time。
+
+    Returns:
+        dict: {"rows", "inserted", "duplicates", "elapsed", "rows_per_sec", "method", "latest_time"}
+    """
+    started = time.perf_counter()
+    table = model.__table__
+    conflict_keys = natural_key(model) if upsert else None
+    method = "none"
+    inserted = 0
+
+    if size:
+        _fill_required(table, columns, size)
+
+    if size and hasattr(model, 'derive_columns'):
+        # 派生列 (如微震事件的空间网格编号) 不经 ORM 事件，在此按列补齐
+        model.derive_columns(columns)
+
+    if size:
+        if _supports_copy():
+            method = "copy"
+            inserted = _copy_rows(table, columns, conflict_keys)
+        else:
+            method = "executemany"
+            names = list(columns.keys())
+            rows = [dict(zip(names, row)) for row in zip(*(columns[n] for n in names))]
+            result = db.session.execute(_insert_statement(table, conflict_keys), rows)
+            inserted = result.rowcount if result.rowcount is not None and result.rowcount >= 0 else size
+
+    if inserted:
+        # 同一事务内增量维护趋势聚合 (未配置聚合的模型直接返回)
+        from app.services import rollup_service
+        rollup_service.on_insert(model, columns)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": size,
+        "inserted": inserted,
+        "duplicates": size - inserted,
+        "elapsed": elapsed,
+        "rows_per_sec": size / elapsed if elapsed > 0 else 0.0,
+        "method": method,
+        "latest_time": max(filter(None, columns.get(time_field, [])), default=None) if time_field else None
+    }
+
+def bulk_insert(model, records, upsert=True, time_field=None):
+    """
+    按列解析整批记录并一次写入。调用方负责 commit/rollback。
+
+    Args:
+        model: 目标 ORM 模型类。
+        records: 字典列表。
+        upsert: 是否按自然键去重写入。
+        time_field: 业务时间列名，见 insert_columns。
+
+    Returns:
+        dict: 同 insert_columns，elapsed 含解析耗时。
+    """
+    started = time.perf_counter()
+    columns = build_column_batch(model, records) if records else {}
+    stats = insert_columns(model, columns, len(records), upsert=upsert, time_field=time_field)
+    stats["elapsed"] = time.perf_counter() - started
+    stats["rows_per_sec"] = stats["rows"] / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+    return stats
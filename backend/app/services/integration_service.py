@@ -1,98 +1,179 @@
 import json
+from flask import current_app
 from app import db
 from app.models import SupportPressureData, MicroseismicEvent, InterfaceLog
-from datetime import datetime
+from app.services import ingest_service, auxiliary_service
+from app.services.interface_log_sink import interface_log_sink
+from app.services.interface_health import interface_health
 
-def _log_interface_call(name, status, message, payload=None):
-    """辅助函数：记录接口调用日志"""
+def _log_interface_call(name, status, message, payload=None, records=0, data_time=None):
+    """辅助函数：记录接口调用日志 (经缓冲写入器批量落库)，并更新内存健康状态"""
+    interface_health.record(name, status == "SUCCESS", records=records, data_time=data_time, message=message)
     try:
-        log = InterfaceLog(
-            interface_name=name,
-            status=status,
-            message=message,
-            payload=json.dumps(payload) if payload else None
-        )
-        db.session.add(log)
-        db.session.commit()
+        interface_log_sink.emit(name, status, message, payload=payload)
     except Exception as e:
         print(f"FAILED TO LOG: {e}")
 
+def _saved_message(stats, label):
+    """摄入成功消息；有重发重复行时附带跳过数量"""
+    msg = f"Successfully saved {stats['inserted']} {label}."
+    if stats['duplicates']:
+        msg = f"{msg[:-1]} ({stats['duplicates']} duplicates skipped)."
+    return msg
+
+def _check_alarms(kind, records):
+    """
+    实时摄入提交后的报警判定 (INGEST_ALARM_CHECK 开启时)，返回产生的报警。
+    数据已提交，判定失败只记录错误，不影响摄入结果。
+    """
+    if not current_app.config.get('INGEST_ALARM_CHECK', False):
+        return []
+    try:
+        _, fields = auxiliary_service.INGEST_ALARM_FIELDS[kind]
+        columns = {f: [r.get(f) for r in records] for f in fields}
+        return auxiliary_service.check_ingest_alarms(kind, auxiliary_service.batch_alarm_value(kind, columns))
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Ingest alarm check failed for %s batch", kind)
+        return []
+
 def save_kj653_data(data):
     """
     Saves KJ653 data to the database.
     Expects data format: {"records": [...list of SupportPressureData fields...]}
+    整批按列解析后经批量摄入引擎一次写入，按自然键幂等去重；提交后按配置判定报警。
+    Returns: (success, message, stats)
     """
     try:
         records = data.get('records', [])
-        count = 0
-        for r in records:
-            # 转换时间字符串为 datetime 对象 (假设输入是 ISO 格式)
-            if 'record_time' in r and isinstance(r['record_time'], str):
-                r['record_time'] = datetime.fromisoformat(r['record_time'])
-            
-            new_record = SupportPressureData(**r)
-            db.session.add(new_record)
-            count += 1
-        
+        stats = ingest_service.bulk_insert(SupportPressureData, records, time_field="record_time")
         db.session.commit()
-        msg = f"Successfully saved {count} KJ653 records."
-        _log_interface_call("KJ653_API", "SUCCESS", msg)
-        return True, msg
+        msg = _saved_message(stats, "KJ653 records")
+        _log_interface_call("KJ653_API", "SUCCESS", f"{msg} ({stats['rows_per_sec']:.0f} rows/s)",
+                            records=stats['rows'], data_time=stats['latest_time'])
     except Exception as e:
         db.session.rollback()
         err_msg = f"KJ653 Save Error: {str(e)}"
         _log_interface_call("KJ653_API", "ERROR", err_msg, payload=data)
-        return False, err_msg
+        return False, err_msg, None
+    _check_alarms("kj653", records)
+    return True, msg, stats
 
 def save_sos_data(data):
     """
     Saves SOS data to the database.
     Expects data format: {"events": [...list of MicroseismicEvent fields...]}
+    整批按列解析后经批量摄入引擎一次写入，按自然键幂等去重；提交后按配置判定报警。
+    Returns: (success, message, stats)
     """
     try:
         events = data.get('events', [])
-        count = 0
-        for e in events:
-            if 'event_time' in e and isinstance(e['event_time'], str):
-                e['event_time'] = datetime.fromisoformat(e['event_time'])
-            
-            new_event = MicroseismicEvent(**e)
-            db.session.add(new_event)
-            count += 1
-            
+        stats = ingest_service.bulk_insert(MicroseismicEvent, events, time_field="event_time")
         db.session.commit()
-        msg = f"Successfully saved {count} SOS events."
-        _log_interface_call("SOS_API", "SUCCESS", msg)
-        return True, msg
+        msg = _saved_message(stats, "SOS events")
+        _log_interface_call("SOS_API", "SUCCESS", f"{msg} ({stats['rows_per_sec']:.0f} rows/s)",
+                            records=stats['rows'], data_time=stats['latest_time'])
     except Exception as e:
         db.session.rollback()
         err_msg = f"SOS Save Error: {str(e)}"
         _log_interface_call("SOS_API", "ERROR", err_msg, payload=data)
-        return False, err_msg
+        return False, err_msg, None
+    _check_alarms("sos", events)
+    return True, msg, stats
+
+def stream_ingest(kind, lines, batch_size=5000):
+    """
+    NDJSON 流式摄入：逐行解析，每 batch_size 条写库并提交一次，内存占用与上传大小无关。
+
+    Args:
+        kind: "kj653" 或 "sos"。
+        lines: 可迭代的字节/字符串行 (例如 request.stream)。
+        batch_size: 每个分块的记录数。
+
+    Returns:
+        tuple: (success, message, result)，result 含累计计数与逐块进度 chunks。
+        失败时此前的分块已提交：result 另含 committed_rows / committed_chunks 与
+        resume_line (客户端从该行起重发即可续传)，partial 表示是否已有分块提交。
+    """
+    from app.services.ingest_queue import INGEST_KINDS
+
+    model, _, interface_name, time_field = INGEST_KINDS[kind]
+    result = {"rows": 0, "inserted": 0, "duplicates": 0, "chunks": []}
+    latest_time = None
+    buffer = []
+    line_no = committed_line = 0
+
+    def flush():
+        nonlocal latest_time, committed_line
+        stats = ingest_service.bulk_insert(model, buffer, time_field=time_field)
+        db.session.commit()
+        if stats["latest_time"] and (latest_time is None or stats["latest_time"] > latest_time):
+            latest_time = stats["latest_time"]
+        result["rows"] += stats["rows"]
+        result["inserted"] += stats["inserted"]
+        result["duplicates"] += stats["duplicates"]
+        result["chunks"].append({
+            "chunk": len(result["chunks"]) + 1,
+            "rows": stats["rows"],
+            "inserted": stats["inserted"],
+            "duplicates": stats["duplicates"],
+            "total_rows": result["rows"],
+            "rows_per_sec": round(stats["rows_per_sec"], 1)
+        })
+        committed_line = line_no
+        current_app.logger.info("Stream ingest %s: chunk %d committed, %d rows so far",
+                                interface_name, len(result["chunks"]), result["rows"])
+        buffer.clear()
+
+    try:
+        for line_no, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            buffer.append(json.loads(line))
+            if len(buffer) >= batch_size:
+                flush()
+        if buffer:
+            flush()
+    except Exception as e:
+        db.session.rollback()
+        result.update({
+            "partial": bool(result["chunks"]),
+            "committed_rows": result["rows"],
+            "committed_chunks": len(result["chunks"]),
+            "resume_line": committed_line + 1
+        })
+        err_msg = (f"{kind.upper()} Stream Error at line {line_no}: {str(e)} "
+                   f"({result['committed_rows']} rows in {result['committed_chunks']} chunks committed; "
+                   f"resume from line {result['resume_line']})")
+        _log_interface_call(interface_name, "ERROR", err_msg)
+        return False, err_msg, result
+
+    msg = f"Successfully streamed {result['inserted']} {kind.upper()} rows in {len(result['chunks'])} chunks."
+    _log_interface_call(interface_name, "SUCCESS", msg, records=result["rows"], data_time=latest_time)
+    return True, msg, result
 
 def get_all_interface_statuses():
     """
-    Checks and returns the status of all data interfaces by checking the last update time.
-    """
-    interfaces = ["KJ653_API", "SOS_API"]
-    results = {}
-    
-    for name in interfaces:
-        last_log = InterfaceLog.query.filter_by(interface_name=name).order_by(InterfaceLog.timestamp.desc()).first()
-        if last_log:
-            results[name] = {
-                "status": "Online" if last_log.status == "SUCCESS" else "Error",
-                "details": f"Last sync: {last_log.timestamp.isoformat()}, Message: {last_log.message}"
-            }
-        else:
-            results[name] = { "status": "Unknown", "details": "No logs found for this interface." }
-            
-    return results
+    Returns the status of all data interfaces from the in-memory health registry.
+    由摄入路径实时更新，无需查询 interface_log。
+    """
+    return interface_health.statuses()
+
+def get_interface_health():
+    """
+    接口健康详情：各接口状态与滚动同步成功率 KPI。
+    """
+    return {
+        "interfaces": interface_health.statuses(),
+        "sync_kpi": interface_health.sync_kpi()
+    }
 
 def get_all_interface_logs(limit=100):
     """
     Retrieves the latest interface logs from the database.
     """
+    interface_log_sink.flush()
     logs = InterfaceLog.query.order_by(InterfaceLog.timestamp.desc()).limit(limit).all()
     return [
         {
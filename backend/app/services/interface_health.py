@@ -0,0 +1,163 @@
+import threading
+from collections import deque
+from datetime import datetime
+from app.models import InterfaceLog
+
+#==============================================================================
+# 接口健康状态登记表
+# 由摄入路径直接更新，状态接口从内存读取，不再逐次扫描 interface_log。
+# 滚动窗口按分钟分桶，记录与查询的开销与数据量无关。
+#==============================================================================
+
+MONITORED_INTERFACES = ["KJ653_API", "SOS_API"]
+
+def _minute_key(ts):
+    return int(ts.timestamp() // 60)
+
+class _InterfaceState:
+    """单个接口的健康状态"""
+
+    def __init__(self, window_minutes):
+        self.last_status = None
+        self.last_message = None
+        self.last_success = None
+        self.last_error = None
+        self.last_data_time = None
+        # 每分钟一个桶: [minute, success, error, records]
+        self.buckets = deque(maxlen=window_minutes)
+
+    def bucket(self, ts):
+        key = _minute_key(ts)
+        if not self.buckets or self.buckets[-1][0] != key:
+            self.buckets.append([key, 0, 0, 0])
+        return self.buckets[-1]
+
+class InterfaceHealthRegistry:
+    """进程内接口健康登记表"""
+
+    def __init__(self):
+        self.window_minutes = 60
+        self.success_target = 99.9
+        self._states = {}
+        self._lock = threading.Lock()
+        self._warmed = False
+
+    def init_app(self, app):
+        self.window_minutes = app.config.get('INTERFACE_HEALTH_WINDOW_MINUTES', 60)
+        self.success_target = app.config.get('INTERFACE_SYNC_SUCCESS_TARGET', 99.9)
+        self._states = {}
+        self._warmed = False
+
+    def record(self, name, ok, records=0, data_time=None, message=None, now=None):
+        """
+        记录一次接口同步结果。
+
+        Args:
+            name: 接口名称，例如 "KJ653_API"。
+            ok: 同步是否成功。
+            records: 本次写入的记录数。
+            data_time: 本次数据中最新的业务时间，用于计算数据滞后。
+            message: 状态描述。
+            now: 记录时间 (默认当前时间)。
+        """
+        now = now or datetime.now()
+        with self._lock:
+            state = self._states.get(name)
+            if state is None:
+                state = self._states[name] = _InterfaceState(self.window_minutes)
+            bucket = state.bucket(now)
+            if ok:
+                bucket[1] += 1
+                bucket[3] += records
+                state.last_success = now
+            else:
+                bucket[2] += 1
+                state.last_error = now
+            state.last_status = "SUCCESS" if ok else "ERROR"
+            state.last_message = message
+            if data_time and (state.last_data_time is None or data_time > state.last_data_time):
+                state.last_data_time = data_time
+
+    def _warm_from_logs(self):
+        """进程启动后首次查询时，从日志表恢复各接口的最后状态 (仅一次)"""
+        self._warmed = True
+        for name in MONITORED_INTERFACES:
+            if name in self._states:
+                continue
+            last_log = InterfaceLog.query.filter_by(interface_name=name).order_by(InterfaceLog.timestamp.desc()).first()
+            if last_log:
+                state = self._states[name] = _InterfaceState(self.window_minutes)
+                state.last_status = last_log.status
+                state.last_message = last_log.message
+                if last_log.status == "SUCCESS":
+                    state.last_success = last_log.timestamp
+                else:
+                    state.last_error = last_log.timestamp
+
+    def _window_counts(self, state, now):
+        """滚动窗口内的 (成功次数, 失败次数, 记录数)"""
+        oldest = _minute_key(now) - self.window_minutes + 1
+        success = error = records = 0
+        for minute, s, e, r in state.buckets:
+            if minute >= oldest:
+                success += s
+                error += e
+                records += r
+        return success, error, records
+
+    def _summarize(self, state, now):
+        success, error, records = self._window_counts(state, now)
+        total = success + error
+        last_sync = max(filter(None, [state.last_success, state.last_error]), default=None)
+
+        if state.last_status is None:
+            status = "Unknown"
+        else:
+            status = "Online" if state.last_status == "SUCCESS" else "Error"
+
+        return {
+            "status": status,
+            "details": (f"Last sync: {last_sync.isoformat()}, Message: {state.last_message}"
+                        if last_sync else "No logs found for this interface."),
+            "last_success": state.last_success.isoformat() if state.last_success else None,
+            "last_error": state.last_error.isoformat() if state.last_error else None,
+            "success_rate": round(success / total * 100, 3) if total else None,
+            "calls": total,
+            "records_per_min": round(records / self.window_minutes, 2),
+            "lag_seconds": round((now - state.last_data_time).total_seconds(), 1) if state.last_data_time else None
+        }
+
+    def statuses(self, now=None):
+        """各接口状态 (兼容 /interfaces/status 原有的 status/details 字段)"""
+        now = now or datetime.now()
+        if not self._warmed:
+            self._warm_from_logs()
+        with self._lock:
+            results = {}
+            for name in MONITORED_INTERFACES + [n for n in self._states if n not in MONITORED_INTERFACES]:
+                state = self._states.get(name)
+                if state is None:
+                    results[name] = {"status": "Unknown", "details": "No logs found for this interface."}
+                else:
+                    results[name] = self._summarize(state, now)
+            return results
+
+    def sync_kpi(self, now=None):
+        """滚动窗口内的数据同步成功率 KPI (需求要求 ≥99.9%)"""
+        now = now or datetime.now()
+        success = calls = 0
+        with self._lock:
+            for state in self._states.values():
+                s, e, _ = self._window_counts(state, now)
+                success += s
+                calls += s + e
+        rate = round(success / calls * 100, 3) if calls else None
+        return {
+            "window_minutes": self.window_minutes,
+            "target": self.success_target,
+            "calls": calls,
+            "success_rate": rate,
+            "met": rate is None or rate >= self.success_target
+        }
+
+interface_health = InterfaceHealthRegistry()
@@ -0,0 +1,156 @@
+import atexit
+import base64
+import hashlib
+import json
+import threading
+import zlib
+from datetime import datetime
+from sqlalchemy import insert
+from app import db, socketio
+from app.models import InterfaceLog
+
+#==============================================================================
+# 接口日志缓冲写入器
+# 接口日志先进入内存缓冲，按数量阈值或定时批量写库，避免每次摄入额外提交一次；
+# 超长错误载荷以压缩或截断+内容哈希的形式存储。
+# 定时刷新任务只由服务进程入口 (run.py) 启动；命令行进程依靠数量阈值与退出时刷新。
+#==============================================================================
+
+COMPRESSED_PREFIX = "zlib+b64:"
+
+def encode_payload(payload, limit):
+    """
+    将载荷编码为 InterfaceLog.payload 文本。
+
+    不超过 limit 字符时原样存 JSON；否则尝试 zlib 压缩 (加前缀 COMPRESSED_PREFIX)，
+    压缩后仍超限则截断，并附带原文长度与 SHA-256 以便追溯。截断后的整段 JSON 不超过 limit：
+    head 取转义后仍放得下的最长前缀；limit 连摘要信息都容不下时返回 None (不存载荷)。
+    """
+    if payload is None:
+        return None
+    text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False, default=str)
+    if len(text) <= limit:
+        return text
+
+    raw = text.encode('utf-8')
+    compressed = COMPRESSED_PREFIX + base64.b64encode(zlib.compress(raw, 6)).decode('ascii')
+    if len(compressed) <= limit:
+        return compressed
+
+    envelope = {"truncated": True, "size": len(raw), "sha256": hashlib.sha256(raw).hexdigest(), "head": ""}
+    budget = limit - len(json.dumps(envelope, ensure_ascii=False))
+    if budget < 0:
+        return None
+    # 转义 (引号、反斜杠、控制字符) 会使 head 变长：二分查找转义后不超过 budget 的最长前缀
+    low, high = 0, min(len(text), budget)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if len(json.dumps(text[:mid], ensure_ascii=False)) - 2 <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    envelope["head"] = text[:low]
+    return json.dumps(envelope, ensure_ascii=False)
+
+def decode_payload(text):
+    """还原 encode_payload 的压缩格式；其他格式原样返回"""
+    if text and text.startswith(COMPRESSED_PREFIX):
+        return zlib.decompress(base64.b64decode(text[len(COMPRESSED_PREFIX):])).decode('utf-8')
+    return text
+
+class InterfaceLogSink:
+    """缓冲 InterfaceLog 记录并批量写库"""
+
+    def __init__(self):
+        self.app = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._atexit_registered = False
+        self._stop = threading.Event()
+        self.started = False
+
+    def init_app(self, app):
+        # 重复初始化时先停掉旧的定时刷新任务
+        self._stop.set()
+        self._stop = threading.Event()
+        self.started = False
+        self.app = app
+        self.flush_size = app.config.get('INTERFACE_LOG_FLUSH_SIZE', 200)
+        self.flush_interval = app.config.get('INTERFACE_LOG_FLUSH_INTERVAL', 2.0)
+        self.payload_limit = app.config.get('INTERFACE_LOG_PAYLOAD_LIMIT', 4096)
+        self.max_buffer = max(self.flush_size * 10, 1000)
+        self._buffer = []
+
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def start(self):
+        """
+        启动定时刷新任务 (服务进程入口调用)。刷新间隔为 0 时不启动，重复调用无效。
+
+        Returns:
+            bool: 本次是否启动。
+        """
+        if self.started or self.flush_interval <= 0:
+            return False
+        self.started = True
+        socketio.start_background_task(self._flush_loop, self._stop)
+        return True
+
+    def emit(self, name, status, message, payload=None):
+        """写入一条接口日志 (缓冲)，达到数量阈值时立即刷新"""
+        row = {
+            "timestamp": datetime.now(),
+            "interface_name": name,
+            "status": status,
+            "message": message,
+            "payload": encode_payload(payload, self.payload_limit)
+        }
+        with self._lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.flush_size
+        if full:
+            self.flush()
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """
+        将缓冲写库。使用独立连接与事务，不影响调用方会话。
+        需在应用上下文中调用；返回写入条数。
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(insert(InterfaceLog.__table__), rows)
+                return len(rows)
+            except Exception as e:
+                print(f"FAILED TO FLUSH INTERFACE LOGS: {e}")
+                with self._lock:
+                    # 失败的记录放回缓冲等待下次重试，超出上限的最旧记录丢弃
+                    self._buffer = (rows + self._buffer)[-self.max_buffer:]
+                return 0
+
+    def shutdown(self):
+        """停机时停止定时刷新并显式刷新，确保不丢日志"""
+        self._stop.set()
+        if self.app is None or not self.pending():
+            return
+        with self.app.app_context():
+            self.flush()
+
+    def _flush_loop(self, stop):
+        with self.app.app_context():
+            while not stop.is_set():
+                socketio.sleep(self.flush_interval)
+                self.flush()
+
+interface_log_sink = InterfaceLogSink()
@@ -0,0 +1,184 @@
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, func
+from app import db
+from app.models import MicroseismicEvent
+from app.services import spatial_service
+
+#==============================================================================
+# 微震三维点云分级显示 (LOD)
+# 区域 (相机范围 bbox) 内事件数不超过 LOD_POINT_THRESHOLD 时返回原始点，
+# 否则按体素聚合：每个体素返回事件数、总能量与最大能量，前端每个体素绘制一个实例。
+# 体素网格以坐标原点对齐，相机移动时体素位置稳定；聚合以 NumPy 向量化完成，
+# 结果按 (时间窗, 体素边长, 区域, 能量下限) 缓存在进程内，区域内事件数或最大 id 变化时失效。
+#==============================================================================
+
+LOD_MODES = ("auto", "points", "voxels")
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+def nice_size(value):
+    """向上取整到 1/2/5 x 10^k，便于不同相机范围复用缓存"""
+    if value <= 0:
+        raise ValueError("voxel_size must be positive")
+    exponent = math.floor(math.log10(value))
+    for step in (1, 2, 5, 10):
+        size = step * 10 ** exponent
+        if size >= value * (1 - 1e-9):
+            return float(size)
+
+def voxel_aggregate(coords, energy, voxel_size):
+    """
+    按体素聚合事件。
+
+    Args:
+        coords (np.ndarray): (n, 3) 坐标 (E, N, Z)。
+        energy (np.ndarray): (n,) 能量，NaN 表示缺失。
+        voxel_size (float): 体素边长 (m)。
+
+    Returns:
+        dict: {"index" (k, 3) 体素整数坐标, "center" (k, 3), "count", "energy_sum", "energy_max"}，
+              按体素坐标字典序排列。
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+    energy = np.asarray(energy, dtype=float)
+    keys = np.floor(coords / voxel_size).astype(np.int64)
+    if not len(keys):
+        empty = np.empty((0, 3))
+        return {"index": empty.astype(np.int64), "center": empty, "count": np.empty(0, np.int64),
+                "energy_sum": np.empty(0), "energy_max": np.empty(0)}
+
+    # 三维体素坐标编码为一维键再排序分组；跨度过大无法编码时按行去重
+    offset = keys.min(axis=0)
+    dims = keys.max(axis=0) - offset + 1
+    if float(np.prod(dims.astype(float))) < 2 ** 62:
+        linear = np.ravel_multi_index((keys - offset).T, dims)
+        _, first, inverse, counts = np.unique(linear, return_index=True, return_inverse=True, return_counts=True)
+        index = keys[first]
+    else:
+        index, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+
+    energy_sum = np.bincount(inverse, weights=np.nan_to_num(energy), minlength=len(counts))
+    order = np.argsort(inverse, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    # fmax 忽略 NaN；整个体素均无能量时结果为 NaN
+    energy_max = np.fmax.reduceat(energy[order], starts)
+    return {
+        "index": index,
+        "center": (index + 0.5) * voxel_size,
+        "count": counts,
+        "energy_sum": energy_sum,
+        "energy_max": energy_max
+    }
+
+def _region_clauses(bbox, start, end, min_energy):
+    clauses = spatial_service.filter_clauses(start, end, min_energy)
+    clauses += [MicroseismicEvent.coord_x.isnot(None), MicroseismicEvent.coord_y.isnot(None),
+                MicroseismicEvent.coord_z.isnot(None)]
+    if bbox:
+        clauses += spatial_service.box_clauses(bbox)
+    return clauses
+
+def _region_stats(clauses):
+    """区域内事件数、最大 id 与坐标范围 (缓存校验与自动体素边长)"""
+    t = MicroseismicEvent
+    row = db.session.execute(select(
+        func.count(), func.max(t.id),
+        func.min(t.coord_x), func.min(t.coord_y), func.min(t.coord_z),
+        func.max(t.coord_x), func.max(t.coord_y), func.max(t.coord_z)
+    ).where(*clauses)).one()
+    return row[0], row[1], row[2:]
+
+def _auto_voxel_size(bbox, extent):
+    """区域最大跨度 / LOD_GRID_DIVISIONS；bbox 未限定的维度取数据范围"""
+    lows, highs = list(extent[:3]), list(extent[3:])
+    if bbox:
+        for axis in range(3):
+            if bbox[axis] is not None:
+                lows[axis] = bbox[axis]
+            if bbox[axis + 3] is not None:
+                highs[axis] = bbox[axis + 3]
+    span = max((h - l for l, h in zip(lows, highs) if l is not None and h is not None), default=0.0)
+    return nice_size(max(span / current_app.config['LOD_GRID_DIVISIONS'], 1.0))
+
+def _load_voxels(clauses, voxel_size):
+    t = MicroseismicEvent
+    rows = db.session.execute(select(t.coord_x, t.coord_y, t.coord_z, t.energy).where(*clauses)).all()
+    data = np.array([tuple(r) for r in rows], dtype=float).reshape(-1, 4)
+    result = voxel_aggregate(data[:, :3], data[:, 3], voxel_size)
+    center = result["center"]
+    return [
+        {
+            "x": float(cx),
+            "y": float(cz),  # 与微震点相同的 3D 映射：Y 为高程
+            "z": float(-cy),  # Z 为北向取反
+            "count": int(n),
+            "energy_sum": float(total),
+            "energy_max": None if np.isnan(peak) else float(peak)
+        } for (cx, cy, cz), n, total, peak in zip(center, result["count"], result["energy_sum"], result["energy_max"])
+    ]
+
+def _cached_voxels(key, token, clauses, voxel_size):
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit and hit[0] == token:
+            _cache.move_to_end(key)
+            return hit[1], True
+    voxels = _load_voxels(clauses, voxel_size)
+    with _cache_lock:
+        _cache[key] = (token, voxels)
+        _cache.move_to_end(key)
+        while len(_cache) > current_app.config['LOD_CACHE_SIZE']:
+            _cache.popitem(last=False)
+    return voxels, False
+
+def microseismic_lod(params):
+    """
+    微震点云 LOD 查询。
+
+    Args:
+        params (dict): lod (auto | points | voxels，默认 auto)、voxel_size (m，缺省时自动)、
+            bbox、start、end、min_energy、limit (原始点模式)。
+
+    Returns:
+        dict: 原始点模式 {"mode": "points", "events": spatial_service.query_events 结果, "total" (仅 auto)}；
+              体素模式 {"mode": "voxels", "total", "voxel_size", "cached", "voxels": [...]}。
+
+    Raises:
+        ValueError: 参数错误。
+    """
+    mode = params.get('lod') or 'auto'
+    if mode not in LOD_MODES:
+        raise ValueError(f"Invalid lod mode: {mode}")
+    if mode != 'points' and (params.get('center') or params.get('borehole_id')):
+        raise ValueError("Voxel LOD supports bbox regions only")
+
+    if mode == 'points':
+        return {"mode": "points", "events": spatial_service.query_events(params)}
+
+    start, end, min_energy = spatial_service.parse_filters(params)
+    bbox = spatial_service.parse_bbox(params['bbox']) if params.get('bbox') else None
+    clauses = _region_clauses(bbox, start, end, min_energy)
+    total, max_id, extent = _region_stats(clauses)
+
+    threshold = current_app.config['LOD_POINT_THRESHOLD']
+    if mode == 'auto' and total <= threshold:
+        events = spatial_service.query_events(dict(params, limit=max(total, 1)))
+        return {"mode": "points", "total": total, "events": events}
+
+    voxel_size = float(params['voxel_size']) if params.get('voxel_size') not in (None, '') \
+        else _auto_voxel_size(bbox, extent)
+    if not voxel_size > 0:
+        raise ValueError("voxel_size must be positive")
+    key = (start, end, voxel_size, bbox, min_energy)
+    voxels, cached = _cached_voxels(key, (total, max_id), clauses, voxel_size)
+    return {"mode": "voxels", "total": total, "voxel_size": voxel_size, "cached": cached, "voxels": voxels}
@@ -0,0 +1,139 @@
+import glob
+import hashlib
+import os
+import time
+import pandas as pd
+from app.services.history_loader import HISTORY_KINDS, parse_workbook, file_hash
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 为可选依赖，缺失时直接解析源文件
+    pq = None
+
+#==============================================================================
+# 源工作簿 Parquet 列式缓存
+# 每个 xls/xlsx 只经 parse_workbook 解析一次，规范化、带类型的结果写为 Parquet，
+# 以源文件内容哈希为键；源文件变化后哈希变化，旧缓存随新缓存写入而删除。
+# 读取时支持列裁剪与谓词下推 (按业务时间排序写入，行组统计可跳过无关数据)。
+#==============================================================================
+
+# parse_workbook 输出结构变化时递增，使既有缓存整体失效
+CACHE_VERSION = 1
+ROW_GROUP_SIZE = 16384
+
+def available():
+    return pq is not None
+
+def _source_dir(cache_dir, kind, path):
+    """每个源文件路径一个目录，目录内只保留其当前内容对应的缓存"""
+    source_key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, kind, source_key)
+
+def entry_path(cache_dir, kind, path, digest):
+    return os.path.join(_source_dir(cache_dir, kind, path), f"{digest}.v{CACHE_VERSION}.parquet")
+
+def ensure_cached(path, kind, cache_dir, digest=None):
+    """
+    确保源工作簿已转换为 Parquet。
+
+    Args:
+        path: 源工作簿路径。
+        kind: history_loader.HISTORY_KINDS 中的数据类型。
+        cache_dir: 缓存根目录。
+        digest: 已计算的源文件 SHA-256 (可选)。
+
+    Returns:
+        tuple: (缓存文件路径, 是否命中)
+    """
+    digest = digest or file_hash(path)
+    entry = entry_path(cache_dir, kind, path, digest)
+    if os.path.exists(entry):
+        return entry, True
+
+    df, _ = parse_workbook(path, kind)
+    df = df.sort_values(HISTORY_KINDS[kind]["time_field"], kind="stable")
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    tmp = f"{entry}.{os.getpid()}.tmp"
+    df.to_parquet(tmp, engine="pyarrow", index=False, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, entry)
+
+    # 源文件内容已变化：删除同一源路径下的旧缓存
+    for stale in glob.glob(os.path.join(os.path.dirname(entry), "*.parquet")):
+        if stale != entry:
+            os.remove(stale)
+    return entry, False
+
+_OPERATORS = {
+    "==": lambda s, v: s == v,
+    "=": lambda s, v: s == v,
+    "!=": lambda s, v: s != v,
+    "<": lambda s, v: s < v,
+    "<=": lambda s, v: s <= v,
+    ">": lambda s, v: s > v,
+    ">=": lambda s, v: s >= v,
+    "in": lambda s, v: s.isin(v),
+    "not in": lambda s, v: ~s.isin(v)
+}
+
+def _apply_filters(df, filters):
+    """无 pyarrow 时在内存中执行 (列, 运算符, 值) 过滤条件 (AND)"""
+    for column, op, value in filters:
+        df = df[_OPERATORS[op](df[column], value).fillna(False).astype(bool)]
+    return df
+
+def read_workbook(path, kind, cache_dir=None, columns=None, filters=None):
+    """
+    通过缓存读取源工作簿 (可在子进程中执行)。
+
+    Args:
+        path: 源工作簿路径。
+        kind: 数据类型。
+        cache_dir: 缓存根目录；为空或未安装 pyarrow 时直接解析源文件。
+        columns: 列裁剪，仅读取这些字段。
+        filters: 谓词下推条件，[(列, 运算符, 值), ...]，各条件为 AND 关系。
+
+    Returns:
+        tuple: (DataFrame, 耗时秒)，与 parse_workbook 相同。
+    """
+    started = time.perf_counter()
+    if not cache_dir or pq is None:
+        df, _ = parse_workbook(path, kind)
+        if filters:
+            df = _apply_filters(df, filters)
+        if columns:
+            df = df[list(columns)]
+        return df, time.perf_counter() - started
+
+    entry, _ = ensure_cached(path, kind, cache_dir)
+    df = pd.read_parquet(entry, engine="pyarrow", columns=columns, filters=filters or None)
+    return df, time.perf_counter() - started
+
+def benchmark(path, kind, cache_dir, columns=None, filters=None, repeat=3):
+    """
+    对比冷解析 xls 与读取 Parquet 缓存的耗时 (秒，取 repeat 次最小值)。
+
+    Returns:
+        dict: {"rows", "xls_parse", "parquet_read", "parquet_projected", "speedup"}
+    """
+    def best(fn):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - started)
+        return min(timings), result
+
+    xls_parse, (df, _) = best(lambda: parse_workbook(path, kind))
+    ensure_cached(path, kind, cache_dir)
+    parquet_read, _ = best(lambda: read_workbook(path, kind, cache_dir))
+    parquet_projected, (projected, _) = best(
+        lambda: read_workbook(path, kind, cache_dir, columns=columns, filters=filters)
+    )
+    return {
+        "rows": len(df),
+        "projected_rows": len(projected),
+        "xls_parse": xls_parse,
+        "parquet_read": parquet_read,
+        "parquet_projected": parquet_projected,
+        "speedup": xls_parse / parquet_read if parquet_read > 0 else 0.0
+    }
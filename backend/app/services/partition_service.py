@@ -0,0 +1,236 @@
+import json
+from datetime import datetime
+from sqlalchemy import text, select, func
+from sqlalchemy.dialects import postgresql
+from app import db, socketio
+
+#==============================================================================
+# 时序表按月分区 (PostgreSQL 声明式分区)
+# 分区由迁移 a9e4c7f1d2b6 建立；本模块负责按月预建未来分区、按保留期删除整月分区，
+# 并用 EXPLAIN 检查典型查询的分区裁剪。非 PostgreSQL (SQLite 测试库) 下表不分区，
+# 各函数直接返回空结果。
+#==============================================================================
+
+# 分区表 -> 分区键 (与迁移保持一致)
+PARTITIONED_TABLES = {
+    "support_pressure_data": "record_time",
+    "microseismic_event": "event_time",
+    "roadway_deformation": "record_time",
+    "fracture_construction_data": "record_time"
+}
+DEFAULT_PARTITION_SUFFIX = "_default"
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def partition_name(table, month):
+    """月分区表名，如 support_pressure_data_p2025_04"""
+    return f"{table}_p{month:%Y_%m}"
+
+def is_postgresql():
+    return db.engine.dialect.name == "postgresql"
+
+def is_partitioned(table):
+    if not is_postgresql():
+        return False
+    return db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = :table"
+    ), {"table": table}).first() is not None
+
+def list_partitions(table):
+    """分区表的子分区名 (含默认分区)"""
+    if not is_postgresql():
+        return []
+    rows = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table ORDER BY c.relname"
+    ), {"table": table})
+    return [r[0] for r in rows]
+
+def create_month_partition(table, column, month):
+    """
+    建立一个月分区。默认分区中已有该月数据时先将其移入新表再挂载，
+    否则 PostgreSQL 会拒绝创建与默认分区数据重叠的分区。调用方负责提交。
+    """
+    name = partition_name(table, month)
+    lower, upper = month, add_months(month, 1)
+    bounds = {"lower": lower, "upper": upper}
+    db.session.execute(text(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    db.session.execute(text(
+        f'WITH moved AS (DELETE FROM "{table}{DEFAULT_PARTITION_SUFFIX}" '
+        f'WHERE "{column}" >= :lower AND "{column}" < :upper RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved'
+    ), bounds)
+    db.session.execute(text(
+        f"ALTER TABLE \"{table}\" ATTACH PARTITION \"{name}\" "
+        f"FOR VALUES FROM ('{lower:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+    ))
+    return name
+
+def ensure_partitions(months_ahead=3, now=None):
+    """
+    为各分区表预建当月至未来 months_ahead 个月的分区 (已存在的跳过)。
+
+    Returns:
+        list: 新建的分区名。
+    """
+    month = month_start(now or datetime.now())
+    created = []
+    for table, column in PARTITIONED_TABLES.items():
+        if not is_partitioned(table):
+            continue
+        existing = set(list_partitions(table))
+        for offset in range(months_ahead + 1):
+            target = add_months(month, offset)
+            if partition_name(table, target) not in existing:
+                created.append(create_month_partition(table, column, target))
+        db.session.commit()
+    return created
+
+def drop_partitions_before(cutoff):
+    """
+    保留期清理：分离并删除整月早于 cutoff 所在月的分区 (不逐行 DELETE)。
+
+    Returns:
+        list: 删除的分区名。
+    """
+    limit = partition_name("", month_start(cutoff))
+    dropped = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(table):
+            continue
+        for name in list_partitions(table):
+            suffix = name[len(table):]
+            if suffix == DEFAULT_PARTITION_SUFFIX or not suffix.startswith("_p") or suffix >= limit:
+                continue
+            db.session.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            db.session.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+        db.session.commit()
+    return dropped
+
+def drop_month_partition(table, month):
+    """
+    删除整月分区 (冷数据归档后替代逐行 DELETE)。调用方负责提交。
+
+    Returns:
+        bool: 该月分区存在并已删除。
+    """
+    name = partition_name(table, month)
+    if name not in list_partitions(table):
+        return False
+    db.session.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+    db.session.execute(text(f'DROP TABLE "{name}"'))
+    return True
+
+def _scanned_relations(plan):
+    """EXPLAIN (FORMAT JSON) 计划树中扫描到的表名"""
+    names = []
+    if "Relation Name" in plan:
+        names.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        names.extend(_scanned_relations(child))
+    return names
+
+def pruning_checks(now=None):
+    """
+    与业务查询形式一致的典型查询：(名称, 分区表, SQLAlchemy 语句)。
+    时间条件均直接作用于分区键 (不包裹函数)，规划期即可裁剪。
+    """
+    from datetime import timedelta
+    from app.models import SupportPressureData, MicroseismicEvent, RoadwayDeformation, FractureConstructionData
+    from app.services.auxiliary_service import build_data_query
+
+    now = now or datetime.now()
+    day_ago, week_ago = now - timedelta(days=1), now - timedelta(days=7)
+    checks = []
+    for target, model in (("pressure", SupportPressureData), ("seismic", MicroseismicEvent),
+                          ("deformation", RoadwayDeformation), ("fracture", FractureConstructionData)):
+        query, _ = build_data_query(target, day_ago.isoformat(), now.isoformat(), 100)
+        checks.append((f"query_data:{target}", model.__tablename__, query.statement))
+
+    # calculate_evaluation_metrics：施工前后 7 天窗口均值
+    checks.append(("evaluation:pressure_window", "support_pressure_data",
+                   select(func.avg(SupportPressureData.p1)).where(
+                       SupportPressureData.record_time >= week_ago, SupportPressureData.record_time < now)))
+    checks.append(("evaluation:deformation_window", "roadway_deformation",
+                   select(func.avg(RoadwayDeformation.deformation_rate)).where(
+                       RoadwayDeformation.record_time > week_ago, RoadwayDeformation.record_time <= now)))
+    return checks
+
+def explain_partition_pruning(now=None):
+    """
+    对 pruning_checks 中的查询执行 EXPLAIN，统计扫描的分区数。
+
+    Returns:
+        list: [{"name", "table", "partitions", "scanned", "pruned"}]；表未分区时为空列表。
+    """
+    results = []
+    for name, table, statement in pruning_checks(now):
+        if not is_partitioned(table):
+            continue
+        partitions = list_partitions(table)
+        sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        plan = db.session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        scanned = sorted(set(_scanned_relations(plan[0]["Plan"])) & set(partitions))
+        results.append({
+            "name": name,
+            "table": table,
+            "partitions": len(partitions),
+            "scanned": scanned,
+            "pruned": len(scanned) < len(partitions)
+        })
+    return results
+
+class PartitionMaintainer:
+    """后台定时预建未来分区 (仅 PostgreSQL)"""
+
+    def __init__(self):
+        self.app = None
+        self.started = False
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('PARTITION_MAINTENANCE_INTERVAL', 86400)
+        self.months_ahead = app.config.get('PARTITION_MONTHS_AHEAD', 3)
+        self.started = False
+        if app.config.get('PARTITION_MAINTENANCE_ENABLED', False):
+            self.start()
+
+    def start(self):
+        """
+        启动后台维护任务 (服务进程入口调用)。测试、非 PostgreSQL 或间隔为 0 时不启动，重复调用无效。
+
+        Returns:
+            bool: 本次是否启动。
+        """
+        uri = self.app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+        if self.started or self.app.testing or self.interval <= 0 or not uri.startswith('postgresql'):
+            return False
+        self.started = True
+        socketio.start_background_task(self._maintenance_loop)
+        return True
+
+    def _maintenance_loop(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    created = ensure_partitions(self.months_ahead)
+                    if created:
+                        print(f"PARTITIONS: created {', '.join(created)}")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"PARTITION MAINTENANCE ERROR: {e}")
+                finally:
+                    db.session.remove()
+            socketio.sleep(self.interval)
+
+partition_maintainer = PartitionMaintainer()
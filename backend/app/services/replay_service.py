@@ -0,0 +1,271 @@
+import datetime
+import json
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict, deque, namedtuple
+import jwt
+import numpy as np
+import pandas as pd
+from flask import current_app
+from app.services.auxiliary_service import INGEST_ALARM_FIELDS, batch_alarm_value
+from app.services.history_loader import HISTORY_KINDS, find_workbooks, default_paths
+
+#==============================================================================
+# 历史数据回放 (离线容量测试)
+# 读取 database/矿压 与 database/微震 的真实导出文件，按原始时间线经
+# /ingest/kj653、/ingest/sos 推送，时间轴按倍速压缩 (speed=None 为不等待、尽快发送)。
+# 时间线只由文件内容决定 (稳定排序)，同一数据集每次回放的请求序列相同。
+# 报告实际吞吐、请求延迟、摄入到报警延迟与错误数。
+#==============================================================================
+
+# 回放类型 -> (接口路径, 载荷键)
+REPLAY_KINDS = {
+    "kj653": ("/api/v1/ingest/kj653", "records"),
+    "sos": ("/api/v1/ingest/sos", "events")
+}
+ALARM_HISTORY_PATH = "/api/v1/alarms/history"
+QUEUE_STATS_PATH = "/api/v1/ingest/queue/stats"
+# 每次拉取报警历史的条数上限
+ALARM_POLL_LIMIT = 1000
+
+# 一次请求：业务时间、类型、记录列表 (JSON 可序列化)
+ReplayBatch = namedtuple("ReplayBatch", ["time", "kind", "records"])
+
+def _frame_batches(df, kind):
+    """按业务时间分组：同一时刻的巡检数据 (KJ653 全部支架一轮) 作为一个请求"""
+    time_field = HISTORY_KINDS[kind]["time_field"]
+    times = df[time_field]
+    body = df.copy()
+    body[time_field] = times.dt.strftime("%Y-%m-%dT%H:%M:%S")
+    body = body.astype(object).where(body.notna(), None)
+    records = body.to_dict("records")
+
+    values = times.to_numpy()
+    bounds = np.flatnonzero(values[1:] != values[:-1]) + 1
+    starts = np.concatenate([[0], bounds])
+    ends = np.concatenate([bounds, [len(values)]])
+    return [ReplayBatch(times.iloc[s].to_pydatetime(), kind, records[s:e]) for s, e in zip(starts, ends)]
+
+def load_timeline(kinds, data_dir, cache_dir=None, start=None, end=None, paths=None):
+    """
+    读取历史导出文件并构建回放时间线。
+
+    跨文件重叠时段按自然键去重 (文件名顺序靠前者优先)，与 load_history 一致。
+
+    Args:
+        kinds: REPLAY_KINDS 中的类型列表。
+        data_dir: 历史数据根目录 (HISTORY_DATA_DIR)。
+        cache_dir: Parquet 缓存目录，见 parquet_cache。
+        start, end: 只回放该时间窗口内的数据 (含端点)。
+        paths: {类型: 文件或目录列表}，覆盖默认来源目录。
+
+    Returns:
+        list: ReplayBatch，按 (业务时间, 类型) 排序。
+    """
+    from app.services.parquet_cache import read_workbook
+
+    batches = []
+    for kind in kinds:
+        spec = HISTORY_KINDS[kind]
+        time_field = spec["time_field"]
+        files = find_workbooks((paths or {}).get(kind) or default_paths(kind, data_dir))
+        frames = [read_workbook(path, kind, cache_dir)[0] for path in files]
+        if not frames:
+            continue
+        df = pd.concat(frames, ignore_index=True).drop_duplicates(subset=spec["key"], keep="first")
+        if start is not None:
+            df = df[df[time_field] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df[time_field] <= pd.Timestamp(end)]
+        df = df.sort_values([time_field] + [k for k in spec["key"] if k != time_field], kind="stable")
+        batches.extend(_frame_batches(df, kind))
+
+    order = {kind: i for i, kind in enumerate(REPLAY_KINDS)}
+    batches.sort(key=lambda b: (b.time, order[b.kind]))
+    return batches
+
+def issue_token(username):
+    """为已有用户签发接口令牌 (进程内回放使用，声明与 /auth/login 相同)"""
+    from app.models import User
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise ValueError(f"User '{username}' not found.")
+    return jwt.encode({
+        'user_id': user.id,
+        'role': user.role,
+        'exp': datetime.datetime.now() + datetime.timedelta(hours=24)
+    }, current_app.config['SECRET_KEY'], algorithm="HS256")
+
+class FlaskTransport:
+    """
+    进程内回放：经应用测试客户端调用接口，无需启动服务与网络。
+    摄入报警判定默认关闭，进程内回放时开启以测量摄入到报警的延迟。
+    """
+
+    def __init__(self, app, token):
+        app.config['INGEST_ALARM_CHECK'] = True
+        self.client = app.test_client()
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def request(self, method, path, payload=None):
+        resp = self.client.open(path, method=method, json=payload, headers=self.headers)
+        return resp.status_code, resp.get_json(silent=True)
+
+class HttpTransport:
+    """回放到运行中的服务 (标准库 urllib，同步请求)"""
+
+    def __init__(self, base_url, token, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+        self.timeout = timeout
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, headers=self.headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, json.loads(resp.read() or b'null')
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            try:
+                return e.code, json.loads(body or b'null')
+            except ValueError:
+                return e.code, None
+
+def _percentiles(values):
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    arr = np.asarray(values)
+    return {
+        "p50": round(float(np.percentile(arr, 50)), 2),
+        "p95": round(float(np.percentile(arr, 95)), 2),
+        "max": round(float(arr.max()), 2)
+    }
+
+class _AlarmTracker:
+    """
+    摄入到报警延迟：服务端每批至多产生一条报警，其触发值为该批数值最大值，
+    据此将新报警匹配到最早发送、尚未匹配的同值批次；延迟 = 报警时间 - 发送时间。
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.pending = defaultdict(deque)
+        self.latencies = []
+        self.unmatched = 0
+        self.last_id = max((a["id"] for a in self._fetch()), default=0)
+
+    def _fetch(self):
+        status, body = self.transport.request("GET", f"{ALARM_HISTORY_PATH}?limit={ALARM_POLL_LIMIT}")
+        return body if status == 200 and isinstance(body, list) else []
+
+    def expect(self, kind, records, sent_at):
+        _, fields = INGEST_ALARM_FIELDS[kind]
+        value = batch_alarm_value(kind, {f: [r.get(f) for r in records] for f in fields})
+        if value is not None:
+            self.pending[(INGEST_ALARM_FIELDS[kind][0], value)].append(sent_at)
+
+    def poll(self):
+        fresh = sorted((a for a in self._fetch() if a["id"] > self.last_id), key=lambda a: a["id"])
+        for alarm in fresh:
+            self.last_id = alarm["id"]
+            queue = self.pending.get((alarm["type"], alarm["value"]))
+            if not queue:
+                self.unmatched += 1
+                continue
+            raised = datetime.datetime.fromisoformat(alarm["timestamp"])
+            self.latencies.append((raised - queue.popleft()).total_seconds() * 1000)
+
+def _wait_for_queue(transport, timeout, sleep):
+    """异步模式：等待服务端摄入队列排空"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        status, body = transport.request("GET", QUEUE_STATS_PATH)
+        if status != 200 or not body or not body.get("depth"):
+            return
+        sleep(0.2)
+
+def replay(timeline, transport, speed=None, mode="sync", alarm_poll_interval=1.0,
+           drain_timeout=60, echo=print, sleep=time.sleep):
+    """
+    按时间线回放批次并统计。
+
+    Args:
+        timeline: load_timeline 返回的 ReplayBatch 列表。
+        transport: FlaskTransport 或 HttpTransport。
+        speed: 时间压缩倍数 (60 即 1 小时数据 1 分钟回放)；None 为不等待。
+        mode: "sync" 或 "async" (接口 mode 参数)。
+        alarm_poll_interval: 拉取报警历史的间隔秒数。
+        drain_timeout: 异步模式结束时等待队列排空的最长秒数。
+        echo: 进度输出函数。
+        sleep: 等待函数 (测试可替换)。
+
+    Returns:
+        dict: 回放报告。
+    """
+    tracker = _AlarmTracker(transport)
+    status_counts = Counter()
+    request_ms = []
+    errors = []
+    rows = 0
+    max_lag = 0.0
+
+    started = last_poll = time.perf_counter()
+    origin = timeline[0].time if timeline else None
+    for i, batch in enumerate(timeline, start=1):
+        if speed:
+            due = started + (batch.time - origin).total_seconds() / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+
+        path, key = REPLAY_KINDS[batch.kind]
+        sent_at = datetime.datetime.now()
+        t0 = time.perf_counter()
+        try:
+            status, body = transport.request("POST", f"{path}?mode={mode}", {key: batch.records})
+        except Exception as e:
+            status, body = "EXC", {"message": str(e)}
+        request_ms.append((time.perf_counter() - t0) * 1000)
+        status_counts[status] += 1
+        rows += len(batch.records)
+
+        if status in (201, 202):
+            tracker.expect(batch.kind, batch.records, sent_at)
+        elif len(errors) < 10:
+            errors.append({"time": batch.time.isoformat(), "kind": batch.kind, "status": status,
+                           "message": (body or {}).get("message")})
+
+        if time.perf_counter() - last_poll >= alarm_poll_interval:
+            tracker.poll()
+            last_poll = time.perf_counter()
+        if i % 1000 == 0:
+            echo(f"Replayed {i}/{len(timeline)} batches ({rows} rows), data time {batch.time}.")
+
+    elapsed = time.perf_counter() - started
+    if mode == "async":
+        _wait_for_queue(transport, drain_timeout, sleep)
+    tracker.poll()
+
+    failed = sum(n for status, n in status_counts.items() if status not in (201, 202))
+    return {
+        "speed": speed or "max",
+        "mode": mode,
+        "batches": len(timeline),
+        "rows": rows,
+        "data_span_sec": (timeline[-1].time - origin).total_seconds() if timeline else 0.0,
+        "elapsed": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+        "batches_per_sec": round(len(timeline) / elapsed, 1) if elapsed > 0 else 0.0,
+        "max_lag_ms": round(max_lag * 1000, 2),
+        "request_ms": _percentiles(request_ms),
+        "alarms": len(tracker.latencies),
+        "unmatched_alarms": tracker.unmatched,
+        "alarm_latency_ms": _percentiles(tracker.latencies),
+        "errors": failed,
+        "status_counts": {str(k): v for k, v in status_counts.items()},
+        "error_samples": errors
+    }
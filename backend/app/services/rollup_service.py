@@ -0,0 +1,380 @@
+import time
+import zlib
+from datetime import datetime, timedelta
+import pandas as pd
+from flask import current_app
+from sqlalchemy import select, text, func, bindparam, and_, or_
+from app import db
+from app.models import SupportPressureData, MicroseismicEvent, RoadwayDeformation, MetricRollup
+
+#==============================================================================
+# 监测数据时间聚合 (rollup)
+# metric_rollup 按 1 分钟 / 1 小时 / 1 天保存 count/sum/min/max，
+# 分支架、测站与工作面三个层级；趋势接口按时间范围读取最粗的合适粒度。
+# 摄入时在同一事务中增量维护：只重算本批触及的分钟桶，并把分钟桶的变化量合并到小时桶与天桶。
+#==============================================================================
+
+# 指标 -> 原始表、时间列、数值列与各聚合层级的序列键列 (工作面层级为全部数据)
+ROLLUP_SPECS = {
+    "pressure": {
+        "model": SupportPressureData,
+        "time_field": "record_time",
+        "value_field": "p1",
+        "scopes": {"support": ["station_no", "support_no"], "station": ["station_no"], "face": []}
+    },
+    "seismic": {
+        "model": MicroseismicEvent,
+        "time_field": "event_time",
+        "value_field": "energy",
+        "scopes": {"face": []}
+    },
+    "deformation": {
+        "model": RoadwayDeformation,
+        "time_field": "record_time",
+        "value_field": "top_bottom_deformation",
+        "scopes": {"station": ["station_id"], "face": []}
+    }
+}
+MODEL_METRICS = {spec["model"]: metric for metric, spec in ROLLUP_SPECS.items()}
+
+# 粒度 (由细到粗) -> 桶宽
+RESOLUTIONS = {"1m": timedelta(minutes=1), "1h": timedelta(hours=1), "1d": timedelta(days=1)}
+FACE_SERIES_KEY = "ALL"
+BUCKET_KEY = ["scope", "series_key", "bucket_start"]
+VALUE_COLUMNS = ["sample_count", "value_sum", "value_min", "value_max"]
+DELETE_CHUNK = 5000
+# 按桶区间读取时每条查询的 OR 区间数
+RANGE_CHUNK = 200
+
+def floor_time(value, resolution):
+    """时间向下取整到桶起点 (天桶对齐到零点)"""
+    step = RESOLUTIONS[resolution]
+    return datetime.min + ((value - datetime.min) // step) * step
+
+def _floor_series(series, resolution):
+    return pd.to_datetime(series).astype("datetime64[us]").dt.floor(pd.Timedelta(RESOLUTIONS[resolution]))
+
+def _frame(rows, columns):
+    """查询结果 -> DataFrame (空结果也保持桶起点为时间类型，便于合并)"""
+    frame = pd.DataFrame(rows, columns=columns)
+    frame["bucket_start"] = pd.to_datetime(frame["bucket_start"]).astype("datetime64[us]")
+    return frame
+
+def _empty_buckets():
+    return _frame([], BUCKET_KEY + VALUE_COLUMNS)
+
+def _key_part(series):
+    """序列键片段：整数编号去掉浮点尾数，其余按字符串"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("Int64").astype(str)
+    return series.astype(str)
+
+def _load_raw(spec, start, end):
+    """读取 [start, end) 内的原始数值 (跳过空值)"""
+    model = spec["model"]
+    time_col = getattr(model, spec["time_field"])
+    value_col = getattr(model, spec["value_field"])
+    key_fields = _key_fields(spec)
+    stmt = select(time_col.label("time"), value_col.label("value"), *[getattr(model, f) for f in key_fields]).where(
+        time_col >= start, time_col < end, value_col.isnot(None))
+    rows = db.session.execute(stmt).all()
+    return pd.DataFrame(rows, columns=["time", "value"] + key_fields)
+
+def aggregate_raw(spec, raw, resolution="1m"):
+    """原始数值 -> 各层级的桶 (scope, series_key, bucket_start, count, sum, min, max)"""
+    if raw.empty:
+        return _empty_buckets()
+    raw = raw.assign(bucket_start=_floor_series(raw["time"], resolution), value=raw["value"].astype(float))
+    frames = []
+    for scope, fields in spec["scopes"].items():
+        part = raw.dropna(subset=fields) if fields else raw
+        if part.empty:
+            continue
+        if fields:
+            keys = _key_part(part[fields[0]])
+            for field in fields[1:]:
+                keys = keys + "-" + _key_part(part[field])
+        else:
+            keys = pd.Series(FACE_SERIES_KEY, index=part.index)
+        grouped = part.assign(series_key=keys).groupby(["series_key", "bucket_start"])["value"].agg(
+            sample_count="count", value_sum="sum", value_min="min", value_max="max").reset_index()
+        frames.append(grouped.assign(scope=scope))
+    if not frames:
+        return _empty_buckets()
+    return pd.concat(frames, ignore_index=True)[BUCKET_KEY + VALUE_COLUMNS]
+
+def merge_buckets(frame, resolution):
+    """细粒度桶合并为粗粒度桶 (count/sum 相加，min/max 取极值)"""
+    if frame.empty:
+        return _empty_buckets()
+    frame = frame.assign(bucket_start=_floor_series(frame["bucket_start"], resolution))
+    return frame.groupby(BUCKET_KEY).agg(
+        sample_count=("sample_count", "sum"), value_sum=("value_sum", "sum"),
+        value_min=("value_min", "min"), value_max=("value_max", "max")).reset_index()[BUCKET_KEY + VALUE_COLUMNS]
+
+def _key_fields(spec):
+    return sorted({f for fields in spec["scopes"].values() for f in fields})
+
+def _fmin(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+def _fmax(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+def _accumulate(buckets, key, count, total, low, high):
+    acc = buckets.get(key)
+    if acc is None:
+        buckets[key] = [count, total, low, high]
+    else:
+        acc[0] += count
+        acc[1] += total
+        acc[2] = _fmin(acc[2], low)
+        acc[3] = _fmax(acc[3], high)
+
+def _aggregate_rows(spec, rows, resolution):
+    """
+    原始行 (time, value, *键列) -> {(scope, series_key, bucket_start): [count, sum, min, max]}。
+    摄入增量路径每批只有几百行，逐行累加比构建 DataFrame 快一个数量级；结果与 aggregate_raw 一致。
+    """
+    positions = {f: i + 2 for i, f in enumerate(_key_fields(spec))}
+    scopes = [(scope, [positions[f] for f in fields]) for scope, fields in spec["scopes"].items()]
+    buckets = {}
+    for row in rows:
+        bucket = floor_time(row[0], resolution)
+        value = float(row[1])
+        for scope, indexes in scopes:
+            parts = [row[i] for i in indexes]
+            if any(p is None for p in parts):
+                continue
+            series = "-".join(str(p) for p in parts) if parts else FACE_SERIES_KEY
+            _accumulate(buckets, (scope, series, bucket), 1, value, value, value)
+    return buckets
+
+def bucket_ranges(buckets, resolution):
+    """桶起点集合 -> 合并相邻桶后的 [(起, 止)) 区间列表"""
+    step = RESOLUTIONS[resolution]
+    ranges = []
+    for bucket in sorted(set(buckets)):
+        if ranges and ranges[-1][1] == bucket:
+            ranges[-1][1] = bucket + step
+        else:
+            ranges.append([bucket, bucket + step])
+    return [tuple(r) for r in ranges]
+
+def _range_chunks(column, ranges):
+    """按 RANGE_CHUNK 分组的区间过滤条件 (每组一条查询)"""
+    for i in range(0, len(ranges), RANGE_CHUNK):
+        yield or_(*[and_(column >= a, column < b) for a, b in ranges[i:i + RANGE_CHUNK]])
+
+def _load_rollup_map(metric, resolution, ranges):
+    """区间内的已有桶：{(scope, series_key, bucket_start): (id, count, sum, min, max)}"""
+    existing = {}
+    for clause in _range_chunks(MetricRollup.bucket_start, ranges):
+        stmt = select(MetricRollup.id, *[getattr(MetricRollup, c) for c in BUCKET_KEY + VALUE_COLUMNS]).where(
+            MetricRollup.metric == metric, MetricRollup.resolution == resolution, clause)
+        existing.update({(r[1], r[2], r[3]): (r[0], *r[4:]) for r in db.session.execute(stmt)})
+    return existing
+
+def _write_changes(metric, resolution, inserts, updates, deletes):
+    """插入新桶、按主键批量更新已有桶、删除清空的桶"""
+    table = MetricRollup.__table__
+    if deletes:
+        _delete_ids(deletes)
+    if updates:
+        db.session.execute(
+            table.update().where(table.c.id == bindparam("_id")).values(
+                sample_count=bindparam("_count"), value_sum=bindparam("_sum"),
+                value_min=bindparam("_min"), value_max=bindparam("_max")),
+            [{"_id": i, "_count": v[0], "_sum": v[1], "_min": v[2], "_max": v[3]} for i, v in updates.items()])
+    if inserts:
+        db.session.execute(table.insert(), [{
+            "metric": metric, "resolution": resolution, "scope": k[0], "series_key": k[1], "bucket_start": k[2],
+            "sample_count": v[0], "value_sum": v[1], "value_min": v[2], "value_max": v[3]
+        } for k, v in inserts.items()])
+
+def _delete_ids(ids):
+    ids = [int(i) for i in ids]
+    for i in range(0, len(ids), DELETE_CHUNK):
+        db.session.execute(MetricRollup.__table__.delete().where(MetricRollup.id.in_(ids[i:i + DELETE_CHUNK])))
+
+def _insert_buckets(metric, resolution, frame):
+    if frame.empty:
+        return
+    rows = [{
+        "metric": metric,
+        "resolution": resolution,
+        "scope": r.scope,
+        "series_key": r.series_key,
+        "bucket_start": r.bucket_start.to_pydatetime(),
+        "sample_count": int(r.sample_count),
+        "value_sum": float(r.value_sum),
+        "value_min": float(r.value_min),
+        "value_max": float(r.value_max)
+    } for r in frame.itertuples(index=False)]
+    db.session.execute(MetricRollup.__table__.insert(), rows)
+
+def _lock(metric):
+    """PostgreSQL 下以事务级咨询锁串行化同一指标的聚合更新 (多个摄入 worker 并发时)"""
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"),
+                           {"key": zlib.crc32(f"metric_rollup:{metric}".encode())})
+
+def refresh(metric, times):
+    """
+    增量维护 times 所落入的分钟桶及其上级桶。调用方负责提交。
+
+    只读取这些分钟桶内的原始数据 (乱序或补录的个别记录不会牵连其间的整段时间)；
+    分钟桶由原始数据重算 (重复写入的行不会重复计数)，其 count/sum 变化量累加到小时桶与天桶，
+    min/max 取极值。原始表只增不删时结果与全量重算一致；删除原始数据后需执行 rollup-backfill。
+
+    Returns:
+        int: 变化的分钟桶数。
+    """
+    spec = ROLLUP_SPECS[metric]
+    model = spec["model"]
+    time_col = getattr(model, spec["time_field"])
+    value_col = getattr(model, spec["value_field"])
+    ranges = bucket_ranges((floor_time(t, "1m") for t in times), "1m")
+    if not ranges:
+        return 0
+    _lock(metric)
+
+    fresh = {}
+    for clause in _range_chunks(time_col, ranges):
+        rows = db.session.execute(
+            select(time_col, value_col, *[getattr(model, f) for f in _key_fields(spec)]).where(
+                clause, value_col.isnot(None)))
+        fresh.update(_aggregate_rows(spec, rows, "1m"))
+    old = _load_rollup_map(metric, "1m", ranges)
+
+    delta, inserts, updates, deletes = {}, {}, {}, []
+    for key in fresh.keys() | old.keys():
+        new, prev = fresh.get(key), old.get(key)
+        if new is not None and prev is not None and tuple(new) == tuple(prev[1:]):
+            continue
+        if new is None:
+            deletes.append(prev[0])
+            delta[key] = [-prev[1], -prev[2], None, None]
+            continue
+        if prev is None:
+            inserts[key] = new
+        else:
+            updates[prev[0]] = new
+        delta[key] = [new[0] - (prev[1] if prev else 0), new[1] - (prev[2] if prev else 0), new[2], new[3]]
+    if not delta:
+        return 0
+    _write_changes(metric, "1m", inserts, updates, deletes)
+
+    changed = len(delta)
+    for resolution in ("1h", "1d"):
+        parent_delta = {}
+        for (scope, series, bucket), (count, total, low, high) in delta.items():
+            _accumulate(parent_delta, (scope, series, floor_time(bucket, resolution)), count, total, low, high)
+        existing = _load_rollup_map(metric, resolution, bucket_ranges((key[2] for key in parent_delta), resolution))
+
+        inserts, updates, deletes = {}, {}, []
+        for key, (count, total, low, high) in parent_delta.items():
+            prev = existing.get(key)
+            if prev is None:
+                if count > 0:
+                    inserts[key] = [count, total, low, high]
+            elif prev[1] + count <= 0:
+                deletes.append(prev[0])
+            else:
+                updates[prev[0]] = [prev[1] + count, prev[2] + total, _fmin(prev[3], low), _fmax(prev[4], high)]
+        _write_changes(metric, resolution, inserts, updates, deletes)
+        delta = parent_delta
+    return changed
+
+def on_insert(model, columns):
+    """
+    摄入引擎写入原始数据后的钩子：刷新本批触及的聚合桶 (与原始数据同一事务)。
+    """
+    metric = MODEL_METRICS.get(model)
+    if metric is None or not current_app.config.get('ROLLUP_ON_INGEST', True):
+        return
+    refresh(metric, [t for t in columns.get(ROLLUP_SPECS[metric]["time_field"], ()) if t is not None])
+
+def backfill(metric, start=None, end=None, chunk=timedelta(days=1), echo=print):
+    """
+    全量重建 [start, end) 的聚合 (按天分块读取原始数据)。调用方负责提交。
+
+    Returns:
+        dict: {"rows": 原始行数, "buckets": 写入的桶数, "elapsed": 秒}
+    """
+    started = time.perf_counter()
+    spec = ROLLUP_SPECS[metric]
+    time_col = getattr(spec["model"], spec["time_field"])
+    if start is None or end is None:
+        first, last = db.session.query(func.min(time_col), func.max(time_col)).one()
+        if first is None:
+            return {"rows": 0, "buckets": 0, "elapsed": 0.0}
+        start = start or first
+        end = end or last + RESOLUTIONS["1m"]
+    # 对齐到天，保证天桶完整重建
+    start = floor_time(start, "1d")
+    end = floor_time(end - timedelta(microseconds=1), "1d") + RESOLUTIONS["1d"]
+
+    _lock(metric)
+    db.session.execute(MetricRollup.__table__.delete().where(
+        MetricRollup.metric == metric, MetricRollup.bucket_start >= start, MetricRollup.bucket_start < end))
+
+    rows = buckets = 0
+    cursor = start
+    while cursor < end:
+        upper = min(cursor + chunk, end)
+        raw = _load_raw(spec, cursor, upper)
+        if not raw.empty:
+            minute = aggregate_raw(spec, raw, "1m")
+            hour = merge_buckets(minute, "1h")
+            day = merge_buckets(hour, "1d")
+            for resolution, frame in (("1m", minute), ("1h", hour), ("1d", day)):
+                _insert_buckets(metric, resolution, frame)
+            rows += len(raw)
+            buckets += len(minute) + len(hour) + len(day)
+            echo(f"{metric} {cursor:%Y-%m-%d}: {len(raw)} rows, {len(minute) + len(hour) + len(day)} buckets.")
+        cursor = upper
+    return {"rows": rows, "buckets": buckets, "elapsed": time.perf_counter() - started}
+
+def parse_range(time_range, default=timedelta(hours=24)):
+    """趋势接口的 range 参数 ('30m'/'24h'/'7d') -> timedelta"""
+    units = {"m": "minutes", "h": "hours", "d": "days"}
+    try:
+        value, unit = int(time_range[:-1]), time_range[-1].lower()
+        if value > 0 and unit in units:
+            return timedelta(**{units[unit]: value})
+    except (TypeError, ValueError, IndexError):
+        pass
+    return default
+
+def choose_resolution(span, min_points):
+    """满足至少 min_points 个点的最粗粒度 (范围过短时退回 1 分钟)"""
+    for resolution in ("1d", "1h", "1m"):
+        if span / RESOLUTIONS[resolution] >= min_points:
+            return resolution
+    return "1m"
+
+def read_series(metric, scope, time_range, min_points=24, end=None, series_key=None):
+    """
+    读取趋势序列。窗口默认截止于该指标最新的数据桶 (数据停更时仍显示最近一段)。
+    指定 series_key 时只读取该序列 (如单个支架 "1-2")。
+
+    Returns:
+        tuple: (粒度, 窗口起点, 窗口终点, DataFrame[series_key, bucket_start, count, sum, min, max])
+    """
+    span = parse_range(time_range)
+    resolution = choose_resolution(span, min_points)
+    if end is None:
+        latest = db.session.query(func.max(MetricRollup.bucket_start)).filter(
+            MetricRollup.metric == metric, MetricRollup.resolution == "1m").scalar()
+        end = min(datetime.now(), latest + RESOLUTIONS["1m"]) if latest else datetime.now()
+    end = floor_time(end - timedelta(microseconds=1), resolution) + RESOLUTIONS[resolution]
+    start = end - span
+    stmt = select(MetricRollup.series_key, MetricRollup.bucket_start, *[getattr(MetricRollup, c) for c in VALUE_COLUMNS]).where(
+        MetricRollup.metric == metric, MetricRollup.resolution == resolution, MetricRollup.scope == scope,
+        MetricRollup.bucket_start >= floor_time(start, resolution), MetricRollup.bucket_start < end
+    ).order_by(MetricRollup.bucket_start)
+    if series_key is not None:
+        stmt = stmt.where(MetricRollup.series_key == series_key)
+    frame = _frame(db.session.execute(stmt).all(), ["series_key", "bucket_start"] + VALUE_COLUMNS)
+    return resolution, floor_time(start, resolution), end, frame
@@ -0,0 +1,72 @@
+import json
+import struct
+import numpy as np
+
+#==============================================================================
+# 三维场景数据二进制封装
+# 布局：MAGIC(4 字节) | 版本 uint32 | 头长度 uint32 | JSON 头 (UTF-8，空格补齐到 4 字节) | 数据区
+# 数据区为若干连续的小端 float32 缓冲区，均按 4 字节对齐；JSON 头的 "buffers" 记录
+# 每个缓冲区相对数据区起点的偏移、元素个数与形状，前端可直接以 Float32Array 视图
+# 上传到 WebGL，无需逐点解析。坐标以 origin 为原点平移后再转 float32，避免大地坐标丢失精度。
+#==============================================================================
+
+MAGIC = b"MVSB"
+VERSION = 1
+MIMETYPE = "application/octet-stream"
+_PREFIX = struct.Struct("<4sII")
+_DTYPE = np.dtype("<f4")
+
+def pack(header, arrays):
+    """
+    封装 JSON 头与 float32 缓冲区。
+
+    Args:
+        header (dict): 任意可 JSON 序列化的描述信息，由调用方以下标引用 arrays。
+        arrays (list): np.ndarray 列表，按顺序写入数据区 (转为小端 float32)。
+
+    Returns:
+        bytes
+    """
+    buffers, chunks, offset = [], [], 0
+    for array in arrays:
+        data = np.ascontiguousarray(array, dtype=_DTYPE)
+        buffers.append({"offset": offset, "count": int(data.size), "shape": list(data.shape)})
+        chunks.append(data.tobytes())
+        offset += data.nbytes
+    header = dict(header, version=VERSION, dtype="float32", endian="little", buffers=buffers)
+    encoded = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    encoded += b" " * (-len(encoded) % 4)
+    return b"".join([_PREFIX.pack(MAGIC, VERSION, len(encoded)), encoded] + chunks)
+
+def unpack(data):
+    """
+    解析 pack 的结果。
+
+    Returns:
+        tuple: (头 dict, np.ndarray 列表)
+
+    Raises:
+        ValueError: 格式或版本不符。
+    """
+    magic, version, header_len = _PREFIX.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Unsupported scene buffer")
+    header = json.loads(data[_PREFIX.size:_PREFIX.size + header_len].decode("utf-8"))
+    body = _PREFIX.size + header_len
+    arrays = [
+        np.frombuffer(data, dtype=_DTYPE, count=b["count"], offset=body + b["offset"]).reshape(b["shape"])
+        for b in header["buffers"]
+    ]
+    return header, arrays
+
+def scene_positions(coord_e, coord_n, coord_z, origin):
+    """
+    大地坐标 -> 相对 origin 的场景坐标 (x=E, y=Z 高程, z=-N)，与前端 Three.js 场景一致。
+
+    Returns:
+        np.ndarray: (n, 3) float64，写入时再转 float32。
+    """
+    e0, n0, z0 = origin
+    return np.column_stack((np.asarray(coord_e, dtype=float) - e0,
+                            np.asarray(coord_z, dtype=float) - z0,
+                            -(np.asarray(coord_n, dtype=float) - n0)))
@@ -0,0 +1,141 @@
+import numpy as np
+from sqlalchemy import func
+from app import db
+from app.models import DrillingSite, Borehole, BoreholeTrajectory, FractureConstructionData, FractureSegment
+
+#==============================================================================
+# 压裂段空间定位
+# 段的起止测深取自 fracture_segment；未登记时按钻孔计划段数 (缺省为实际最大段号)
+# 将实测轨迹的测深范围等分。段的起点、中点、终点坐标由测深在轨迹测点间
+# 以 searchsorted 定位后线性插值得到 (向量化，不再取最近的原始测点)。
+# 一次请求返回钻场 / 工作面下全部钻孔的压裂段，各表均为批量查询。
+#==============================================================================
+
+def interpolate_positions(depths, measured_depth, coords):
+    """
+    沿测深线性插值坐标；超出轨迹测深范围的深度取端点坐标。
+
+    Args:
+        depths (np.ndarray): (m,) 待求测深。
+        measured_depth (np.ndarray): (n,) 轨迹测深，升序，n >= 1。
+        coords (np.ndarray): (n, k) 轨迹测点坐标。
+
+    Returns:
+        np.ndarray: (m, k)
+    """
+    depths = np.asarray(depths, dtype=float)
+    measured_depth = np.asarray(measured_depth, dtype=float)
+    coords = np.asarray(coords, dtype=float)
+    if len(measured_depth) == 1:
+        return np.repeat(coords[:1], len(depths), axis=0)
+    d = np.clip(depths, measured_depth[0], measured_depth[-1])
+    i = np.clip(np.searchsorted(measured_depth, d, side='right') - 1, 0, len(measured_depth) - 2)
+    span = measured_depth[i + 1] - measured_depth[i]
+    # 测深重复的测点间 span 为 0，取前一点
+    t = np.divide(d - measured_depth[i], span, out=np.zeros_like(d), where=span > 0)
+    return coords[i] + t[:, None] * (coords[i + 1] - coords[i])
+
+def equal_intervals(segment_nos, count, top, bottom):
+    """段号 1..count 将 [top, bottom] 等分，返回各段 (起, 止) 测深"""
+    step = (bottom - top) / count if count else 0.0
+    return {no: (top + (no - 1) * step, top + no * step) for no in segment_nos}
+
+def _scene_point(point):
+    """(E, N, Z) -> 前端三维坐标 (与轨迹、微震点一致)"""
+    e, n, z = (float(v) for v in point)
+    return {"x": e, "y": z, "z": -n}
+
+def _boreholes(site_id=None, working_face_id=None, borehole_ids=None):
+    query = Borehole.query
+    if site_id is not None:
+        query = query.filter(Borehole.drilling_site_id == site_id)
+    if working_face_id is not None:
+        query = query.join(DrillingSite, Borehole.drilling_site_id == DrillingSite.id) \
+            .filter(DrillingSite.working_face_id == working_face_id)
+    if borehole_ids is not None:
+        query = query.filter(Borehole.id.in_(borehole_ids))
+    return query.order_by(Borehole.drilling_site_id, Borehole.id).all()
+
+def _grouped(rows):
+    """按首列 (borehole_id) 分组的行 (rows 已按首列排序)"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[0], []).append(tuple(row[1:]))
+    return groups
+
+def get_segment_geometry(site_id=None, working_face_id=None, borehole_ids=None):
+    """
+    钻孔压裂段的施工汇总与空间位置。过滤条件均未给出时返回全部钻孔。
+
+    Args:
+        site_id (int): 钻场 ID。
+        working_face_id (int): 工作面 ID。
+        borehole_ids (list): 钻孔 ID 列表。
+
+    Returns:
+        list: [{"borehole_id", "borehole_no", "drilling_site_id", "segments": [
+                  {"segment_no", "start_depth", "end_depth", "pressure", "flow_rate", "total_volume",
+                   "position" (段中点), "start", "end"}]}]
+              含有施工数据或已登记起止深度的段；未施工段的汇总值为 None，无轨迹的钻孔 segments 为空列表。
+    """
+    boreholes = _boreholes(site_id, working_face_id, borehole_ids)
+    if not boreholes:
+        return []
+    ids = [bh.id for bh in boreholes]
+
+    trajectories = _grouped(db.session.query(
+        BoreholeTrajectory.borehole_id, BoreholeTrajectory.measured_depth,
+        BoreholeTrajectory.coord_e, BoreholeTrajectory.coord_n, BoreholeTrajectory.coord_z
+    ).filter(BoreholeTrajectory.borehole_id.in_(ids),
+             BoreholeTrajectory.coord_e.isnot(None), BoreholeTrajectory.coord_n.isnot(None),
+             BoreholeTrajectory.coord_z.isnot(None))
+        .order_by(BoreholeTrajectory.borehole_id, BoreholeTrajectory.measured_depth).all())
+    # 施工曲线为逐点时间序列，按段汇总：最大泵压、平均流量、段累计排量
+    summaries = _grouped(db.session.query(
+        FractureConstructionData.borehole_id,
+        FractureConstructionData.segment_no,
+        func.max(FractureConstructionData.pressure),
+        func.avg(FractureConstructionData.flow_rate),
+        func.max(FractureConstructionData.total_volume)
+    ).filter(FractureConstructionData.borehole_id.in_(ids), FractureConstructionData.segment_no.isnot(None))
+        .group_by(FractureConstructionData.borehole_id, FractureConstructionData.segment_no)
+        .order_by(FractureConstructionData.borehole_id, FractureConstructionData.segment_no).all())
+    registered = _grouped(db.session.query(
+        FractureSegment.borehole_id, FractureSegment.segment_no, FractureSegment.start_depth, FractureSegment.end_depth
+    ).filter(FractureSegment.borehole_id.in_(ids))
+        .order_by(FractureSegment.borehole_id, FractureSegment.segment_no).all())
+
+    results = []
+    for bh in boreholes:
+        entry = {"borehole_id": bh.id, "borehole_no": bh.borehole_no,
+                 "drilling_site_id": bh.drilling_site_id, "segments": []}
+        results.append(entry)
+        survey = np.array(trajectories.get(bh.id, []), dtype=float).reshape(-1, 4)
+        stats = {no: (p, q, v) for no, p, q, v in summaries.get(bh.id, [])}
+        intervals = {no: (start, end) for no, start, end in registered.get(bh.id, [])}
+        numbers = sorted(set(stats) | set(intervals))
+        if not len(survey) or not numbers:
+            continue
+
+        missing = [no for no in numbers if no not in intervals]
+        if missing:
+            count = max(bh.segments or 0, numbers[-1])
+            intervals.update(equal_intervals(missing, count, survey[0, 0], survey[-1, 0]))
+
+        bounds = np.array([intervals[no] for no in numbers], dtype=float)
+        depths = np.concatenate((bounds[:, 0], bounds.mean(axis=1), bounds[:, 1]))
+        points = interpolate_positions(depths, survey[:, 0], survey[:, 1:]).reshape(3, len(numbers), 3)
+        for k, no in enumerate(numbers):
+            pressure, flow_rate, total_volume = stats.get(no, (None, None, None))
+            entry["segments"].append({
+                "segment_no": no,
+                "start_depth": float(bounds[k, 0]),
+                "end_depth": float(bounds[k, 1]),
+                "pressure": pressure,
+                "flow_rate": flow_rate,
+                "total_volume": total_volume,
+                "position": _scene_point(points[1, k]),
+                "start": _scene_point(points[0, k]),
+                "end": _scene_point(points[2, k])
+            })
+    return results
@@ -0,0 +1,286 @@
+from datetime import datetime
+import numpy as np
+from sqlalchemy import and_, or_
+from app import db
+from app.models import MicroseismicEvent, BoreholeTrajectory
+
+#==============================================================================
+# 微震事件空间查询
+# 平面网格索引：每个事件按 (coord_x, coord_y) 落入边长 GRID_CELL_SIZE 的网格，
+# 网格编号写入 grid_cell 列并与 event_time 建复合索引。同一列 (x 方向) 的网格编号连续，
+# 查询区域可转换为若干 grid_cell BETWEEN 区间走索引范围扫描，
+# 再以精确的坐标条件过滤候选行。不依赖 PostGIS，SQLite 与 PostgreSQL 行为一致。
+# 坐标约定：x 为 E，y 为 N，z 为高程 (与钻孔轨迹 coord_e / coord_n / coord_z 对应)。
+#==============================================================================
+
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 10000
+# 区域跨越的网格列数超过此值时不再展开网格区间，直接按坐标范围过滤
+MAX_GRID_COLUMNS = 64
+# 轨迹邻近查询每批读取的候选行数 (只取 id、坐标与时间列)
+CANDIDATE_CHUNK = 5000
+
+def cell_ranges(xmin, ymin, xmax, ymax):
+    """
+    平面矩形覆盖的网格编号区间 (每个网格列一个闭区间)。
+
+    Returns:
+        list: [(起始编号, 结束编号)]；跨越列数超过 MAX_GRID_COLUMNS 时返回空列表。
+    """
+    col_min, row_min = MicroseismicEvent.grid_index(xmin, ymin)
+    col_max, row_max = MicroseismicEvent.grid_index(xmax, ymax)
+    if col_max - col_min + 1 > MAX_GRID_COLUMNS:
+        return []
+    return [(MicroseismicEvent.cell_id(col, row_min), MicroseismicEvent.cell_id(col, row_max))
+            for col in range(col_min, col_max + 1)]
+
+def merge_ranges(ranges):
+    """合并重叠或相邻的编号区间"""
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
+
+def _ranges_clause(ranges):
+    if not ranges:
+        return None
+    return or_(*(MicroseismicEvent.grid_cell.between(low, high) for low, high in merge_ranges(ranges)))
+
+def _grid_clause(xmin, ymin, xmax, ymax):
+    return _ranges_clause(cell_ranges(xmin, ymin, xmax, ymax))
+
+def _box_clauses(xmin, ymin, zmin, xmax, ymax, zmax, ranges=None):
+    """包围盒条件：网格区间 (索引，ranges 未给出时按包围盒计算) + 精确坐标范围"""
+    clauses = [MicroseismicEvent.coord_x.between(xmin, xmax), MicroseismicEvent.coord_y.between(ymin, ymax)]
+    grid = _grid_clause(xmin, ymin, xmax, ymax) if ranges is None else _ranges_clause(ranges)
+    if grid is not None:
+        clauses.insert(0, grid)
+    if zmin is not None:
+        clauses.append(MicroseismicEvent.coord_z >= zmin)
+    if zmax is not None:
+        clauses.append(MicroseismicEvent.coord_z <= zmax)
+    return clauses
+
+def filter_clauses(start=None, end=None, min_energy=None):
+    """时间与能量条件"""
+    clauses = []
+    if start:
+        clauses.append(MicroseismicEvent.event_time >= start)
+    if end:
+        clauses.append(MicroseismicEvent.event_time <= end)
+    if min_energy is not None:
+        clauses.append(MicroseismicEvent.energy >= min_energy)
+    return clauses
+
+def box_clauses(bbox):
+    """包围盒 (xmin, ymin, zmin, xmax, ymax, zmax) 条件，校验上下界"""
+    xmin, ymin, zmin, xmax, ymax, zmax = bbox
+    if xmin > xmax or ymin > ymax or (zmin is not None and zmax is not None and zmin > zmax):
+        raise ValueError("Invalid bbox: min must not exceed max")
+    return _box_clauses(xmin, ymin, zmin, xmax, ymax, zmax)
+
+def _base_query(start=None, end=None, min_energy=None):
+    return MicroseismicEvent.query.filter(*filter_clauses(start, end, min_energy))
+
+def _limit(limit):
+    return min(int(limit or DEFAULT_LIMIT), MAX_LIMIT)
+
+def events_in_box(bbox, start=None, end=None, min_energy=None, limit=DEFAULT_LIMIT):
+    """
+    包围盒内的微震事件 (按时间倒序)。
+
+    Args:
+        bbox (tuple): (xmin, ymin, zmin, xmax, ymax, zmax)；zmin/zmax 可为 None 表示不限高程。
+        start, end (datetime): 事件时间范围。
+        min_energy (float): 最小能量。
+
+    Returns:
+        list: MicroseismicEvent 列表。
+    """
+    query = _base_query(start, end, min_energy).filter(and_(*box_clauses(bbox)))
+    return query.order_by(MicroseismicEvent.event_time.desc()).limit(_limit(limit)).all()
+
+def events_near_point(center, radius, start=None, end=None, min_energy=None, limit=DEFAULT_LIMIT):
+    """
+    以 center 为球心、radius 为半径的球内事件，按距离升序。
+
+    Returns:
+        list: [(MicroseismicEvent, 距离)]
+    """
+    if radius is None or radius < 0:
+        raise ValueError("radius must be a non-negative number")
+    x, y, z = center
+    distance2 = ((MicroseismicEvent.coord_x - x) * (MicroseismicEvent.coord_x - x)
+                 + (MicroseismicEvent.coord_y - y) * (MicroseismicEvent.coord_y - y)
+                 + (MicroseismicEvent.coord_z - z) * (MicroseismicEvent.coord_z - z))
+    query = (_base_query(start, end, min_energy)
+             .filter(and_(*_box_clauses(x - radius, y - radius, z - radius, x + radius, y + radius, z + radius)))
+             .filter(distance2 <= radius * radius)
+             .add_columns(distance2.label('distance2'))
+             .order_by(distance2, MicroseismicEvent.event_time.desc())
+             .limit(_limit(limit)))
+    return [(event, float(d2) ** 0.5) for event, d2 in query.all()]
+
+def trajectory_polyline(borehole_id):
+    """
+    钻孔轨迹折线 (按测深升序，忽略坐标不全的测点)。
+
+    Returns:
+        tuple: (points (n, 3) 数组, 测深 (n,) 数组)
+    """
+    rows = db.session.query(BoreholeTrajectory.measured_depth, BoreholeTrajectory.coord_e,
+                            BoreholeTrajectory.coord_n, BoreholeTrajectory.coord_z) \
+        .filter(BoreholeTrajectory.borehole_id == borehole_id) \
+        .order_by(BoreholeTrajectory.measured_depth).all()
+    rows = [r for r in rows if None not in r]
+    depths = np.array([r[0] for r in rows], dtype=float)
+    points = np.array([r[1:] for r in rows], dtype=float).reshape(-1, 3)
+    return points, depths
+
+def distance_to_polyline(points, vertices, depths):
+    """
+    点集到折线的最短距离及最近点的测深 (逐段投影，向量化)。
+
+    Args:
+        points (np.ndarray): (m, 3) 事件坐标。
+        vertices (np.ndarray): (n, 3) 折线顶点，n >= 1。
+        depths (np.ndarray): (n,) 顶点测深。
+
+    Returns:
+        tuple: (距离 (m,), 最近点测深 (m,))
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    if len(vertices) == 1:
+        return np.linalg.norm(points - vertices[0], axis=1), np.full(len(points), depths[0])
+    a, b = vertices[:-1], vertices[1:]
+    ab = b - a
+    length2 = np.einsum('ij,ij->i', ab, ab)
+    # (m, 段数) 投影参数，零长度段取起点
+    ap = points[:, None, :] - a[None, :, :]
+    t = np.divide(np.einsum('mij,ij->mi', ap, ab), length2, out=np.zeros((len(points), len(ab))), where=length2 > 0)
+    t = np.clip(t, 0.0, 1.0)
+    nearest = a[None, :, :] + t[..., None] * ab[None, :, :]
+    distance = np.linalg.norm(points[:, None, :] - nearest, axis=2)
+    segment = np.argmin(distance, axis=1)
+    rows = np.arange(len(points))
+    best_t = t[rows, segment]
+    return distance[rows, segment], depths[segment] + best_t * (depths[segment + 1] - depths[segment])
+
+def events_near_trajectory(borehole_id, distance, start=None, end=None, min_energy=None, limit=DEFAULT_LIMIT):
+    """
+    与钻孔轨迹距离不超过 distance 的事件，按距离升序。
+    候选行由各轨迹段包围盒 (外扩 distance) 的网格区间取出，只取 id、坐标与时间列分批读取，
+    逐批计算精确距离并只保留最近的 limit 条，内存占用与候选行数无关；最后按 id 载入结果事件。
+
+    Returns:
+        list: [(MicroseismicEvent, 距离, 最近点测深)]；钻孔无轨迹时为空列表。
+    """
+    if distance is None or distance < 0:
+        raise ValueError("distance must be a non-negative number")
+    vertices, depths = trajectory_polyline(borehole_id)
+    if not len(vertices):
+        return []
+    limit = _limit(limit)
+
+    # 各段包围盒外扩 distance 后的网格区间取并集；整体包围盒作为精确的坐标预过滤
+    starts, ends = (vertices, vertices) if len(vertices) == 1 else (vertices[:-1], vertices[1:])
+    lows, highs = np.minimum(starts, ends) - distance, np.maximum(starts, ends) + distance
+    ranges = []
+    for low, high in zip(lows, highs):
+        segment_ranges = cell_ranges(low[0], low[1], high[0], high[1])
+        if not segment_ranges:
+            # 某段跨越网格列过多时退化为整体包围盒
+            ranges = None
+            break
+        ranges.extend(segment_ranges)
+    low, high = lows.min(axis=0), highs.max(axis=0)
+    clauses = _box_clauses(low[0], low[1], low[2], high[0], high[1], high[2], ranges)
+    stmt = _base_query(start, end, min_energy).filter(and_(*clauses)).with_entities(
+        MicroseismicEvent.id, MicroseismicEvent.coord_x, MicroseismicEvent.coord_y, MicroseismicEvent.coord_z,
+        MicroseismicEvent.event_time).statement
+
+    # 保留的候选：[id, 距离, 最近点测深, -时间戳]，按距离升序、同距离时间倒序
+    best = np.empty((0, 4))
+    result = db.session.execute(stmt.execution_options(yield_per=CANDIDATE_CHUNK))
+    try:
+        for rows in result.partitions():
+            data = np.array([tuple(r[:4]) for r in rows], dtype=float)
+            dist, md = distance_to_polyline(data[:, 1:], vertices, depths)
+            newest = -np.array([r.event_time.timestamp() for r in rows])
+            chunk = np.column_stack((data[:, 0], dist, md, newest))[dist <= distance]
+            best = np.concatenate((best, chunk))
+            best = best[np.lexsort((best[:, 3], best[:, 1]))[:limit]]
+    finally:
+        result.close()
+    if not len(best):
+        return []
+
+    ids = best[:, 0].astype(np.int64).tolist()
+    events = {e.id: e for e in MicroseismicEvent.query.filter(MicroseismicEvent.id.in_(ids))}
+    return [(events[i], float(d), float(m)) for i, d, m in zip(ids, best[:, 1], best[:, 2])]
+
+def _parse_floats(text, count, name):
+    try:
+        values = [float(v) for v in text.split(',')]
+    except (AttributeError, ValueError):
+        raise ValueError(f"{name} must be {count} comma-separated numbers")
+    if len(values) != count:
+        raise ValueError(f"{name} must be {count} comma-separated numbers")
+    return values
+
+def parse_bbox(text):
+    """'xmin,ymin,xmax,ymax' 或 'xmin,ymin,zmin,xmax,ymax,zmax' -> 六元组 (平面框不限高程)"""
+    parts = text.split(',') if text else []
+    if len(parts) == 4:
+        xmin, ymin, xmax, ymax = _parse_floats(text, 4, "bbox")
+        return xmin, ymin, None, xmax, ymax, None
+    return tuple(_parse_floats(text, 6, "bbox"))
+
+def parse_filters(params):
+    """
+    请求参数中的 start、end (ISO 时间) 与 min_energy。
+
+    Returns:
+        tuple: (start, end, min_energy)
+    """
+    start = datetime.fromisoformat(params['start']) if params.get('start') else None
+    end = datetime.fromisoformat(params['end']) if params.get('end') else None
+    min_energy = float(params['min_energy']) if params.get('min_energy') not in (None, '') else None
+    return start, end, min_energy
+
+def query_events(params):
+    """
+    按请求参数选择空间查询 (bbox / center+radius / borehole_id+distance)，均未给出时返回最近事件。
+
+    Args:
+        params (dict): bbox, center, radius, borehole_id, distance, start, end, min_energy, limit。
+
+    Returns:
+        list: [(MicroseismicEvent, 距离或 None, 最近点测深或 None)]
+
+    Raises:
+        ValueError: 参数格式错误。
+    """
+    start, end, min_energy = parse_filters(params)
+    limit = int(params.get('limit') or DEFAULT_LIMIT)
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+
+    if params.get('bbox'):
+        events = events_in_box(parse_bbox(params['bbox']), start, end, min_energy, limit)
+        return [(e, None, None) for e in events]
+    if params.get('center'):
+        if params.get('radius') in (None, ''):
+            raise ValueError("radius is required with center")
+        center = _parse_floats(params['center'], 3, "center")
+        return [(e, d, None) for e, d in events_near_point(center, float(params['radius']), start, end, min_energy, limit)]
+    if params.get('borehole_id'):
+        if params.get('distance') in (None, ''):
+            raise ValueError("distance is required with borehole_id")
+        return events_near_trajectory(int(params['borehole_id']), float(params['distance']),
+                                      start, end, min_energy, limit)
+    query = _base_query(start, end, min_energy).order_by(MicroseismicEvent.event_time.desc())
+    return [(e, None, None) for e in query.limit(_limit(limit)).all()]
@@ -0,0 +1,155 @@
+import time
+import numpy as np
+from sqlalchemy import bindparam, text
+from app import db
+from app.models import DrillingSite, Borehole, BoreholeTrajectory
+
+#==============================================================================
+# 钻孔轨迹计算 (最小曲率法)
+# 由测斜数据 (测深 measured_depth、倾角 dip_angle、方位角 grid_azimuth) 计算测点坐标，
+# 以所属钻场坐标为孔口。角度约定与设计轨迹一致：倾角自水平面起算、向上为正，
+# 方位角自北顺时针；坐标 E/N/Z 中 Z 向上。
+# 多个钻孔的测点按 (钻孔, 测深) 排序后整体向量化计算，孔间以分组累加隔开。
+# 孔口至首个测点按首个测点的方向直线延伸。
+#==============================================================================
+
+# PostgreSQL 下每条 UPDATE ... FROM (VALUES ...) 的行数
+UPDATE_CHUNK = 5000
+
+def direction_vectors(dip, azimuth):
+    """倾角/方位角 (度) -> 单位方向向量 (E, N, Z)"""
+    dip = np.radians(np.asarray(dip, dtype=float))
+    azimuth = np.radians(np.asarray(azimuth, dtype=float))
+    horizontal = np.cos(dip)
+    return np.column_stack((horizontal * np.sin(azimuth), horizontal * np.cos(azimuth), np.sin(dip)))
+
+def minimum_curvature(measured_depth, dip, azimuth, group=None):
+    """
+    最小曲率法计算各测点相对孔口的位移。
+
+    相邻测点间位移 = ΔMD / 2 * (t1 + t2) * RF，t 为方向向量，
+    RF = 2 / β * tan(β / 2)，β 为两测点方向夹角 (狗腿角)，β→0 时 RF→1。
+
+    Args:
+        measured_depth (np.ndarray): (n,) 测深，同一钻孔内升序。
+        dip, azimuth (np.ndarray): (n,) 倾角与方位角 (度)。
+        group (np.ndarray): (n,) 钻孔分组标识，同组测点须连续；None 表示全部属于同一钻孔。
+
+    Returns:
+        np.ndarray: (n, 3) 相对孔口的 (dE, dN, dZ)。
+    """
+    md = np.asarray(measured_depth, dtype=float)
+    n = len(md)
+    if not n:
+        return np.empty((0, 3))
+    t = direction_vectors(dip, azimuth)
+    group = np.zeros(n, dtype=np.int64) if group is None else np.asarray(group)
+    first = np.ones(n, dtype=bool)
+    first[1:] = group[1:] != group[:-1]
+
+    # 第 i 段为测点 i-1 -> i；每孔首个测点的"上一测点"为孔口 (测深 0，方向同首个测点)
+    prev_t = np.empty_like(t)
+    prev_t[1:] = t[:-1]
+    prev_t[first] = t[first]
+    prev_md = np.empty_like(md)
+    prev_md[1:] = md[:-1]
+    prev_md[first] = 0.0
+
+    cos_beta = np.clip(np.einsum('ij,ij->i', prev_t, t), -1.0, 1.0)
+    beta = np.arccos(cos_beta)
+    small = beta < 1e-7
+    rf = np.ones(n)
+    rf[~small] = 2.0 / beta[~small] * np.tan(beta[~small] / 2.0)
+    steps = ((md - prev_md) / 2.0 * rf)[:, None] * (prev_t + t)
+
+    # 分组累加：全局累加后减去各组起点之前的累计值
+    total = np.cumsum(steps, axis=0)
+    starts = np.flatnonzero(first)
+    before = np.zeros((len(starts), 3))
+    before[1:] = total[starts[1:] - 1]
+    counts = np.diff(np.append(starts, n))
+    return total - np.repeat(before, counts, axis=0)
+
+def _load_stations(site_id=None, borehole_ids=None):
+    """测斜数据 (含钻场孔口坐标)，按钻孔与测深排序；倾角或方位角缺失的测点不参与计算"""
+    query = db.session.query(
+        BoreholeTrajectory.id, BoreholeTrajectory.borehole_id, BoreholeTrajectory.measured_depth,
+        BoreholeTrajectory.dip_angle, BoreholeTrajectory.grid_azimuth,
+        DrillingSite.coord_e, DrillingSite.coord_n, DrillingSite.coord_z
+    ).join(Borehole, BoreholeTrajectory.borehole_id == Borehole.id) \
+        .join(DrillingSite, Borehole.drilling_site_id == DrillingSite.id) \
+        .filter(BoreholeTrajectory.dip_angle.isnot(None), BoreholeTrajectory.grid_azimuth.isnot(None))
+    if site_id is not None:
+        query = query.filter(Borehole.drilling_site_id == site_id)
+    if borehole_ids is not None:
+        query = query.filter(BoreholeTrajectory.borehole_id.in_(borehole_ids))
+    rows = query.order_by(BoreholeTrajectory.borehole_id, BoreholeTrajectory.measured_depth).all()
+    # 钻场坐标缺失时以 0 为孔口 (结果为相对孔口的位移)
+    return np.array([tuple(r) for r in rows], dtype=float).reshape(-1, 8)
+
+def _write_coordinates(ids, coords):
+    """按主键批量写回坐标"""
+    if not len(ids):
+        return
+    if db.engine.dialect.name == "postgresql":
+        for i in range(0, len(ids), UPDATE_CHUNK):
+            values, params = [], {}
+            for k, (row_id, (e, n, z)) in enumerate(zip(ids[i:i + UPDATE_CHUNK], coords[i:i + UPDATE_CHUNK])):
+                values.append(f"(:id{k}, :e{k}, :n{k}, :z{k})")
+                params.update({f"id{k}": int(row_id), f"e{k}": float(e), f"n{k}": float(n), f"z{k}": float(z)})
+            db.session.execute(text(
+                "UPDATE borehole_trajectory AS t SET coord_e = v.e, coord_n = v.n, coord_z = v.z "
+                f"FROM (VALUES {', '.join(values)}) AS v(id, e, n, z) WHERE t.id = v.id"), params)
+        return
+    table = BoreholeTrajectory.__table__
+    db.session.execute(
+        table.update().where(table.c.id == bindparam("_id")).values(
+            coord_e=bindparam("_e"), coord_n=bindparam("_n"), coord_z=bindparam("_z")),
+        [{"_id": int(r), "_e": float(e), "_n": float(n), "_z": float(z)} for r, (e, n, z) in zip(ids, coords)])
+
+def compute_trajectories(site_id=None, borehole_ids=None, persist=True):
+    """
+    以最小曲率法重算测点坐标并批量写回。调用方负责 commit/rollback。
+
+    Args:
+        site_id (int): 仅计算该钻场的钻孔。
+        borehole_ids (list): 仅计算这些钻孔。
+        persist (bool): 是否写回 borehole_trajectory。
+
+    Returns:
+        dict: {"boreholes", "stations", "compute_ms", "elapsed"}
+    """
+    started = time.perf_counter()
+    data = _load_stations(site_id, borehole_ids)
+    computed = time.perf_counter()
+    offsets = minimum_curvature(data[:, 2], data[:, 3], data[:, 4], group=data[:, 1])
+    collars = np.nan_to_num(data[:, 5:8])
+    compute_ms = (time.perf_counter() - computed) * 1000
+    if persist:
+        _write_coordinates(data[:, 0], collars + offsets)
+    return {
+        "boreholes": int(len(np.unique(data[:, 1]))),
+        "stations": int(len(data)),
+        "compute_ms": compute_ms,
+        "elapsed": time.perf_counter() - started
+    }
+
+def benchmark(stations=100_000, boreholes=1000, repeat=5, seed=0):
+    """
+    在合成测斜数据 (每孔等间距测点，倾角/方位角随机游走) 上测量最小曲率计算耗时。
+
+    Returns:
+        dict: {"stations", "boreholes", "best_ms", "mean_ms"}
+    """
+    rng = np.random.default_rng(seed)
+    per_hole = max(stations // boreholes, 1)
+    group = np.repeat(np.arange(boreholes), per_hole)
+    md = np.tile(np.arange(1, per_hole + 1) * 3.0, boreholes)
+    dip = 10 + np.cumsum(rng.normal(0, 0.2, len(md)))
+    azimuth = 270 + np.cumsum(rng.normal(0, 0.3, len(md)))
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        minimum_curvature(md, dip, azimuth, group)
+        timings.append((time.perf_counter() - t0) * 1000)
+    return {"stations": len(md), "boreholes": boreholes, "best_ms": min(timings), "mean_ms": sum(timings) / len(timings)}
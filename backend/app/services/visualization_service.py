@@ -1,97 +1,237 @@
 from app import db
-from app.models import DrillingSite, Borehole, BoreholeTrajectory, FractureConstructionData, MicroseismicEvent
+from app.models import DrillingSite, Borehole, BoreholeTrajectory, FractureConstructionData, MicroseismicEvent, SystemConfig
+from sqlalchemy import func, select
+from flask import current_app
+from app.services import rollup_service, downsample_service, spatial_service, lod_service, scene_binary, segment_service, deviation_service
+from app.services.auxiliary_service import set_system_config
+import gzip
+import hashlib
+import threading
+import uuid
+import numpy as np
 import random
 from datetime import datetime, timedelta
 
+_scene_cache_lock = threading.Lock()
+
 def get_borehole_fracture_data(borehole_id):
     """
-    获取指定钻孔的压裂段数据及其对应的轨迹坐标。
+    获取指定钻孔的压裂段数据及其对应的轨迹坐标 (段位置见 segment_service)。
     """
-    # 尝试获取真实数据，若无则生成基于轨迹的模拟数据
-    real_data = FractureConstructionData.query.filter_by(borehole_id=borehole_id).all()
-    
-    # 获取轨迹以确定位置
+    geometry = segment_service.get_segment_geometry(borehole_ids=[borehole_id])
+    if not geometry:
+        return []
+    results = geometry[0]["segments"]
+    if results:
+        return results
+
+    # 如果没有真实压裂数据，在轨迹点上生成模拟压裂点用于展示
+    # 每个钻孔生成 5 个模拟压裂段
     trajectories = BoreholeTrajectory.query.filter_by(borehole_id=borehole_id).order_by(BoreholeTrajectory.measured_depth).all()
     if not trajectories:
         return []
-
-    results = []
-    if real_data:
-        for seg in real_data:
-            # 找到最接近的轨迹点 (简单逻辑：根据段号在轨迹中按比例找位置)
-            # 假设段号从1开始，均匀分布在轨迹点中
-            idx = min(len(trajectories) - 1, int((seg.segment_no / 12) * len(trajectories)))
-            t = trajectories[idx]
-            results.append({
-                "segment_no": seg.segment_no,
-                "pressure": seg.pressure,
-                "flow_rate": seg.flow_rate,
-                "total_volume": seg.total_volume,
-                "position": {
-                    "x": t.coord_e,
-                    "y": t.coord_z,
-                    "z": -t.coord_n
-                }
-            })
-    else:
-        # 如果没有真实压裂数据，在轨迹点上生成模拟压裂点用于展示
-        # 每个钻孔生成 5 个模拟压裂段
-        for i in range(1, 6):
-            idx = min(len(trajectories) - 1, i * (len(trajectories) // 6))
-            t = trajectories[idx]
-            results.append({
-                "segment_no": i,
-                "pressure": 15 + random.random() * 10,
-                "flow_rate": 1.5 + random.random() * 1.5,
-                "total_volume": 100 + i * 50,
-                "position": {
-                    "x": t.coord_e,
-                    "y": t.coord_z,
-                    "z": -t.coord_n
-                }
-            })
+    for i in range(1, 6):
+        idx = min(len(trajectories) - 1, i * (len(trajectories) // 6))
+        t = trajectories[idx]
+        results.append({
+            "segment_no": i,
+            "pressure": 15 + random.random() * 10,
+            "flow_rate": 1.5 + random.random() * 1.5,
+            "total_volume": 100 + i * 50,
+            "position": {
+                "x": t.coord_e,
+                "y": t.coord_z,
+                "z": -t.coord_n
+            }
+        })
     return results
 
+def get_fracture_segments(site_id=None, working_face_id=None):
+    """钻场或工作面 (均未给出时为全部) 下所有钻孔的压裂段位置，见 segment_service.get_segment_geometry"""
+    return segment_service.get_segment_geometry(site_id=site_id, working_face_id=working_face_id)
+
+def get_trajectory_deviation(site_id=None, borehole_ids=None):
+    """钻孔实钻轨迹相对设计线的偏差 (逐测点数组与汇总)，见 deviation_service.analyze_deviation"""
+    return deviation_service.analyze_deviation(site_id=site_id, borehole_ids=borehole_ids)
+
+# 三维场景版本戳 (SystemConfig)：管理接口写入钻场/钻孔/轨迹后更新
+DRILLING_VERSION_KEY = "scene_version:drilling"
+DRILLING_MODELS = (DrillingSite, Borehole, BoreholeTrajectory)
+DRILLING_SCENE_FORMATS = ("json", "binary")
+
+def _drilling_rows():
+    """
+    钻场、钻孔与全部轨迹点各一次查询 (不按钻孔逐个查询轨迹)。
+
+    Returns:
+        tuple: (钻场列表, 钻孔列表, 轨迹行 [(borehole_id, measured_depth, e, n, z)], {钻孔 id: (起, 止)})
+    """
+    sites = DrillingSite.query.order_by(DrillingSite.id).all()
+    boreholes = Borehole.query.order_by(Borehole.drilling_site_id, Borehole.id).all()
+    rows = [tuple(r) for r in db.session.query(
+        BoreholeTrajectory.borehole_id, BoreholeTrajectory.measured_depth,
+        BoreholeTrajectory.coord_e, BoreholeTrajectory.coord_n, BoreholeTrajectory.coord_z
+    ).order_by(BoreholeTrajectory.borehole_id, BoreholeTrajectory.measured_depth).all()]
+
+    # 轨迹行按钻孔有序，记录各钻孔的 [起, 止) 区间
+    spans = {}
+    start = 0
+    for i in range(1, len(rows) + 1):
+        if i == len(rows) or rows[i][0] != rows[start][0]:
+            spans[rows[start][0]] = (start, i)
+            start = i
+    return sites, boreholes, rows, spans
+
+def _borehole_info(bh):
+    return {
+        "id": bh.id,
+        "borehole_no": bh.borehole_no,
+        "design_length": bh.design_length or 500,
+        "azimuth": bh.azimuth,
+        "dip_angle": bh.dip_angle,
+        "segments": bh.segments,
+        "max_deviation": bh.max_deviation,
+        "rms_deviation": bh.rms_deviation
+    }
+
+def _site_info(site, boreholes):
+    return {
+        "id": site.id,
+        "name": site.name,
+        "location": site.location,
+        "coord_e": site.coord_e,
+        "coord_n": site.coord_n,
+        "coord_z": site.coord_z,
+        "boreholes": boreholes
+    }
+
 def get_drilling_design_data():
     """获取所有钻场、钻孔及其轨迹数据"""
-    sites = DrillingSite.query.all()
-    data = []
-    for site in sites:
-        site_data = {
-            "id": site.id,
-            "name": site.name,
-            "coord_e": site.coord_e,
-            "coord_n": site.coord_n,
-            "coord_z": site.coord_z,
-            "boreholes": []
-        }
-        for bh in site.boreholes:
-            trajs = BoreholeTrajectory.query.filter_by(borehole_id=bh.id).order_by(BoreholeTrajectory.measured_depth).all()
-            site_data["boreholes"].append({
-                "id": bh.id,
-                "borehole_no": bh.borehole_no,
-                "design_length": bh.design_length or 500,
-                "trajectories": [
-                    {"measured_depth": t.measured_depth, "coord_e": t.coord_e, "coord_n": t.coord_n, "coord_z": t.coord_z}
-                    for t in trajs
-                ]
-            })
-        data.append(site_data)
-    return data
-
-def get_microseismic_points():
-    """获取最近的微震事件点用于 3D 展示"""
-    events = MicroseismicEvent.query.order_by(MicroseismicEvent.event_time.desc()).limit(200).all()
-    return [
-        {
-            "id": e.id,
-            "time": e.event_time.isoformat(),
-            "x": e.coord_x,
-            "y": e.coord_z, # 映射到 3D 空间的 Y (高度)
-            "z": -e.coord_y, # 映射到 3D 空间的 Z (北向取反)
-            "energy": e.energy
-        } for e in events
-    ]
+    sites, boreholes, rows, spans = _drilling_rows()
+    by_site = {}
+    for bh in boreholes:
+        a, b = spans.get(bh.id, (0, 0))
+        by_site.setdefault(bh.drilling_site_id, []).append(dict(_borehole_info(bh), trajectories=[
+            {"measured_depth": md, "coord_e": e, "coord_n": n, "coord_z": z}
+            for _, md, e, n, z in rows[a:b]
+        ]))
+    return [_site_info(site, by_site.get(site.id, [])) for site in sites]
+
+def get_drilling_design_binary():
+    """
+    钻场、钻孔及轨迹的二进制表示 (格式见 scene_binary)。
+    JSON 头为钻场/钻孔属性，每个钻孔引用两个缓冲区：positions (n, 3) 场景坐标与 measured_depth (n,)；
+    原点 origin 为首个钻场坐标，与前端场景原点一致。
+
+    Returns:
+        bytes
+    """
+    sites, boreholes, rows, spans = _drilling_rows()
+    table = np.array(rows, dtype=float).reshape(-1, 5)
+    origin = [0.0, 0.0, 0.0]
+    if sites:
+        origin = [sites[0].coord_e or 0.0, sites[0].coord_n or 0.0, sites[0].coord_z or 0.0]
+    positions = scene_binary.scene_positions(table[:, 2], table[:, 3], table[:, 4], origin)
+
+    arrays = []
+    by_site = {}
+    for bh in boreholes:
+        a, b = spans.get(bh.id, (0, 0))
+        arrays += [positions[a:b], table[a:b, 1]]
+        by_site.setdefault(bh.drilling_site_id, []).append(
+            dict(_borehole_info(bh), positions=len(arrays) - 2, measured_depth=len(arrays) - 1))
+    header = {
+        "origin": origin,
+        "axes": ["E", "Z", "-N"],
+        "sites": [_site_info(site, by_site.get(site.id, [])) for site in sites]
+    }
+    return scene_binary.pack(header, arrays)
+
+def drilling_version():
+    """
+    钻场/钻孔/轨迹数据的版本摘要：管理接口写入时更新的版本戳，
+    加上各表行数与最大 id (覆盖导入等其他途径的增删)，一次查询取得。
+    """
+    parts = [select(SystemConfig.config_value)
+             .where(SystemConfig.config_key == DRILLING_VERSION_KEY).scalar_subquery()]
+    for model in DRILLING_MODELS:
+        parts += [select(func.count()).select_from(model).scalar_subquery(),
+                  select(func.max(model.id)).scalar_subquery()]
+    row = db.session.execute(select(*parts)).one()
+    return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()[:20]
+
+def touch_drilling_version():
+    """钻场/钻孔/轨迹写入后调用，使各进程的场景缓存失效"""
+    set_system_config(DRILLING_VERSION_KEY, uuid.uuid4().hex, "钻场/钻孔/轨迹数据版本戳 (三维场景缓存)")
+
+def drilling_scene_etag(version, fmt):
+    return f"drilling-{version}-{fmt}"
+
+def get_drilling_scene(fmt, version, compress=False):
+    """
+    序列化后的三维场景 (json 或 binary)，按版本缓存在应用实例内 (进程级)，版本变化时重建。
+
+    Args:
+        fmt (str): json | binary。
+        version (str): drilling_version() 的结果。
+        compress (bool): 返回 gzip 压缩后的字节 (同样缓存)。
+
+    Returns:
+        bytes
+    """
+    if fmt not in DRILLING_SCENE_FORMATS:
+        raise ValueError(f"Invalid scene format: {fmt}")
+    cache = current_app.extensions.setdefault('drilling_scene_cache', {})
+    with _scene_cache_lock:
+        entry = cache.get(fmt)
+        if entry is None or entry["version"] != version:
+            if fmt == "json":
+                raw = current_app.json.dumps(get_drilling_design_data()).encode("utf-8")
+            else:
+                raw = get_drilling_design_binary()
+            entry = cache[fmt] = {"version": version, "raw": raw, "gzip": None}
+        if not compress:
+            return entry["raw"]
+        if entry["gzip"] is None:
+            entry["gzip"] = gzip.compress(entry["raw"], compresslevel=6)
+        return entry["gzip"]
+
+def _event_point(e, distance=None, measured_depth=None):
+    point = {
+        "id": e.id,
+        "time": e.event_time.isoformat(),
+        "x": e.coord_x,
+        "y": e.coord_z, # 映射到 3D 空间的 Y (高度)
+        "z": -e.coord_y, # 映射到 3D 空间的 Z (北向取反)
+        "energy": e.energy
+    }
+    if distance is not None:
+        point["distance"] = round(distance, 3)
+    if measured_depth is not None:
+        point["measured_depth"] = round(measured_depth, 3)
+    return point
+
+def get_microseismic_points(params=None):
+    """
+    获取微震事件点用于 3D 展示。默认为最近 200 个事件；
+    可按包围盒 / 点半径 / 钻孔轨迹距离及时间、能量筛选 (参数见 spatial_service.query_events)。
+    按距离查询时附带 distance (m)，按钻孔查询时另附最近点测深 measured_depth。
+    带 lod 参数时返回分级结果，见 get_microseismic_lod。
+    """
+    params = params or {}
+    if params.get('lod'):
+        return get_microseismic_lod(params)
+    return [_event_point(*r) for r in spatial_service.query_events(params)]
+
+def get_microseismic_lod(params):
+    """
+    微震点云分级显示：相机区域内事件较少时返回原始点 (points)，否则返回体素聚合 (voxels)。
+    参数与返回结构见 lod_service.microseismic_lod，原始点格式同 get_microseismic_points。
+    """
+    result = lod_service.microseismic_lod(params)
+    if result["mode"] == "points":
+        result["points"] = [_event_point(*r) for r in result.pop("events")]
+    return result
 
 # 其余仪表盘和趋势函数暂保持模拟或后续对接...
 def get_dashboard_core_metrics():
@@ -102,36 +242,94 @@ def get_dashboard_core_metrics():
         "fracturing": { "order": 5, "recorded_p": 22.4, "status": "COMPLETED" }
     }
 
-def get_pressure_trend_data(time_range):
-    data_points = []
-    now = datetime.now()
-    for i in range(100):
-        timestamp = (now - timedelta(minutes=(100-i)*5)).isoformat()
-        value = 30 + random.random() * 10
-        data_points.append({"x": timestamp, "y": round(value, 2)})
-    return data_points
-
-def get_microseismic_frequency_data(time_range):
-    data = []
-    now = datetime.now()
-    for i in range(24):
-        hour = now - timedelta(hours=i)
-        data.append({"x": hour.strftime('%H:00'), "y": random.randint(0, 15)})
-    return data[::-1]
-
-def get_deformation_trend_data(time_range):
-    datasets = []
-    labels = []
-    now = datetime.now()
-    for i in range(24): labels.append((now - timedelta(hours=24-i)).strftime('%H:00'))
-    for station in ['测点A', '测点B', '测点C']:
-        data_points = []
-        base_deformation = random.uniform(20, 50)
-        for _ in range(24):
-            base_deformation += random.uniform(0.1, 1.5)
-            data_points.append(round(base_deformation, 2))
-        datasets.append({"label": station, "data": data_points})
-    return {"labels": labels, "datasets": datasets}
+def _trend_buckets(start, end, resolution):
+    """窗口内全部桶起点 (用于补齐无数据的桶)"""
+    step = rollup_service.RESOLUTIONS[resolution]
+    buckets = []
+    while start < end:
+        buckets.append(start)
+        start += step
+    return buckets
+
+def _bucket_label(bucket, resolution):
+    return bucket.strftime({"1m": '%H:%M', "1h": '%H:00', "1d": '%m-%d'}[resolution])
+
+def _epoch(times):
+    """桶起点 -> 秒级时间戳数组 (LTTB 横坐标)"""
+    return np.asarray(times, dtype='datetime64[us]').astype(np.int64) / 1e6
+
+def _trend_points(max_points, mode):
+    """
+    客户端指定 max_points 时按其选择读取粒度 (至少 max_points 个桶) 并降采样到 max_points；
+    未指定时沿用 TREND_MIN_POINTS 选粒度，仅以 TREND_MAX_POINTS 兜底。
+
+    Returns:
+        tuple: (选粒度用的最少点数, 降采样上限)
+    """
+    if mode not in downsample_service.DOWNSAMPLE_MODES:
+        raise ValueError(f"Unknown downsample mode: {mode}")
+    limit = current_app.config.get('TREND_MAX_POINTS', 5000)
+    if max_points:
+        max_points = min(max(max_points, downsample_service.MIN_POINTS), limit)
+        return max_points, max_points
+    return current_app.config.get('TREND_MIN_POINTS', 24), limit
+
+def get_pressure_trend_data(time_range, max_points=None, mode="lttb", station=None, support=None):
+    """
+    支架压力 (P1) 均值趋势，读取 metric_rollup。
+    默认为工作面整体；指定 station 为该测站，同时指定 support 为单个支架。
+    """
+    min_points, max_points = _trend_points(max_points, mode)
+    scope, series_key = "face", None
+    if station is not None:
+        scope, series_key = ("support", f"{station}-{support}") if support is not None else ("station", str(station))
+    _, _, _, frame = rollup_service.read_series("pressure", scope, time_range, min_points, series_key=series_key)
+    frame = frame[frame["sample_count"] > 0]
+    times = frame["bucket_start"].to_numpy()
+    values = (frame["value_sum"] / frame["sample_count"]).to_numpy()
+    chosen = downsample_service.downsample_indices(_epoch(times), values, max_points, mode)
+    return [{
+        "x": frame["bucket_start"].iloc[i].to_pydatetime().isoformat(),
+        "y": round(float(values[i]), 2)
+    } for i in chosen]
+
+def get_microseismic_frequency_data(time_range, max_points=None, mode="lttb"):
+    """微震事件频次 (每桶事件数，无事件的桶为 0)"""
+    min_points, max_points = _trend_points(max_points, mode)
+    resolution, start, end, frame = rollup_service.read_series("seismic", "face", time_range, min_points)
+    counts = {r.bucket_start.to_pydatetime(): int(r.sample_count) for r in frame.itertuples(index=False)}
+    buckets = _trend_buckets(start, end, resolution)
+    values = np.array([counts.get(b, 0) for b in buckets], dtype=float)
+    chosen = downsample_service.downsample_indices(_epoch(buckets), values, max_points, mode)
+    return [{"x": _bucket_label(buckets[i], resolution), "y": int(values[i])} for i in chosen]
+
+def get_deformation_trend_data(time_range, max_points=None, mode="lttb"):
+    """
+    各测站顶底板移近量均值趋势 (无数据的桶为 None)。
+    各测站共用横轴，降采样按测站均值曲线选点，所有测站取相同的桶。
+    """
+    min_points, max_points = _trend_points(max_points, mode)
+    resolution, start, end, frame = rollup_service.read_series("deformation", "station", time_range, min_points)
+    frame = frame[frame["sample_count"] > 0]
+    buckets = _trend_buckets(start, end, resolution)
+    stations = sorted(frame["series_key"].unique())
+    # 测站 x 桶 的均值矩阵，无数据处为 NaN
+    grid = np.full((len(stations), len(buckets)), np.nan)
+    rows = frame["series_key"].map({s: i for i, s in enumerate(stations)}).to_numpy()
+    columns = ((_epoch(frame["bucket_start"].to_numpy()) - _epoch([start])[0])
+               // rollup_service.RESOLUTIONS[resolution].total_seconds()).astype(np.int64)
+    grid[rows, columns] = (frame["value_sum"] / frame["sample_count"]).to_numpy()
+    if len(buckets) <= max_points:
+        chosen = range(len(buckets))
+    else:
+        present = (~np.isnan(grid)).sum(axis=0)
+        mean = np.where(present > 0, np.nansum(grid, axis=0) / np.maximum(present, 1), np.nan)
+        chosen = downsample_service.downsample_indices(_epoch(buckets), mean, max_points, mode)
+    datasets = [{
+        "label": station,
+        "data": [None if np.isnan(grid[row, i]) else round(float(grid[row, i]), 2) for i in chosen]
+    } for row, station in enumerate(stations)]
+    return {"labels": [_bucket_label(buckets[i], resolution) for i in chosen], "datasets": datasets}
 
 def get_realtime_fusion_score():
     """获取实时的多源数据融合评分"""
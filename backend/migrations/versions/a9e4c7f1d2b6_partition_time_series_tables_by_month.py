@@ -0,0 +1,110 @@
+"""partition time-series tables by month (PostgreSQL)
+
+Revision ID: a9e4c7f1d2b6
+Revises: f3a86c0d5b21
+Create Date: 2026-10-18 13:05:12.447190
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9e4c7f1d2b6'
+down_revision = 'f3a86c0d5b21'
+branch_labels = None
+depends_on = None
+
+# 表 -> (分区键, 自然键唯一约束列, 外键)
+# 分区命名与 app/services/partition_service.py 一致：<表>_pYYYY_MM 与 <表>_default
+TABLES = {
+    'support_pressure_data': ('record_time', ['station_no', 'support_no', 'record_time'], None),
+    'microseismic_event': ('event_time', ['event_time', 'coord_x', 'coord_y', 'coord_z'], None),
+    'roadway_deformation': ('record_time', None, None),
+    'fracture_construction_data': ('record_time', None, ('borehole_id', 'borehole', 'id')),
+}
+# 迁移时预建的未来月份数
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes(table, column, unique_cols, fk):
+    """主键须包含分区键；自然键唯一约束本身已包含分区键"""
+    op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, {column})')
+    op.execute(f'CREATE INDEX ix_{table}_{column} ON {table} ({column})')
+    if unique_cols:
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT uq_{table}_natural_key UNIQUE ({", ".join(unique_cols)})')
+    if fk:
+        local, remote_table, remote_col = fk
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_{local}_fkey '
+                   f'FOREIGN KEY ({local}) REFERENCES {remote_table} ({remote_col})')
+
+
+def _rename_old(table, column, unique_cols, fk, suffix):
+    op.execute(f'ALTER TABLE {table} RENAME TO {table}{suffix}')
+    op.execute(f'ALTER TABLE {table}{suffix} RENAME CONSTRAINT {table}_pkey TO {table}{suffix}_pkey')
+    op.execute(f'ALTER INDEX ix_{table}_{column} RENAME TO ix_{table}{suffix}_{column}')
+    if unique_cols:
+        op.execute(f'ALTER TABLE {table}{suffix} RENAME CONSTRAINT uq_{table}_natural_key '
+                   f'TO uq_{table}{suffix}_natural_key')
+    if fk:
+        op.execute(f'ALTER TABLE {table}{suffix} RENAME CONSTRAINT {table}_{fk[0]}_fkey TO {table}{suffix}_{fk[0]}_fkey')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # SQLite 等不支持声明式分区，保持普通表
+        return
+
+    this_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for table, (column, unique_cols, fk) in TABLES.items():
+        _rename_old(table, column, unique_cols, fk, '_unpartitioned')
+        op.execute(f'CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS INCLUDING COMMENTS) '
+                   f'PARTITION BY RANGE ({column})')
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL')
+        _create_indexes(table, column, unique_cols, fk)
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+        # 覆盖既有数据所在月份至未来 MONTHS_AHEAD 个月
+        first = bind.execute(sa.text(f'SELECT MIN({column}) FROM {table}_unpartitioned')).scalar()
+        month = min(first.replace(day=1, hour=0, minute=0, second=0, microsecond=0), this_month) if first else this_month
+        last = _add_months(this_month, MONTHS_AHEAD)
+        while month <= last:
+            upper = _add_months(month, 1)
+            op.execute(f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} "
+                       f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')")
+            month = upper
+
+        # 旧表中缺失时间的行按写入默认值 (当前时间) 补齐，分区键不允许为空
+        op.execute(f'UPDATE {table}_unpartitioned SET {column} = now() WHERE {column} IS NULL')
+        op.execute(f'INSERT INTO {table} SELECT * FROM {table}_unpartitioned')
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+        op.execute(f'DROP TABLE {table}_unpartitioned')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    for table, (column, unique_cols, fk) in TABLES.items():
+        _rename_old(table, column, unique_cols, fk, '_partitioned')
+        op.execute(f'CREATE TABLE {table} (LIKE {table}_partitioned INCLUDING DEFAULTS INCLUDING COMMENTS)')
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN {column} DROP NOT NULL')
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)')
+        op.execute(f'CREATE INDEX ix_{table}_{column} ON {table} ({column})')
+        if unique_cols:
+            op.execute(f'ALTER TABLE {table} ADD CONSTRAINT uq_{table}_natural_key UNIQUE ({", ".join(unique_cols)})')
+        if fk:
+            local, remote_table, remote_col = fk
+            op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_{local}_fkey '
+                       f'FOREIGN KEY ({local}) REFERENCES {remote_table} ({remote_col})')
+        op.execute(f'INSERT INTO {table} SELECT * FROM {table}_partitioned')
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+        op.execute(f'DROP TABLE {table}_partitioned CASCADE')
@@ -0,0 +1,68 @@
+"""Key microseismic_event on (event_time, location_key) so events without coordinates dedupe
+
+Revision ID: b2e7d4c9a183
+Revises: f1c6d8a2b394
+Create Date: 2026-10-18 21:04:12.518364
+
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e7d4c9a183'
+down_revision = 'f1c6d8a2b394'
+branch_labels = None
+depends_on = None
+
+
+def _coord_text(value):
+    """与 MicroseismicEvent.location_of 一致"""
+    if value is None:
+        return ""
+    value = Decimal(f"{float(value):.15g}").quantize(Decimal("0.001"), rounding=ROUND_HALF_UP)
+    return str(value.copy_abs() if value == 0 else value)
+
+
+def _backfill(bind):
+    if bind.dialect.name == 'postgresql':
+        coords = " || '|' || ".join(f"COALESCE(ROUND({c}::numeric, 3)::text, '')"
+                                    for c in ('coord_x', 'coord_y', 'coord_z'))
+        op.execute(f'UPDATE microseismic_event SET location_key = {coords}')
+        return
+    rows = bind.execute(sa.text('SELECT id, coord_x, coord_y, coord_z FROM microseismic_event')).fetchall()
+    if rows:
+        bind.execute(sa.text('UPDATE microseismic_event SET location_key = :key WHERE id = :id'), [
+            {"id": row_id, "key": f"{_coord_text(x)}|{_coord_text(y)}|{_coord_text(z)}"}
+            for row_id, x, y, z in rows
+        ])
+
+
+def upgrade():
+    with op.batch_alter_table('microseismic_event', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('location_key', sa.String(length=100), nullable=True,
+                                      comment='位置键(自然键，坐标缺失为空)'))
+
+    _backfill(op.get_bind())
+    # 坐标缺失的事件此前不受自然键约束，可能存在重发造成的重复：按新自然键保留最早写入的一条
+    op.execute(
+        "DELETE FROM microseismic_event "
+        "WHERE id NOT IN (SELECT MIN(id) FROM microseismic_event GROUP BY event_time, location_key)"
+    )
+
+    with op.batch_alter_table('microseismic_event', schema=None) as batch_op:
+        batch_op.alter_column('location_key',
+               existing_type=sa.String(length=100),
+               nullable=False,
+               existing_comment='位置键(自然键，坐标缺失为空)')
+        batch_op.drop_constraint('uq_microseismic_event_natural_key', type_='unique')
+        batch_op.create_unique_constraint('uq_microseismic_event_natural_key', ['event_time', 'location_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('microseismic_event', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_microseismic_event_natural_key', type_='unique')
+        batch_op.create_unique_constraint('uq_microseismic_event_natural_key',
+                                          ['event_time', 'coord_x', 'coord_y', 'coord_z'])
+        batch_op.drop_column('location_key')
@@ -0,0 +1,46 @@
+"""Add natural key unique constraints for pressure and microseismic data
+
+Revision ID: c4f1a7d2e8b3
+Revises: e936f02a3a7a
+Create Date: 2026-10-18 09:12:40.118302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f1a7d2e8b3'
+down_revision = 'e936f02a3a7a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 先清理采集端重发造成的历史重复行 (保留每组最早写入的一条)
+    op.execute(
+        "DELETE FROM support_pressure_data "
+        "WHERE station_no IS NOT NULL AND support_no IS NOT NULL AND record_time IS NOT NULL "
+        "AND id NOT IN (SELECT MIN(id) FROM support_pressure_data "
+        "GROUP BY station_no, support_no, record_time)"
+    )
+    op.execute(
+        "DELETE FROM microseismic_event "
+        "WHERE event_time IS NOT NULL AND coord_x IS NOT NULL AND coord_y IS NOT NULL AND coord_z IS NOT NULL "
+        "AND id NOT IN (SELECT MIN(id) FROM microseismic_event "
+        "GROUP BY event_time, coord_x, coord_y, coord_z)"
+    )
+
+    with op.batch_alter_table('support_pressure_data', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_support_pressure_data_natural_key', ['station_no', 'support_no', 'record_time'])
+
+    with op.batch_alter_table('microseismic_event', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_microseismic_event_natural_key', ['event_time', 'coord_x', 'coord_y', 'coord_z'])
+
+
+def downgrade():
+    with op.batch_alter_table('microseismic_event', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_microseismic_event_natural_key', type_='unique')
+
+    with op.batch_alter_table('support_pressure_data', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_support_pressure_data_natural_key', type_='unique')
@@ -0,0 +1,46 @@
+"""Make support_pressure_data.station_no NOT NULL (0 when not reported)
+
+Revision ID: f1c6d8a2b394
+Revises: e7a1c3f95d28
+Create Date: 2026-10-18 19:20:31.640187
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6d8a2b394'
+down_revision = 'e7a1c3f95d28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 测站号为 NULL 的行不受自然键约束，可能存在重发造成的重复：
+    # 按 (COALESCE(station_no, 0), support_no, record_time) 保留最早写入的一条，再以 0 填充
+    op.execute(
+        "DELETE FROM support_pressure_data "
+        "WHERE support_no IS NOT NULL AND record_time IS NOT NULL "
+        "AND id NOT IN (SELECT MIN(id) FROM support_pressure_data "
+        "GROUP BY COALESCE(station_no, 0), support_no, record_time)"
+    )
+    op.execute("UPDATE support_pressure_data SET station_no = 0 WHERE station_no IS NULL")
+
+    with op.batch_alter_table('support_pressure_data', schema=None) as batch_op:
+        batch_op.alter_column('station_no',
+               existing_type=sa.INTEGER(),
+               nullable=False,
+               server_default='0',
+               existing_comment='测站号',
+               comment='测站号 (未上报为 0)')
+
+
+def downgrade():
+    with op.batch_alter_table('support_pressure_data', schema=None) as batch_op:
+        batch_op.alter_column('station_no',
+               existing_type=sa.INTEGER(),
+               nullable=True,
+               server_default=None,
+               existing_comment='测站号 (未上报为 0)',
+               comment='测站号')
@@ -3,4 +3,11 @@ from app import create_app, socketio
 app = create_app()
 
 if __name__ == '__main__':
+    # 后台任务只随服务进程启动 (flask 命令行同样导入本模块，但不经过这里)
+    from app.services.ingest_queue import ingest_queue
+    from app.services.interface_log_sink import interface_log_sink
+    from app.services.partition_service import partition_maintainer
+    ingest_queue.start()
+    interface_log_sink.start()
+    partition_maintainer.start()
     socketio.run(app, debug=True, host='0.0.0.0', port=5005)
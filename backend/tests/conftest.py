@@ -5,6 +5,10 @@ from config import Config
 class TestConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    INGEST_QUEUE_WORKERS = 0
+    INTERFACE_LOG_FLUSH_SIZE = 1
+    INTERFACE_LOG_FLUSH_INTERVAL = 0
+    PARQUET_CACHE_DIR = ''
 
 @pytest.fixture
 def app():
@@ -1,3 +1,11 @@
+import gzip
+import numpy as np
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models import DrillingSite, Borehole, BoreholeTrajectory, User
+from app.services import scene_binary, visualization_service
+
 def test_get_borehole_fracture_data(client):
     """测试获取钻孔压裂数据 API"""
     response = client.get('/api/v1/visualization/fracture-data/1')
@@ -10,3 +18,71 @@ def test_get_borehole_fracture_data(client):
         assert 'pressure' in item
         assert 'position' in item
         assert 'x' in item['position']
+
+ORIGIN = (39500000.0, 4300000.0, -520.0)
+
+@pytest.fixture
+def scene(app, client):
+    """1 个钻场、3 个钻孔 (轨迹点数 50/0/7)，返回管理员请求头"""
+    site = DrillingSite(name='1# 钻场', coord_e=ORIGIN[0], coord_n=ORIGIN[1], coord_z=ORIGIN[2])
+    db.session.add(site)
+    db.session.flush()
+    holes = [Borehole(drilling_site_id=site.id, borehole_no=f'ZK-{i}', azimuth=90.0, dip_angle=10.0) for i in (1, 2, 3)]
+    db.session.add_all(holes)
+    db.session.flush()
+    for hole, count in zip(holes, (50, 0, 7)):
+        for i in range(count):
+            db.session.add(BoreholeTrajectory(borehole_id=hole.id, measured_depth=3.0 * i, coord_e=ORIGIN[0] + 2.5 * i,
+                                              coord_n=ORIGIN[1] + 0.01 * i, coord_z=ORIGIN[2] + 0.1 * i))
+    user = User(username='scene_admin', role='ADMIN')
+    user.set_password('pass')
+    db.session.add(user)
+    db.session.commit()
+    token = client.post('/api/v1/auth/login', json={'username': 'scene_admin', 'password': 'pass'}).get_json()['token']
+    return {'Authorization': f'Bearer {token}'}
+
+def test_drilling_design_binary(client, scene):
+    """二进制轨迹：大地坐标平移到首个钻场后以 float32 传输，gzip 压缩"""
+    response = client.get('/api/v1/visualize/drilling_design?format=binary', headers=dict(scene, **{'Accept-Encoding': 'gzip'}))
+    assert response.status_code == 200 and response.mimetype == scene_binary.MIMETYPE
+    assert response.headers['Content-Encoding'] == 'gzip'
+    header, arrays = scene_binary.unpack(gzip.decompress(response.data))
+    assert header['origin'] == list(ORIGIN) and all(b['offset'] % 4 == 0 for b in header['buffers'])
+    boreholes = header['sites'][0]['boreholes']
+    assert [b['borehole_no'] for b in boreholes] == ['ZK-1', 'ZK-2', 'ZK-3']
+    first = arrays[boreholes[0]['positions']]
+    assert first.dtype == np.dtype('<f4') and first.shape == (50, 3)
+    # x=E, y=Z, z=-N，相对原点的毫米级精度得以保留
+    assert np.allclose(first[-1], (2.5 * 49, 0.1 * 49, -0.01 * 49), atol=1e-4)
+    assert arrays[boreholes[1]['positions']].shape == (0, 3)
+    assert arrays[boreholes[2]['measured_depth']].tolist() == [3.0 * i for i in range(7)]
+
+    # 默认仍为 JSON
+    json_response = client.get('/api/v1/visualize/drilling_design', headers=scene)
+    assert json_response.is_json and len(json_response.get_json()[0]['boreholes'][0]['trajectories']) == 50
+
+def test_drilling_design_batched_cached_and_etag(client, app, scene):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        visualization_service.get_drilling_design_data()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    # 钻场、钻孔、轨迹各一次，与钻孔数无关
+    assert len(statements) == 3
+
+    first = client.get('/api/v1/visualize/drilling_design', headers=scene)
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and etag.startswith('W/')
+    cached = app.extensions['drilling_scene_cache']['json']
+    again = client.get('/api/v1/visualize/drilling_design', headers=scene)
+    assert again.data == first.data and app.extensions['drilling_scene_cache']['json'] is cached
+    assert client.get('/api/v1/visualize/drilling_design', headers=dict(scene, **{'If-None-Match': etag})).status_code == 304
+
+    # 管理接口修改钻孔属性 (行数与 id 不变) 后版本戳更新
+    hole = Borehole.query.filter_by(borehole_no='ZK-2').first()
+    assert client.put(f'/api/v1/management/borehole/{hole.id}', json={'design_length': 321.0}, headers=scene).status_code == 200
+    changed = client.get('/api/v1/visualize/drilling_design', headers=dict(scene, **{'If-None-Match': etag}))
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert changed.get_json()[0]['boreholes'][1]['design_length'] == 321.0
@@ -0,0 +1,123 @@
+import os
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.models import SupportPressureData
+from app.services import archive_service, ingest_service
+from app.services.auxiliary_service import query_data
+
+@pytest.fixture
+def archived_app(app, tmp_path):
+    """1/30 至 3/2 每 12 小时一条矿压数据，归档 3/1 12:00 之前的部分"""
+    app.config['ARCHIVE_DIR'] = str(tmp_path)
+    times = [datetime(2025, 1, 30) + timedelta(hours=12 * i) for i in range(64)]
+    ingest_service.insert_columns(SupportPressureData, {
+        'record_time': times, 'station_no': [1] * 64, 'support_no': [i % 2 + 1 for i in range(64)],
+        'position': ['上部'] * 64, 'p1': [float(i) for i in range(64)]
+    }, 64)
+    db.session.commit()
+    return archive_service.archive_before(datetime(2025, 3, 1, 12), targets=('pressure',), echo=lambda _: None)
+
+def test_archive_moves_rows_by_month(archived_app, tmp_path):
+    report = archived_app['pressure']
+    assert report['rows'] == 61 and report['months'] == 3
+    assert archive_service.horizon('pressure') == datetime(2025, 3, 1, 12)
+    assert SupportPressureData.query.count() == 3
+    assert sorted(os.listdir(tmp_path / 'support_pressure_data')) == ['month=2025-01', 'month=2025-02', 'month=2025-03']
+    # 按月目录裁剪
+    assert [m for m, _ in archive_service.archive_months('pressure', datetime(2025, 2, 10), datetime(2025, 2, 20))] == \
+        [datetime(2025, 2, 1)]
+    # 重跑不产生重复行
+    again = archive_service.archive_before(datetime(2025, 3, 1, 12), targets=('pressure',), echo=lambda _: None)
+    assert again['pressure']['rows'] == 0
+    assert len(archive_service.read_archive('pressure')) == 61
+
+def test_late_rows_are_not_deleted_unarchived(app, tmp_path, monkeypatch):
+    """读取归档窗口之后才提交的迟到行不被删除，下次归档时写入"""
+    app.config['ARCHIVE_DIR'] = str(tmp_path)
+    times = [datetime(2025, 1, 10) + timedelta(days=i) for i in range(5)]
+    ingest_service.insert_columns(SupportPressureData, {
+        'record_time': times, 'station_no': [1] * 5, 'support_no': list(range(5)), 'p1': [1.0] * 5
+    }, 5)
+    db.session.commit()
+
+    write_month = archive_service._write_month
+    def write_then_late_insert(*args):
+        result = write_month(*args)
+        db.session.add(SupportPressureData(station_no=2, support_no=1, p1=9.0, record_time=datetime(2025, 1, 12)))
+        db.session.flush()
+        return result
+    monkeypatch.setattr(archive_service, '_write_month', write_then_late_insert)
+    report = archive_service.archive_before(datetime(2025, 2, 1), targets=('pressure',), echo=lambda _: None)
+    assert report['pressure']['rows'] == 5
+    assert [r.p1 for r in SupportPressureData.query] == [9.0]
+
+    monkeypatch.setattr(archive_service, '_write_month', write_month)
+    again = archive_service.archive_before(datetime(2025, 2, 1), targets=('pressure',), echo=lambda _: None)
+    assert again['pressure']['rows'] == 1 and SupportPressureData.query.count() == 0
+    assert len(archive_service.read_archive('pressure')) == 6
+
+def test_query_unions_archive_and_live(archived_app):
+    rows = query_data({"target": "pressure", "start_time": "2025-02-28T00:00:00", "limit": 5})
+    assert [r['p1'] for r in rows] == [63.0, 62.0, 61.0, 60.0, 59.0]
+    assert rows[-1]['record_time'] == '2025-02-28T12:00:00'
+
+    filtered = query_data({"target": "pressure", "filters": {"support_no": 2, "p1": {"lt": 10}}})
+    assert [r['p1'] for r in filtered] == [9.0, 7.0, 5.0, 3.0, 1.0]
+
+    projected = query_data({"target": "pressure", "fields": ["p1"], "start_time": "2025-03-01T00:00:00"})
+    assert projected['columns'] == ['p1'] and projected['data']['p1'] == [63.0, 62.0, 61.0, 60.0]
+
+    # 3/1 的日桶跨过水位：60 在归档中，61 在数据库中
+    daily = query_data({"target": "pressure", "start_time": "2025-02-28T00:00:00",
+                        "group_by": "1d", "aggregates": {"p1": ["avg", "max"], "*": "count"}})
+    assert daily['columns'] == ['bucket', 'p1_avg', 'p1_max', 'count']
+    assert daily['data']['bucket'] == ['2025-02-28T00:00:00', '2025-03-01T00:00:00', '2025-03-02T00:00:00']
+    assert daily['data']['p1_avg'] == [58.5, 60.5, 62.5] and daily['data']['count'] == [2, 2, 2]
+
+def test_evaluation_window_mean_spans_horizon(archived_app):
+    assert archive_service.window_mean('pressure', 'p1', datetime(2025, 3, 1), datetime(2025, 3, 2)) == 61.0
+    assert archive_service.window_mean('pressure', 'p1', datetime(2025, 3, 1), datetime(2025, 3, 2),
+                                       include_start=False, include_end=False) == 61.0
+    assert archive_service.window_mean('pressure', 'p1', datetime(2024, 1, 1), datetime(2024, 2, 1)) is None
+
+def test_rows_left_live_after_interrupted_archive_are_counted_once(app, tmp_path, monkeypatch):
+    """归档文件已写入、删除未提交时中断：同一行在归档与库中各一份，合并结果只计一次"""
+    app.config['ARCHIVE_DIR'] = str(tmp_path)
+    times = [datetime(2025, 1, 10) + timedelta(days=i) for i in range(4)]
+    ingest_service.insert_columns(SupportPressureData, {
+        'record_time': times, 'station_no': [1] * 4, 'support_no': list(range(4)), 'p1': [1.0, 2.0, 3.0, 4.0]
+    }, 4)
+    db.session.commit()
+    archive_service.archive_before(datetime(2025, 1, 12), targets=('pressure',), echo=lambda _: None)
+
+    def crash(*args):
+        raise RuntimeError("killed")
+    monkeypatch.setattr(archive_service, '_delete_archived', crash)
+    with pytest.raises(RuntimeError):
+        archive_service.archive_before(datetime(2025, 2, 1), targets=('pressure',), echo=lambda _: None)
+    db.session.rollback()
+    assert SupportPressureData.query.count() == 2 and len(archive_service.read_archive('pressure')) == 2
+
+    rows = query_data({"target": "pressure", "start_time": "2025-01-01T00:00:00"})
+    assert [r['p1'] for r in rows] == [4.0, 3.0, 2.0, 1.0]
+    daily = query_data({"target": "pressure", "start_time": "2025-01-01T00:00:00",
+                        "group_by": "1d", "aggregates": {"*": "count"}})
+    assert daily['data']['count'] == [1, 1, 1, 1]
+    assert archive_service.window_mean('pressure', 'p1', datetime(2025, 1, 1), datetime(2025, 2, 1)) == 2.5
+
+def test_export_streams_archive_before_live(archived_app):
+    """导出范围跨过水位时先输出归档行，再输出实时行，limit 跨两部分计数"""
+    import json
+    from app.services import export_service
+    params = {"target": "pressure", "start_time": "2025-02-28T00:00:00"}
+    chunks, _, _ = export_service.stream_export(params, "ndjson", batch_size=2)
+    rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert [r['p1'] for r in rows] == [58.0, 59.0, 60.0, 61.0, 62.0, 63.0]
+    assert rows[0]['record_time'] == '2025-02-28T00:00:00' and rows[0]['support_no'] == 1
+
+    chunks, _, _ = export_service.stream_export(dict(params, limit=3, filters={"support_no": 1}), "csv")
+    lines = "".join(chunks).lstrip('\ufeff').splitlines()[1:]
+    assert [float(line.split(',')[5]) for line in lines] == [58.0, 60.0, 62.0]
+    chunks, _, _ = export_service.stream_export(dict(params, limit=2, filters={"support_no": 1}), "csv")
+    assert len("".join(chunks).splitlines()) == 3
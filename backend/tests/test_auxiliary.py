@@ -1,7 +1,7 @@
 from app.services.auxiliary_service import check_and_trigger_alarms, get_alarm_history
 from app.models import AlarmRecord, User
 from app import db
-from datetime import datetime
+from datetime import datetime, timedelta
 
 def test_alarm_triggering(app):
     """测试报警触发逻辑"""
@@ -83,4 +83,76 @@ def test_dynamic_config(client, app):
     # 验证获取到的阈值已更新
     resp = client.get('/api/v1/alarms/config', headers=headers)
     data = resp.get_json()
-    assert data['pressure']['red'] == 55.5
\ No newline at end of file
+    assert data['pressure']['red'] == 55.5
+
+
+def test_query_export_streams_formats(client, app):
+    """测试查询结果流式导出 (CSV / NDJSON / Parquet)"""
+    import io
+    import json
+    import pyarrow.parquet as pq
+    from app.models import SupportPressureData
+    from app.services import export_service
+    with app.app_context():
+        for i in range(7):
+            db.session.add(SupportPressureData(station_no=1, support_no=i, p1=20.0 + i,
+                                               record_time=datetime(2026, 2, 9, 10, i)))
+        user = User(username='test_export_user')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+
+        # 批大小 3：7 行分 3 批取出，每批单独编码
+        chunks, _, _ = export_service.stream_export({"target": "pressure"}, "ndjson", batch_size=3)
+        assert [chunk.count("\n") for chunk in chunks] == [3, 3, 1]
+
+    login_resp = client.post('/api/v1/auth/login', json={'username': 'test_export_user', 'password': 'pass'})
+    headers = {'Authorization': f"Bearer {login_resp.get_json()['token']}"}
+    payload = {"target": "pressure", "start_time": "2026-02-09T10:02:00", "end_time": "2026-02-09T10:05:00"}
+
+    response = client.post('/api/v1/query/export?format=csv', json=payload, headers=headers)
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    assert 'attachment; filename="pressure_' in response.headers['Content-Disposition']
+    lines = response.get_data(as_text=True).lstrip('\ufeff').splitlines()
+    assert lines[0].startswith('id,record_time,station_no,support_no')
+    assert [line.split(',')[3] for line in lines[1:]] == ['2', '3', '4', '5']
+
+    response = client.post('/api/v1/query/export', json=dict(payload, format='ndjson'), headers=headers)
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert rows[0]['record_time'] == '2026-02-09T10:02:00' and rows[-1]['p1'] == 25.0
+
+    response = client.post('/api/v1/query/export?format=parquet', json=payload, headers=headers)
+    table = pq.read_table(io.BytesIO(response.get_data()))
+    assert table.column('support_no').to_pylist() == [2, 3, 4, 5]
+
+    assert client.post('/api/v1/query/export?format=xml', json=payload, headers=headers).status_code == 400
+    assert client.post('/api/v1/query/export', json={"target": "nope"}, headers=headers).status_code == 400
+
+def test_query_filters_projection_and_group_by(app):
+    """测试过滤、投影与时间桶聚合下推为 SQL"""
+    from app.models import SupportPressureData
+    from app.services.auxiliary_service import query_data
+    for hour in range(4):
+        for station in (1, 2):
+            db.session.add(SupportPressureData(station_no=station, support_no=hour, p1=10.0 * hour + station,
+                                               record_time=datetime(2026, 2, 9, 22) + timedelta(hours=hour)))
+    db.session.commit()
+
+    rows = query_data({"target": "pressure", "filters": {"station_no": 2, "p1": {"gte": 12}}})
+    assert sorted(r['p1'] for r in rows) == [12.0, 22.0, 32.0]
+
+    projected = query_data({"target": "pressure", "fields": ["record_time", "p1"], "filters": {"support_no": [0, 1]},
+                            "limit": 2})
+    assert projected['columns'] == ['record_time', 'p1'] and projected['count'] == 2
+    assert projected['data']['record_time'] == ['2026-02-09T23:00:00', '2026-02-09T23:00:00']
+
+    daily = query_data({"target": "pressure", "group_by": {"time": "1d", "fields": ["station_no"]},
+                        "aggregates": {"p1": ["max", "avg"], "*": ["count"]}})
+    assert daily['columns'] == ['bucket', 'station_no', 'p1_max', 'p1_avg', 'count']
+    assert daily['data']['bucket'] == ['2026-02-09T00:00:00'] * 2 + ['2026-02-10T00:00:00'] * 2
+    assert daily['data']['p1_max'] == [11.0, 12.0, 31.0, 32.0]
+    assert daily['data']['p1_avg'] == [6.0, 7.0, 26.0, 27.0] and daily['data']['count'] == [2, 2, 2, 2]
+
+    assert 'error' in query_data({"target": "pressure", "fields": ["password"]})
+    assert 'error' in query_data({"target": "pressure", "filters": {"p1": {"like": 1}}})
+    assert 'error' in query_data({"target": "pressure", "group_by": "1w"})
@@ -114,3 +114,44 @@ def test_import_data_admin(client, app):
         ms = MonitoringStation.query.filter_by(station_id='IMP-001').first()
         assert ms is not None
         assert ms.location == '巷道2'
+
+def test_keyset_pagination(client, app):
+    with app.app_context():
+        token = get_admin_token(client)
+        headers = {'Authorization': f'Bearer {token}'}
+        for i in range(5):
+            db.session.add(MonitoringStation(station_id=f'MS-{i}', type='矿压' if i % 2 else '微震'))
+        db.session.commit()
+        ids = [s.id for s in MonitoringStation.query.order_by(MonitoringStation.id.desc())]
+
+        first = client.get('/api/v1/management/monitoring-station?per_page=2', headers=headers).get_json()
+        assert [item['id'] for item in first['items']] == ids[:2]
+        assert first['total'] == 5 and first['pages'] == 3 and first['page'] == 1
+        assert first['next_after_id'] == ids[1] and first['prev_before_id'] is None
+
+        second = client.get(f"/api/v1/management/monitoring-station?per_page=2&after_id={first['next_after_id']}",
+                            headers=headers).get_json()
+        assert [item['id'] for item in second['items']] == ids[2:4]
+        back = client.get(f"/api/v1/management/monitoring-station?per_page=2&before_id={second['prev_before_id']}",
+                          headers=headers).get_json()
+        assert [item['id'] for item in back['items']] == ids[:2] and back['prev_before_id'] is None
+
+        # 游标分页与字段过滤、估计计数可组合 (SQLite 下估计值即精确值)
+        filtered = client.get(f"/api/v1/management/monitoring-station?per_page=2&type=矿压&count=estimate&after_id={ids[0]}",
+                              headers=headers).get_json()
+        assert [item['station_id'] for item in filtered['items']] == ['MS-3', 'MS-1']
+        assert filtered['total'] == 2 and filtered['next_after_id'] is None
+        assert client.get('/api/v1/management/monitoring-station?count=fast', headers=headers).status_code == 400
+
+def test_estimate_count_binds_filter_values(app):
+    """EXPLAIN 估计计数随查询编译，过滤值为绑定参数而非拼接的字面量"""
+    from datetime import datetime
+    from sqlalchemy.dialects import postgresql
+    from app.api.management import ExplainJSON
+    from app.models import SupportPressureData
+    query = SupportPressureData.query.filter(SupportPressureData.record_time >= datetime(2025, 1, 1),
+                                             SupportPressureData.position == "x'; DROP TABLE t; --")
+    compiled = ExplainJSON(query.statement).compile(dialect=postgresql.dialect())
+    assert str(compiled).startswith('EXPLAIN (FORMAT JSON) SELECT')
+    assert 'DROP TABLE' not in str(compiled) and '2025' not in str(compiled)
+    assert set(compiled.params.values()) == {datetime(2025, 1, 1), "x'; DROP TABLE t; --"}
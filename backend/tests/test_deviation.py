@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from app import db
+from app.models import DrillingSite, Borehole, BoreholeTrajectory, User
+from app.services import deviation_service
+
+def test_deviation_offsets_against_design_line():
+    # 设计方位正东、水平：偏北 0.3 m、偏上 0.4 m 的测点垂向偏差 0.5 m，沿孔比测深靠前 2 m
+    perpendicular, along = deviation_service.deviation_offsets(
+        [(12.0, 0.3, 0.4), (10.0, 0.0, 0.0)], np.zeros((2, 3)), [0.0, 0.0], [90.0, 90.0], [10.0, 10.0])
+    assert perpendicular == pytest.approx([0.5, 0.0]) and along == pytest.approx([2.0, 0.0])
+
+def test_group_statistics_ignores_missing():
+    groups, counts, peaks, rms = deviation_service.group_statistics([3.0, 4.0, np.nan, np.nan, 1.0], [0, 0, 1, 2, 2])
+    assert groups.tolist() == [0, 1, 2] and counts.tolist() == [2, 0, 1]
+    assert peaks[0] == 4.0 and np.isnan(peaks[1]) and rms[0] == pytest.approx(np.sqrt(12.5))
+
+def test_analyze_deviation_persists_and_endpoint(app, client):
+    site = DrillingSite(name='1# 钻场', coord_e=100.0, coord_n=200.0, coord_z=-500.0)
+    db.session.add(site)
+    db.session.flush()
+    # 设计：方位 0 (正北)，倾角 30° 上仰
+    straight, drifting, no_design = (Borehole(drilling_site_id=site.id, borehole_no=no, azimuth=az, dip_angle=dip)
+                                     for no, az, dip in (('ZK-1', 0.0, 30.0), ('ZK-2', 0.0, 30.0), ('ZK-3', None, None)))
+    db.session.add_all([straight, drifting, no_design])
+    db.session.flush()
+    d = np.array([0.0, np.cos(np.radians(30)), np.sin(np.radians(30))])
+    for md in (10.0, 20.0, 30.0):
+        on_line = np.array([100.0, 200.0, -500.0]) + md * d
+        db.session.add(BoreholeTrajectory(borehole_id=straight.id, measured_depth=md,
+                                          coord_e=on_line[0], coord_n=on_line[1], coord_z=on_line[2]))
+        # 向东偏 md / 20 m (与设计方向正交)
+        db.session.add(BoreholeTrajectory(borehole_id=drifting.id, measured_depth=md,
+                                          coord_e=on_line[0] + md / 20, coord_n=on_line[1], coord_z=on_line[2]))
+    db.session.add(BoreholeTrajectory(borehole_id=drifting.id, measured_depth=40.0))
+    db.session.commit()
+
+    result = deviation_service.analyze_deviation(site_id=site.id, persist=True)
+    db.session.commit()
+    assert result['tolerance'] == 0.5
+    first, second = result['boreholes']
+    assert first['borehole_no'] == 'ZK-1' and first['max_deviation'] == pytest.approx(0.0, abs=1e-9)
+    assert first['within_tolerance'] and first['along_offset'] == pytest.approx([0.0, 0.0, 0.0], abs=1e-9)
+    # 坐标缺失的测点保留为 None，数组长度与轨迹测点数一致
+    assert second['perpendicular'] == [0.5, 1.0, 1.5, None] and second['stations'] == 3
+    assert second['max_deviation'] == pytest.approx(1.5) and not second['within_tolerance']
+    assert second['rms_deviation'] == pytest.approx(np.sqrt((0.25 + 1 + 2.25) / 3))
+    assert db.session.get(Borehole, drifting.id).max_deviation == pytest.approx(1.5)
+    assert db.session.get(Borehole, no_design.id).max_deviation is None
+
+    user = User(username='deviation_user')
+    user.set_password('pass')
+    db.session.add(user)
+    db.session.commit()
+    token = client.post('/api/v1/auth/login', json={'username': 'deviation_user', 'password': 'pass'}).get_json()['token']
+    resp = client.get(f'/api/v1/visualization/trajectory-deviation?borehole_id={drifting.id}',
+                      headers={'Authorization': f'Bearer {token}'})
+    assert resp.status_code == 200 and [b['borehole_no'] for b in resp.get_json()['boreholes']] == ['ZK-2']
@@ -0,0 +1,46 @@
+from datetime import timedelta
+import numpy as np
+import pytest
+from app import db
+from app.models import SupportPressureData
+from app.services import downsample_service, ingest_service, visualization_service
+from tests.test_rollups import T0
+
+def spiky_series(n=100_000):
+    x = np.arange(n, dtype=float)
+    y = np.sin(x / 500.0)
+    y[12_345], y[67_890] = 25.0, -25.0
+    return x, y
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x, y = spiky_series()
+    chosen = downsample_service.lttb_indices(x, y, 200)
+    assert len(chosen) == 200 and chosen[0] == 0 and chosen[-1] == len(y) - 1
+    assert np.all(np.diff(chosen) > 0)
+    assert {12_345, 67_890} <= set(chosen.tolist())
+    assert len(downsample_service.lttb_indices(x[:50], y[:50], 200)) == 50
+
+def test_minmax_envelope_and_nan_gaps():
+    x, y = spiky_series()
+    chosen = downsample_service.minmax_indices(y, 200)
+    assert len(chosen) <= 200 and {12_345, 67_890} <= set(chosen.tolist())
+    y[:1000] = np.nan
+    chosen = downsample_service.downsample_indices(x, y, 200, 'lttb')
+    assert chosen[0] == 1000 and not np.isnan(y[chosen]).any()
+    with pytest.raises(ValueError):
+        downsample_service.downsample_indices(x, y, 200, 'mean')
+
+def test_pressure_trend_downsampled_to_max_points(app):
+    minutes = list(range(0, 600))
+    ingest_service.insert_columns(SupportPressureData, {
+        'record_time': [T0 + timedelta(minutes=m) for m in minutes], 'station_no': [1] * 600,
+        'support_no': [2] * 600, 'position': ['上部'] * 600, 'p1': [50.0 if m == 300 else 20.0 for m in minutes]
+    }, 600)
+    db.session.commit()
+
+    # 10 小时范围按 max_points=100 读取 1 分钟桶 (600 个) 再降采样
+    points = visualization_service.get_pressure_trend_data('10h', max_points=100, station=1, support=2)
+    assert len(points) == 100 and max(p['y'] for p in points) == 50.0
+    envelope = visualization_service.get_pressure_trend_data('10h', max_points=100, mode='minmax')
+    assert len(envelope) <= 100 and max(p['y'] for p in envelope) == 50.0
+    assert visualization_service.get_pressure_trend_data('10h', max_points=100, station=9) == []
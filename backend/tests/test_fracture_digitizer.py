@@ -0,0 +1,63 @@
+import json
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+from app.models import Borehole, FractureConstructionData, ImportManifest
+from app.services.fracture_digitizer import digitize_image, image_calibration
+
+PURPLE = (107, 53, 243)
+RED = (255, 0, 0)
+CALIBRATION = {
+    "drilling_site": "测试钻场",
+    "pressure": {"color": list(PURPLE), "min": 0, "max": 20},
+    "flow": {"color": list(RED), "min": 0, "max": 60},
+    "images": {"1号孔/第1段.png": {"first_tick": "2025-03-03T05:00", "last_tick": "2025-03-03T06:40"}}
+}
+
+def write_chart(path):
+    """合成一张压裂曲线图：边框 (50,20)-(560,250)，主刻度每 100 像素一个，
+    泵压恒为 10 MPa (第 134-136 行)，流量恒为 15 m3/h (第 192-193 行)"""
+    img = Image.new("RGB", (600, 300), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([50, 20, 560, 250], outline=PURPLE)
+    for x in range(50, 561, 20):
+        draw.line([x, 251, x, 260 if (x - 50) % 100 == 0 else 254], fill="black")
+    draw.rectangle([51, 134, 559, 136], fill=PURPLE)
+    draw.rectangle([51, 192, 559, 193], fill=RED)
+    img.save(path)
+
+def test_digitize_synthetic_chart(tmp_path):
+    path = tmp_path / "chart.png"
+    write_chart(path)
+    calib = image_calibration(CALIBRATION, "1号孔/第1段.png")
+    curves = digitize_image(path, calib)
+
+    assert len(curves["time"]) == 494
+    # 每像素 12 秒，首个采样列 (58) 距首刻度 (50) 8 像素
+    assert curves["time"][0] == np.datetime64("2025-03-03T05:01:36")
+    assert np.diff(curves["time"]).astype(int).tolist() == [12000] * 493
+    assert curves["pressure"] == pytest.approx(10.0, abs=0.1)
+    assert curves["flow"] == pytest.approx(15.0, abs=0.2)
+
+def test_digitize_fracture_command_loads_and_skips(app, runner, tmp_path):
+    (tmp_path / "1号孔").mkdir()
+    write_chart(tmp_path / "1号孔" / "第1段.png")
+    (tmp_path / "calibration.json").write_text(json.dumps(CALIBRATION, ensure_ascii=False), encoding="utf-8")
+
+    result = runner.invoke(args=["digitize-fracture", str(tmp_path), "--workers", "1"])
+    assert result.exit_code == 0, result.output
+    assert "Digitized 1 image(s)" in result.output
+
+    borehole = Borehole.query.filter_by(borehole_no="1号孔").one()
+    assert borehole.segments == 1
+    rows = FractureConstructionData.query.filter_by(borehole_id=borehole.id, segment_no=1)
+    assert rows.count() == 494
+    last = rows.order_by(FractureConstructionData.record_time.desc()).first()
+    # 15 m3/h 持续 493 x 12 秒
+    assert last.total_volume == pytest.approx(15 * 493 * 12 / 3600, rel=0.02)
+    assert last.flow_rate == pytest.approx(0.25, abs=0.005)
+    assert ImportManifest.query.filter_by(data_type="fracture").count() == 1
+
+    result = runner.invoke(args=["digitize-fracture", str(tmp_path), "--workers", "1"])
+    assert "already loaded" in result.output
+    assert FractureConstructionData.query.count() == 494
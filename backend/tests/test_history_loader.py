@@ -0,0 +1,109 @@
+import io
+import pandas as pd
+from app import db
+from app.models import User, SupportPressureData, AnchorBoltLoad, RockDisplacement, ImportManifest
+from app.services.auxiliary_service import query_data
+from app.services.history_loader import parse_workbook
+
+HEADER = ['时间', '分站编号', '支架编号', '安装位置', 'P1(MPa)', 'P2(MPa)', 'P3(MPa)', 'X(度)', 'Y(度)', '状态', '电量']
+
+def write_export_workbook(path, header, rows):
+    """按监测系统导出格式写一个工作簿：两行标题 + 表头 + 数据"""
+    title = [['监 测 数 据'] + [None] * (len(header) - 1), ['巷道:11223回风'] + [None] * (len(header) - 1)]
+    pd.DataFrame(title + [header] + rows).to_excel(path, header=False, index=False)
+
+def write_kj653_workbook(path, rows):
+    write_export_workbook(path, HEADER, rows)
+
+def test_parse_kj653_workbook_maps_headers(tmp_path):
+    path = tmp_path / 'a.xlsx'
+    write_kj653_workbook(path, [
+        ['2025/04/24 00:00:00', '1', '6', '上部', '25.3', '23.9', '--', '--', '--', '--', '90'],
+        ['2025/04/24 00:00:00', '1', '6', '上部', '25.4', '24.0', '--', '--', '--', '--', '90'],
+        ['2025/04/24 02:00', '1', '10', '中部', '27.4', '26.5', '--', '--', '--', '正常', '90'],
+    ])
+    df, elapsed = parse_workbook(path, 'kj653')
+    assert len(df) == 2
+    assert '电量' not in df.columns
+    first = df.iloc[0]
+    assert first['support_no'] == 6
+    assert first['p1'] == 25.4
+    assert pd.isna(first['p3'])
+    assert df.iloc[1]['record_time'] == pd.Timestamp('2025-04-24 02:00')
+    assert elapsed >= 0
+
+def test_load_history_dedupes_and_skips_loaded_files(app, runner, tmp_path):
+    rows_a = [['2025/04/24 00:00:00', '1', str(s), '上部', '25.0', '24.0', '--', '--', '--', '--', '90'] for s in range(5)]
+    rows_b = rows_a[3:] + [['2025/04/24 02:00:00', '1', str(s), '上部', '26.0', '24.0', '--', '--', '--', '--', '90'] for s in range(3)]
+    write_kj653_workbook(tmp_path / 'a.xlsx', rows_a)
+    write_kj653_workbook(tmp_path / 'b.xlsx', rows_b)
+
+    result = runner.invoke(args=['load-history', str(tmp_path), '--workers', '1'])
+    assert result.exit_code == 0, result.output
+    assert 'rows/s' in result.output
+    assert SupportPressureData.query.count() == 8
+    assert ImportManifest.query.count() == 2
+    assert ImportManifest.query.filter_by(file_name='b.xlsx').one().inserted_count == 3
+
+    result = runner.invoke(args=['load-history', str(tmp_path), '--workers', '1'])
+    assert result.output.count('already loaded') == 2
+    assert SupportPressureData.query.count() == 8
+
+def test_failed_workbook_keys_not_treated_as_overlap(app, tmp_path, monkeypatch):
+    """先导入的文件写库失败回滚后，后续文件中与之重叠的行仍应写入"""
+    from app.services import history_loader, ingest_service
+    rows_a = [['2025/04/24 00:00:00', '1', str(s), '上部', '25.0', '24.0', '--', '--', '--', '--', '90'] for s in range(5)]
+    write_kj653_workbook(tmp_path / 'a.xlsx', rows_a)
+    write_kj653_workbook(tmp_path / 'b.xlsx', rows_a[3:])
+
+    insert_columns = ingest_service.insert_columns
+    calls = []
+    def failing_once(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError('disk full')
+        return insert_columns(*args, **kwargs)
+    monkeypatch.setattr(ingest_service, 'insert_columns', failing_once)
+
+    results = history_loader.load_history('kj653', [str(tmp_path)], workers=1, echo=lambda *_: None)
+    assert 'error' in results[0] and results[1]['inserted'] == 2
+    assert SupportPressureData.query.count() == 2
+
+def test_parse_rock_displacement_workbook(tmp_path):
+    path = tmp_path / 'rock.xlsx'
+    header = ['时间', '传感器编号', '设备编码', '安装位置', '深基点深度(m)', '浅基点深度(m)', '深(mm)', '浅(mm)', '|深-浅|(mm)', '电量']
+    write_export_workbook(path, header, [
+        ['2025/02/18 03:55:48', '171', None, 'F-1', '9.00', '2.20', '0.5', '0.2', '0.3', '--'],
+        ['2025/02/18 03:55:48', '172', None, 'F-2', '9.00', '2.20', '--', '--', '--', '--'],
+    ])
+    df, _ = parse_workbook(path, 'rock')
+    assert list(df['sensor_no']) == [171, 172]
+    assert df.iloc[0]['separation'] == 0.3
+    assert pd.isna(df.iloc[1]['deep_displacement'])
+
+def test_bolt_workbook_import_and_query(client, app):
+    """管理端导入导出格式的锚杆索工作簿，并可通过多维查询检索"""
+    admin = User(username='bolt_admin', role='ADMIN')
+    admin.set_password('pass')
+    db.session.add(admin)
+    db.session.commit()
+    token = client.post('/api/v1/auth/login', json={'username': 'bolt_admin', 'password': 'pass'}).get_json()['token']
+
+    header = ['时间', '传感器编号', '传感器类型', '设备编码', '安装位置', '传感器直径(mm)', '应力值(kN)', '状态', '电量']
+    rows = [['2025/04/21 00:10:47', str(s), '锚索', None, f'F-{s}', '21.00', str(s - 190), '正常', '100%'] for s in range(200, 204)]
+    buf = io.BytesIO()
+    write_export_workbook(buf, header, rows + rows[:1])
+    buf.seek(0)
+
+    resp = client.post('/api/v1/management/import/anchor-bolt-load',
+                       data={'file': (buf, 'bolt.xlsx')},
+                       headers={'Authorization': f'Bearer {token}'},
+                       content_type='multipart/form-data')
+    assert resp.status_code == 200
+    assert resp.get_json()['imported'] == 4
+    assert AnchorBoltLoad.query.count() == 4
+
+    results = query_data({'target': 'bolt', 'start_time': '2025-04-21T00:00:00'})
+    assert len(results) == 4
+    assert {r['load'] for r in results} == {10.0, 11.0, 12.0, 13.0}
+    assert query_data({'target': 'rock_displacement'}) == []
@@ -0,0 +1,299 @@
+import pytest
+from datetime import datetime
+from app import db
+from app.models import User, SupportPressureData, MicroseismicEvent, InterfaceLog
+from app.services import ingest_service
+
+def get_token(client):
+    user = User.query.filter_by(username='ingest_user').first()
+    if not user:
+        user = User(username='ingest_user')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+    resp = client.post('/api/v1/auth/login', json={'username': 'ingest_user', 'password': 'pass'})
+    return {'Authorization': f"Bearer {resp.get_json()['token']}"}
+
+def test_build_column_batch_converts_types(app):
+    """验证按列解析与类型转换"""
+    records = [
+        {"support_no": "101", "p1": "25.5", "record_time": "2026-02-09T12:30:00"},
+        {"support_no": 102, "p1": 26},
+    ]
+    columns = ingest_service.build_column_batch(SupportPressureData, records)
+    assert columns['support_no'] == [101, 102]
+    assert columns['p1'] == [25.5, 26.0]
+    assert columns['record_time'][0] == datetime(2026, 2, 9, 12, 30)
+    # 缺省的 record_time 由列默认值补齐
+    assert isinstance(columns['record_time'][1], datetime)
+    assert 'p3' not in columns
+
+def test_mixed_optional_field_presence(client, app):
+    """仅部分记录带 p2：缺省处为 NULL，同步与异步入口均正常"""
+    from app.services.integration_service import save_kj653_data
+    records = [
+        {"station_no": 1, "support_no": 1, "p1": 25.0, "p2": 2.0, "record_time": "2026-02-09T12:30:00"},
+        {"station_no": 1, "support_no": 2, "p1": 26.0, "record_time": "2026-02-09T12:30:00"},
+    ]
+    ok, msg, stats = save_kj653_data({"records": records})
+    assert ok, msg
+    assert [r.p2 for r in SupportPressureData.query.order_by(SupportPressureData.support_no)] == [2.0, None]
+
+    resp = client.post('/api/v1/ingest/kj653?mode=async', json={"records": [
+        dict(r, station_no=2) for r in records
+    ]}, headers=get_token(client))
+    assert resp.status_code == 202
+
+def test_build_column_batch_rejects_unknown_fields(app):
+    with pytest.raises(ValueError):
+        ingest_service.build_column_batch(SupportPressureData, [{"bogus": 1}])
+
+def test_bulk_insert_executemany(app):
+    """SQLite 下走 executemany 回退路径"""
+    records = [{"support_no": i, "p1": 20.0 + i, "record_time": "2026-02-09T12:30:00"} for i in range(500)]
+    stats = ingest_service.bulk_insert(SupportPressureData, records)
+    db.session.commit()
+    assert stats['rows'] == 500
+    assert stats['method'] == 'executemany'
+    assert stats['rows_per_sec'] > 0
+    assert SupportPressureData.query.count() == 500
+
+def test_ingest_endpoints_keep_response(client, app):
+    headers = get_token(client)
+    resp = client.post('/api/v1/ingest/kj653', json={"records": [
+        {"support_no": 101, "p1": 25.5, "record_time": "2026-02-09T12:30:00"}
+    ]}, headers=headers)
+    assert resp.status_code == 201
+    assert resp.get_json() == {
+        'status': 'success',
+        'message': 'Successfully saved 1 KJ653 records.',
+        'inserted': 1,
+        'duplicates': 0
+    }
+
+    resp = client.post('/api/v1/ingest/sos', json={"events": [
+        {"energy": 5000.0, "coord_x": 1.0, "event_time": "2026-02-09T12:35:00"}
+    ]}, headers=headers)
+    assert resp.status_code == 201
+    assert MicroseismicEvent.query.count() == 1
+
+    log = InterfaceLog.query.filter_by(interface_name='KJ653_API').first()
+    assert 'rows/s' in log.message
+
+def test_ingest_alarm_check_is_opt_in_and_never_fails_ingest(client, app, monkeypatch):
+    """报警判定默认关闭；开启后判定出错也不影响已提交的摄入"""
+    from app.models import AlarmRecord
+    from app.services import auxiliary_service
+    headers = get_token(client)
+    record = {"support_no": 1, "p1": 50.0, "record_time": "2026-02-09T12:30:00"}
+    assert client.post('/api/v1/ingest/kj653', json={"records": [record]}, headers=headers).status_code == 201
+    assert AlarmRecord.query.count() == 0
+
+    app.config['INGEST_ALARM_CHECK'] = True
+    def broken(kind, value):
+        raise RuntimeError("alarm config unavailable")
+    monkeypatch.setattr(auxiliary_service, 'check_ingest_alarms', broken)
+    resp = client.post('/api/v1/ingest/kj653', json={"records": [dict(record, support_no=2)]}, headers=headers)
+    assert resp.status_code == 201
+    assert SupportPressureData.query.count() == 2
+
+def test_ingest_bad_field_rolls_back(client, app):
+    headers = get_token(client)
+    resp = client.post('/api/v1/ingest/kj653', json={"records": [{"support_no": 1}, {"bogus": 2}]}, headers=headers)
+    assert resp.status_code == 500
+    assert SupportPressureData.query.count() == 0
+
+def test_async_ingest_returns_202_and_drains(client, app):
+    """异步模式：入队返回 202，drain 后批次状态为 DONE"""
+    from app.services.ingest_queue import ingest_queue
+    headers = get_token(client)
+    batch_ids = []
+    for i in range(3):
+        resp = client.post('/api/v1/ingest/kj653?mode=async', json={"records": [
+            {"support_no": i, "p1": 25.0, "record_time": "2026-02-09T12:30:00"}
+        ]}, headers=headers)
+        assert resp.status_code == 202
+        batch_ids.append(resp.get_json()['batch_id'])
+
+    resp = client.get(f'/api/v1/ingest/batches/{batch_ids[0]}', headers=headers)
+    assert resp.get_json()['status'] == 'QUEUED'
+    assert ingest_queue.stats()['depth'] == 3
+
+    # 三个批次合并为一个事务
+    assert ingest_queue.drain_all() == 3
+    assert SupportPressureData.query.count() == 3
+    stats = ingest_queue.stats()
+    assert stats['depth'] == 0
+    assert stats['processed_batches'] == 3
+    assert stats['transactions'] == 1
+
+    resp = client.get(f'/api/v1/ingest/batches/{batch_ids[2]}', headers=headers)
+    assert resp.get_json()['status'] == 'DONE'
+
+def test_async_workers_start_explicitly_and_shutdown_drains(client, app, monkeypatch):
+    """init_app 不启动 worker，由服务入口 start；退出时剩余批次写库"""
+    from app.services import ingest_queue as module
+    queue = module.ingest_queue
+    started = []
+    monkeypatch.setattr(module.socketio, 'start_background_task', lambda fn, *args: started.append(args))
+    app.config['INGEST_QUEUE_WORKERS'] = 2
+    queue.init_app(app)
+    assert not started
+    assert queue.start() and len(started) == 2 and not queue.start()
+
+    headers = get_token(client)
+    resp = client.post('/api/v1/ingest/kj653?mode=async', json={"records": [
+        {"support_no": 1, "p1": 25.0, "record_time": "2026-02-09T12:30:00"}
+    ]}, headers=headers)
+    assert resp.status_code == 202
+    assert queue.shutdown() == 1
+    # 旧 worker 已收到停止信号
+    assert all(stop.is_set() for stop, in started)
+    assert SupportPressureData.query.count() == 1
+    assert InterfaceLog.query.filter(InterfaceLog.message.like('Drained%')).count() == 1
+
+def test_async_ingest_backpressure(client, app):
+    from app.services.ingest_queue import ingest_queue
+    headers = get_token(client)
+    app.config['INGEST_QUEUE_MAXSIZE'] = 1
+    ingest_queue.init_app(app)
+    resp = client.post('/api/v1/ingest/sos?mode=async', json={"events": [{"energy": 1.0}]}, headers=headers)
+    assert resp.status_code == 202
+    resp = client.post('/api/v1/ingest/sos?mode=async', json={"events": [{"energy": 2.0}]}, headers=headers)
+    assert resp.status_code == 429
+    assert ingest_queue.stats()['rejected'] == 1
+
+def test_async_ingest_validates_payload(client, app):
+    headers = get_token(client)
+    resp = client.post('/api/v1/ingest/kj653?mode=async', json={"records": [{"bogus": 1}]}, headers=headers)
+    assert resp.status_code == 400
+    resp = client.get('/api/v1/ingest/batches/unknown', headers=headers)
+    assert resp.status_code == 404
+
+def test_resent_batch_is_idempotent(client, app):
+    """采集端超时重发同一窗口，不产生重复行"""
+    headers = get_token(client)
+    payload = {"records": [
+        {"station_no": 1, "support_no": s, "p1": 25.0, "record_time": "2026-02-09T12:30:00"}
+        for s in range(10)
+    ]}
+    resp = client.post('/api/v1/ingest/kj653', json=payload, headers=headers)
+    assert resp.get_json()['inserted'] == 10
+
+    payload['records'].append({"station_no": 1, "support_no": 99, "p1": 30.0, "record_time": "2026-02-09T12:30:00"})
+    resp = client.post('/api/v1/ingest/kj653', json=payload, headers=headers)
+    data = resp.get_json()
+    assert resp.status_code == 201
+    assert data['inserted'] == 1
+    assert data['duplicates'] == 10
+    assert SupportPressureData.query.count() == 11
+
+def test_resent_record_without_station_is_idempotent(client, app):
+    """未上报测站号的记录记为测站 0，重发时仍按自然键去重"""
+    headers = get_token(client)
+    for record in ({"support_no": 7, "p1": 25.0, "record_time": "2026-02-09T12:30:00"},
+                   {"station_no": None, "support_no": 7, "p1": 25.0, "record_time": "2026-02-09T12:30:00"}):
+        resp = client.post('/api/v1/ingest/kj653', json={"records": [record]}, headers=headers)
+        assert resp.status_code == 201
+    assert resp.get_json()['duplicates'] == 1
+    assert [r.station_no for r in SupportPressureData.query] == [0]
+
+def test_sos_natural_key_dedupes_within_batch(app):
+    event = {"event_time": "2026-02-09T12:35:00", "coord_x": 1.0, "coord_y": 2.0, "coord_z": 3.0, "energy": 10.0}
+    stats = ingest_service.bulk_insert(MicroseismicEvent, [event, dict(event)])
+    db.session.commit()
+    assert stats['inserted'] == 1
+    assert stats['duplicates'] == 1
+    assert MicroseismicEvent.query.count() == 1
+
+def test_sos_resend_without_coordinates_is_idempotent(client, app):
+    """坐标缺失的 SOS 事件按位置键去重，重发同一批次不产生新行"""
+    headers = get_token(client)
+    batch = {"events": [{"event_time": "2026-02-09T12:35:00", "energy": 10.0},
+                        {"event_time": "2026-02-09T12:35:00", "coord_x": 0.5, "energy": 20.0}]}
+    for _ in range(2):
+        resp = client.post('/api/v1/ingest/sos', json=batch, headers=headers)
+        assert resp.status_code == 201
+    assert resp.get_json()['duplicates'] == 2
+    assert sorted(e.location_key for e in MicroseismicEvent.query) == ['0.500||', '||']
+    # ORM 写入同样补齐位置键
+    db.session.add(MicroseismicEvent(event_time=datetime(2026, 2, 9, 12, 36), coord_x=1.0, coord_y=2.0, coord_z=3.0))
+    db.session.commit()
+    assert MicroseismicEvent.query.filter_by(location_key='1.000|2.000|3.000').count() == 1
+
+def test_stream_ingest_ndjson_in_chunks(client, app):
+    """NDJSON 流式回填：按固定大小分块写库并返回逐块进度"""
+    import json
+    headers = get_token(client)
+    lines = "\n".join(
+        json.dumps({"station_no": 1, "support_no": i, "p1": 20.0, "record_time": "2026-02-09T12:30:00"})
+        for i in range(25)
+    ) + "\n\n"
+    resp = client.post('/api/v1/ingest/kj653/stream?batch_size=10', data=lines.encode(),
+                       headers=headers, content_type='application/x-ndjson')
+    assert resp.status_code == 201
+    data = resp.get_json()
+    assert data['rows'] == 25
+    assert data['inserted'] == 25
+    assert [c['rows'] for c in data['chunks']] == [10, 10, 5]
+    assert data['chunks'][-1]['total_rows'] == 25
+    assert SupportPressureData.query.count() == 25
+
+def test_stream_ingest_reports_bad_line(client, app):
+    headers = get_token(client)
+    lines = '{"energy": 1.0}\nnot-json\n'
+    resp = client.post('/api/v1/ingest/sos/stream', data=lines, headers=headers, content_type='application/x-ndjson')
+    assert resp.status_code == 400
+    assert 'line 2' in resp.get_json()['message']
+
+    resp = client.post('/api/v1/ingest/sos/stream', json={"events": []}, headers=headers)
+    assert resp.status_code == 415
+
+def test_stream_ingest_reports_committed_chunks_on_failure(client, app):
+    """后续分块失败时，已提交的分块保留并在响应中给出续传位置"""
+    import json
+    headers = get_token(client)
+    lines = [json.dumps({"energy": float(i), "event_time": f"2026-02-09T12:{i:02d}:00"}) for i in range(5)]
+    lines.insert(3, '{"bogus": 1}')
+    resp = client.post('/api/v1/ingest/sos/stream?batch_size=2', data="\n".join(lines),
+                       headers=headers, content_type='application/x-ndjson')
+    data = resp.get_json()
+    assert resp.status_code == 400 and data['status'] == 'partial'
+    assert data['committed_rows'] == 2 and data['committed_chunks'] == 1 and data['resume_line'] == 3
+    assert MicroseismicEvent.query.count() == 2
+
+def test_interface_health_served_from_memory(client, app):
+    """接口状态由摄入路径更新，从内存返回"""
+    headers = get_token(client)
+    client.post('/api/v1/ingest/kj653', json={"records": [
+        {"station_no": 1, "support_no": 1, "p1": 25.0, "record_time": "2026-02-09T12:30:00"}
+    ]}, headers=headers)
+    client.post('/api/v1/ingest/kj653', json={"records": [{"bogus": 1}]}, headers=headers)
+
+    resp = client.get('/api/v1/interfaces/status', headers=headers)
+    status = resp.get_json()['KJ653_API']
+    assert status['status'] == 'Error'
+    assert status['calls'] == 2
+    assert status['success_rate'] == 50.0
+    assert status['last_success'] is not None
+    assert status['lag_seconds'] > 0
+
+    resp = client.get('/api/v1/interfaces/health', headers=headers)
+    kpi = resp.get_json()['sync_kpi']
+    assert kpi['target'] == 99.9
+    assert kpi['success_rate'] == 50.0
+    assert kpi['met'] is False
+
+def test_interface_health_rolling_window(app):
+    from datetime import timedelta
+    from app.services.interface_health import InterfaceHealthRegistry
+    registry = InterfaceHealthRegistry()
+    registry.init_app(app)
+    t0 = datetime(2026, 2, 9, 12, 0)
+    registry.record("KJ653_API", False, now=t0)
+    for i in range(10):
+        registry.record("KJ653_API", True, records=60, now=t0 + timedelta(minutes=61 + i))
+    status = registry.statuses(now=t0 + timedelta(minutes=70))['KJ653_API']
+    # 61 分钟前的失败已滑出窗口
+    assert status['success_rate'] == 100.0
+    assert status['records_per_min'] == 10.0
@@ -0,0 +1,68 @@
+import json
+from app.models import InterfaceLog
+from app.services.interface_log_sink import InterfaceLogSink, encode_payload, decode_payload
+
+def test_sink_buffers_until_threshold(app):
+    """日志先缓冲，达到数量阈值后一次批量写库"""
+    app.config['INTERFACE_LOG_FLUSH_SIZE'] = 3
+    app.config['INTERFACE_LOG_FLUSH_INTERVAL'] = 0
+    sink = InterfaceLogSink()
+    sink.init_app(app)
+
+    sink.emit("KJ653_API", "SUCCESS", "a")
+    sink.emit("KJ653_API", "SUCCESS", "b")
+    assert InterfaceLog.query.count() == 0
+    assert sink.pending() == 2
+
+    sink.emit("SOS_API", "SUCCESS", "c")
+    assert InterfaceLog.query.count() == 3
+    assert sink.pending() == 0
+
+def test_sink_shutdown_flushes(app):
+    app.config['INTERFACE_LOG_FLUSH_SIZE'] = 100
+    app.config['INTERFACE_LOG_FLUSH_INTERVAL'] = 0
+    sink = InterfaceLogSink()
+    sink.init_app(app)
+    sink.emit("KJ653_API", "ERROR", "boom", payload={"records": [1, 2]})
+    sink.shutdown()
+    log = InterfaceLog.query.one()
+    assert json.loads(log.payload) == {"records": [1, 2]}
+
+def test_flush_loop_starts_only_when_requested(app, monkeypatch):
+    """init_app 不启动定时刷新 (命令行进程)，由服务入口 start"""
+    from app.services import interface_log_sink as module
+    started = []
+    monkeypatch.setattr(module.socketio, 'start_background_task', lambda fn, *args: started.append(args))
+    app.config['INTERFACE_LOG_FLUSH_INTERVAL'] = 2.0
+    sink = InterfaceLogSink()
+    sink.init_app(app)
+    assert not started
+    assert sink.start() and len(started) == 1 and not sink.start()
+    sink.shutdown()
+    assert started[0][0].is_set()
+
+def test_large_payload_compressed_or_truncated():
+    """超长载荷压缩存储；压缩后仍超限则截断并附内容哈希"""
+    repetitive = {"records": [{"support_no": 1, "p1": 25.5}] * 2000}
+    text = encode_payload(repetitive, 4096)
+    assert len(text) <= 4096
+    assert json.loads(decode_payload(text)) == repetitive
+
+    import os
+    noisy = {"blob": os.urandom(20000).hex()}
+    text = encode_payload(noisy, 4096)
+    meta = json.loads(text)
+    assert meta['truncated'] is True
+    assert len(meta['sha256']) == 64
+    assert meta['size'] > 4096
+
+def test_truncated_payload_fits_small_limit():
+    """截断形式整体不超过 limit，转义较多的内容也不例外"""
+    import os
+    quoted = {"blob": '"\\\n' * 500 + os.urandom(200).hex()}
+    for limit in (150, 200, 300):
+        text = encode_payload(quoted, limit)
+        assert len(text) <= limit
+        meta = json.loads(text)
+        assert meta['truncated'] is True and json.dumps(quoted, ensure_ascii=False).startswith(meta['head'])
+    assert encode_payload(quoted, 40) is None
@@ -0,0 +1,44 @@
+import os
+import pandas as pd
+import pytest
+from app.services import parquet_cache
+from tests.test_history_loader import write_kj653_workbook
+
+pytest.importorskip("pyarrow")
+
+def kj653_rows(hours, p1=25.0):
+    return [[f'2025/04/24 {h:02d}:00:00', '1', '6', '上部', str(p1), '24.0', '--', '--', '--', '--', '90'] for h in hours]
+
+def test_cache_hit_and_invalidation(tmp_path):
+    """首次转换写缓存，再次读取命中；源文件内容变化后旧缓存失效"""
+    src = tmp_path / 'a.xlsx'
+    cache_dir = str(tmp_path / 'cache')
+    write_kj653_workbook(src, kj653_rows(range(4)))
+
+    entry, hit = parquet_cache.ensure_cached(str(src), 'kj653', cache_dir)
+    assert not hit and os.path.exists(entry)
+    assert parquet_cache.ensure_cached(str(src), 'kj653', cache_dir) == (entry, True)
+
+    write_kj653_workbook(src, kj653_rows(range(6), p1=30.0))
+    new_entry, hit = parquet_cache.ensure_cached(str(src), 'kj653', cache_dir)
+    assert not hit and new_entry != entry
+    assert not os.path.exists(entry)
+
+    df, _ = parquet_cache.read_workbook(str(src), 'kj653', cache_dir)
+    assert len(df) == 6
+    assert (df['p1'] == 30.0).all()
+    assert str(df['support_no'].dtype) == 'Int64'
+
+def test_projection_and_predicate_pushdown(tmp_path):
+    src = tmp_path / 'a.xlsx'
+    write_kj653_workbook(src, kj653_rows(range(10)))
+    filters = [('record_time', '>=', pd.Timestamp('2025-04-24 07:00'))]
+
+    cached, _ = parquet_cache.read_workbook(str(src), 'kj653', str(tmp_path / 'cache'),
+                                            columns=['record_time', 'p1'], filters=filters)
+    assert list(cached.columns) == ['record_time', 'p1']
+    assert len(cached) == 3
+
+    # 不使用缓存时结果一致
+    direct, _ = parquet_cache.read_workbook(str(src), 'kj653', None, columns=['record_time', 'p1'], filters=filters)
+    assert direct.reset_index(drop=True).equals(cached.reset_index(drop=True))
@@ -0,0 +1,41 @@
+from datetime import datetime
+from sqlalchemy.dialects import postgresql
+from app.services import partition_service
+
+def test_month_partition_names():
+    month = partition_service.month_start(datetime(2025, 11, 17, 8, 30))
+    assert month == datetime(2025, 11, 1)
+    assert partition_service.add_months(month, 2) == datetime(2026, 1, 1)
+    assert partition_service.partition_name('support_pressure_data', month) == 'support_pressure_data_p2025_11'
+
+def test_sqlite_fallback_is_unpartitioned(app, runner):
+    assert not partition_service.is_partitioned('support_pressure_data')
+    assert partition_service.ensure_partitions() == []
+    assert partition_service.explain_partition_pruning() == []
+    result = runner.invoke(args=['partitions'])
+    assert 'not partitioned' in result.output
+
+def test_pruning_checks_filter_on_partition_key(app):
+    """典型查询的时间条件须直接作用于分区键，PostgreSQL 才能在规划期裁剪分区"""
+    checks = partition_service.pruning_checks(datetime(2025, 4, 24))
+    assert {name for name, _, _ in checks} >= {'query_data:pressure', 'query_data:seismic',
+                                               'evaluation:pressure_window'}
+    for name, table, statement in checks:
+        sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+        column = partition_service.PARTITIONED_TABLES[table]
+        assert f"{table}.{column} >= '2025-04-" in sql or f"{table}.{column} > '2025-04-" in sql, name
+
+def test_maintainer_starts_only_when_requested(app, monkeypatch):
+    """命令行与测试不启动后台分区维护；服务入口显式启动且只启动一次"""
+    from app.services import partition_service
+    started = []
+    monkeypatch.setattr(partition_service.socketio, 'start_background_task', lambda fn: started.append(fn))
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://localhost/mine'
+    maintainer = partition_service.PartitionMaintainer()
+    maintainer.init_app(app)
+    assert not started and not maintainer.start()  # app.testing
+
+    app.testing = False
+    app.config['PARTITION_MAINTENANCE_ENABLED'] = True
+    maintainer.init_app(app)
+    assert len(started) == 1 and not maintainer.start()
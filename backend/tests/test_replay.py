@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+import pandas as pd
+import pytest
+from app import db
+from app.models import User, SupportPressureData, MicroseismicEvent
+from app.services import replay_service
+from tests.test_history_loader import write_kj653_workbook
+
+def write_sos_workbook(path, rows):
+    """按微震系统导出格式写一个工作簿：Data/CZAS 分列的日期与时刻"""
+    pd.DataFrame([['Data', 'CZAS', 'X', 'Y', 'Z', 'ENERGIA']] + rows).to_excel(path, header=False, index=False)
+
+@pytest.fixture
+def history_dir(tmp_path):
+    (tmp_path / '矿压').mkdir()
+    (tmp_path / '微震').mkdir()
+    write_kj653_workbook(tmp_path / '矿压' / 'a.xlsx', [
+        ['2025/04/24 00:00:00', '1', '1', '上部', '25.0', '24.0', '--', '--', '--', '--', '90'],
+        ['2025/04/24 00:00:00', '1', '2', '上部', '26.0', '24.0', '--', '--', '--', '--', '90'],
+        ['2025/04/24 02:00:00', '1', '1', '上部', '50.5', '24.0', '--', '--', '--', '--', '90'],
+        ['2025/04/24 02:00:00', '1', '2', '上部', '27.0', '24.0', '--', '--', '--', '--', '90'],
+    ])
+    write_sos_workbook(tmp_path / '微震' / 'b.xlsx', [
+        ['2025-04-24 00:00:00', '01:00:00', '5600.5', '10000.1', '800.2', '1200.5'],
+        ['2025-04-24 00:00:00', '03:00:00', '5610.5', '10010.1', '801.2', '300.0'],
+    ])
+    return tmp_path
+
+def test_load_timeline_orders_batches(app, history_dir):
+    timeline = replay_service.load_timeline(['kj653', 'sos'], str(history_dir))
+    assert [(b.time.hour, b.kind, len(b.records)) for b in timeline] == [
+        (0, 'kj653', 2), (1, 'sos', 1), (2, 'kj653', 2), (3, 'sos', 1)
+    ]
+    assert timeline[1].records[0] == {
+        'coord_x': 5600.5, 'coord_y': 10000.1, 'coord_z': 800.2, 'energy': 1200.5,
+        'event_time': '2025-04-24T01:00:00'
+    }
+    window = replay_service.load_timeline(['kj653'], str(history_dir), start='2025-04-24 01:00')
+    assert [b.time.hour for b in window] == [2]
+
+def test_replay_reports_throughput_and_alarm_latency(app, history_dir, monkeypatch):
+    user = User(username='replay', role='ADMIN')
+    user.set_password('pass')
+    db.session.add(user)
+    db.session.commit()
+    transport = replay_service.FlaskTransport(app, replay_service.issue_token('replay'))
+    timeline = replay_service.load_timeline(['kj653', 'sos'], str(history_dir))
+
+    delays = []
+    # 冻结回放计时：等待时长只取决于时间线，与请求耗时无关
+    monkeypatch.setattr(replay_service, 'time', SimpleNamespace(perf_counter=lambda: 0.0))
+    report = replay_service.replay(timeline, transport, speed=3600, echo=lambda _: None, sleep=delays.append)
+    # 按 3600 倍回放，后续批次相对首批的计划时刻为 1/2/3 秒 (替换的 sleep 不推进时钟)
+    assert delays == pytest.approx([1.0, 2.0, 3.0])
+    assert report['batches'] == 4 and report['rows'] == 6
+    assert report['errors'] == 0
+    assert SupportPressureData.query.count() == 4
+    assert MicroseismicEvent.query.count() == 2
+    # 50.5 MPa 超过默认红色阈值 45 MPa，其余数值均未超过黄色阈值
+    assert report['alarms'] == 1 and report['unmatched_alarms'] == 0
+    assert report['alarm_latency_ms']['max'] >= 0
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import MetricRollup, SupportPressureData, MicroseismicEvent
+from app.services import ingest_service, rollup_service, visualization_service
+
+T0 = datetime(2025, 4, 24, 23, 58)
+
+def pressure_columns(offsets, values):
+    times = [T0 + timedelta(minutes=m) for m in offsets]
+    return {
+        'record_time': times, 'station_no': [1] * len(times), 'support_no': [m % 2 + 1 for m in offsets],
+        'position': ['上部'] * len(times), 'p1': values
+    }
+
+def snapshot():
+    return sorted((r.resolution, r.scope, r.series_key, r.bucket_start, r.sample_count,
+                   round(r.value_sum, 6), r.value_min, r.value_max) for r in MetricRollup.query.all())
+
+def test_incremental_refresh_matches_backfill(app):
+    ingest_service.insert_columns(SupportPressureData, pressure_columns([0, 1, 2, 3], [20.0, 30.0, 25.0, 40.0]), 4)
+    # 跨天的第二批，含一条重复行 (自然键冲突，不应重复计数)
+    ingest_service.insert_columns(SupportPressureData, pressure_columns([3, 4, 61], [40.0, 10.0, 35.0]), 3)
+    db.session.commit()
+    incremental = snapshot()
+
+    face_days = [r for r in incremental if r[0] == '1d' and r[1] == 'face']
+    assert [(r[3].day, r[4], r[6], r[7]) for r in face_days] == [(24, 2, 20.0, 30.0), (25, 4, 10.0, 40.0)]
+    assert {r[2] for r in incremental if r[1] == 'support'} == {'1-1', '1-2'}
+
+    rollup_service.backfill('pressure', echo=lambda _: None)
+    db.session.commit()
+    assert snapshot() == incremental
+
+def test_refresh_reads_only_touched_buckets(app):
+    """乱序补录的记录只刷新其所在的桶，不重扫两批数据之间的整段时间"""
+    assert rollup_service.bucket_ranges([T0, T0 + timedelta(minutes=1), T0 + timedelta(minutes=5)], '1m') == \
+        [(T0, T0 + timedelta(minutes=2)), (T0 + timedelta(minutes=5), T0 + timedelta(minutes=6))]
+
+    # 中间时段的原始数据不经摄入钩子写入：若刷新覆盖 [最早, 最晚] 全段，会被计入聚合
+    app.config['ROLLUP_ON_INGEST'] = False
+    ingest_service.insert_columns(SupportPressureData, pressure_columns([600], [99.0]), 1)
+    app.config['ROLLUP_ON_INGEST'] = True
+    ingest_service.insert_columns(SupportPressureData, pressure_columns([-30 * 24 * 60, 0, 1200], [5.0, 6.0, 7.0]), 3)
+    db.session.commit()
+    minutes = [r for r in snapshot() if r[0] == '1m' and r[1] == 'face']
+    assert [(r[3], r[4]) for r in minutes] == [
+        (T0 - timedelta(days=30), 1), (T0, 1), (T0 + timedelta(minutes=1200), 1)]
+
+    rollup_service.backfill('pressure', echo=lambda _: None)
+    db.session.commit()
+    assert len([r for r in snapshot() if r[0] == '1m' and r[1] == 'face']) == 4
+
+def test_trend_reads_rollups(app):
+    ingest_service.insert_columns(SupportPressureData, pressure_columns([0, 1, 120], [20.0, 30.0, 40.0]), 3)
+    ingest_service.insert_columns(MicroseismicEvent, {
+        'event_time': [T0, T0 + timedelta(minutes=5), T0 + timedelta(hours=2)],
+        'coord_x': [1.0, 2.0, 3.0], 'coord_y': [1.0, 2.0, 3.0], 'coord_z': [1.0, 2.0, 3.0],
+        'energy': [100.0, 200.0, 300.0]
+    }, 3)
+    db.session.commit()
+
+    assert rollup_service.choose_resolution(timedelta(hours=24), 24) == '1h'
+    assert rollup_service.choose_resolution(timedelta(days=30), 24) == '1d'
+    assert rollup_service.choose_resolution(timedelta(minutes=30), 24) == '1m'
+
+    pressure = visualization_service.get_pressure_trend_data('24h')
+    assert [p['y'] for p in pressure] == [25.0, 40.0]
+    frequency = visualization_service.get_microseismic_frequency_data('24h')
+    assert len(frequency) == 24 and sum(p['y'] for p in frequency) == 3
+    assert [p['y'] for p in frequency[-3:]] == [1, 1, 1] and frequency[-1]['x'] == '01:00'
@@ -0,0 +1,54 @@
+from datetime import datetime
+import numpy as np
+import pytest
+from app import db
+from app.models import WorkingFace, DrillingSite, Borehole, BoreholeTrajectory, FractureConstructionData, FractureSegment
+from app.services import segment_service
+
+def test_interpolate_positions_between_survey_points():
+    md = np.array([0.0, 10.0, 10.0, 30.0])
+    coords = np.array([[0.0, 0.0, 0.0], [10.0, 0.0, 0.0], [10.0, 0.0, 0.0], [10.0, 20.0, -4.0]])
+    points = segment_service.interpolate_positions([-5.0, 5.0, 10.0, 20.0, 99.0], md, coords)
+    assert np.allclose(points, [[0, 0, 0], [5, 0, 0], [10, 0, 0], [10, 10, -2], [10, 20, -4]])
+    assert np.allclose(segment_service.interpolate_positions([3.0], md[:1], coords[:1]), [[0, 0, 0]])
+
+@pytest.fixture
+def drilled(app):
+    """工作面下两个钻场各一个钻孔：沿 E 方向直线 0-300 m，每 10 m 一个测点"""
+    face = WorkingFace(name='8101')
+    db.session.add(face)
+    db.session.flush()
+    holes = []
+    for name in ('1#', '2#'):
+        site = DrillingSite(name=name, working_face_id=face.id)
+        db.session.add(site)
+        db.session.flush()
+        hole = Borehole(drilling_site_id=site.id, borehole_no=f'{name}-1', segments=6)
+        db.session.add(hole)
+        db.session.flush()
+        for i in range(31):
+            db.session.add(BoreholeTrajectory(borehole_id=hole.id, measured_depth=10.0 * i,
+                                              coord_e=1000.0 + 10.0 * i, coord_n=500.0, coord_z=-300.0))
+        for seg in (1, 2, 3):
+            for p in (10.0, 20.0 + seg):
+                db.session.add(FractureConstructionData(record_time=datetime(2025, 5, 1, seg), borehole_id=hole.id,
+                                                        segment_no=seg, pressure=p, flow_rate=2.0, total_volume=50.0 * seg))
+        holes.append(hole)
+    # 第一个钻孔的第 2 段登记了实际起止深度
+    db.session.add(FractureSegment(borehole_id=holes[0].id, segment_no=2, start_depth=123.0, end_depth=137.0))
+    db.session.commit()
+    return face, holes
+
+def test_segment_geometry_for_working_face(drilled):
+    face, holes = drilled
+    result = segment_service.get_segment_geometry(working_face_id=face.id)
+    assert [r['borehole_id'] for r in result] == [h.id for h in holes]
+    first = {s['segment_no']: s for s in result[0]['segments']}
+    # 未登记的段按计划段数 6 等分 0-300 m
+    assert (first[1]['start_depth'], first[1]['end_depth']) == (0.0, 50.0)
+    assert first[1]['position'] == {'x': 1025.0, 'y': -300.0, 'z': -500.0}
+    assert first[2]['position']['x'] == pytest.approx(1130.0) and first[2]['start']['x'] == pytest.approx(1123.0)
+    assert first[3]['pressure'] == 23.0 and first[3]['total_volume'] == 150.0
+
+    site_only = segment_service.get_segment_geometry(site_id=holes[1].drilling_site_id)
+    assert len(site_only) == 1 and site_only[0]['segments'][1]['position']['x'] == pytest.approx(1075.0)
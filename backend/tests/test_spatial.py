@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from app import db
+from app.models import DrillingSite, Borehole, BoreholeTrajectory, MicroseismicEvent, User
+from app.services import ingest_service, spatial_service, lod_service, visualization_service
+
+N = 2000
+
+@pytest.fixture
+def events(app):
+    """在 1000 m x 1000 m x 200 m 范围内随机分布的事件 (含负坐标，跨越网格原点)"""
+    rng = np.random.default_rng(7)
+    coords = rng.uniform([-500, -500, -100], [500, 500, 100], size=(N, 3))
+    start = datetime(2025, 5, 1)
+    ingest_service.insert_columns(MicroseismicEvent, {
+        'event_time': [start + timedelta(minutes=i) for i in range(N)],
+        'coord_x': coords[:, 0].tolist(), 'coord_y': coords[:, 1].tolist(), 'coord_z': coords[:, 2].tolist(),
+        'energy': rng.uniform(100, 5000, N).tolist()
+    }, N)
+    db.session.commit()
+    return coords
+
+def test_batch_without_coordinates_keeps_all_rows(app):
+    stats = ingest_service.bulk_insert(MicroseismicEvent, [
+        {'event_time': '2026-02-09T12:00:00', 'energy': 1.0}, {'event_time': '2026-02-09T12:01:00', 'energy': 2.0}])
+    db.session.commit()
+    assert stats['inserted'] == 2
+    assert [e.energy for e in MicroseismicEvent.query.order_by(MicroseismicEvent.event_time)] == [1.0, 2.0]
+
+def _ids(events):
+    return sorted(e.id for e in events)
+
+def _brute(coords, mask):
+    # 自增 id 与写入顺序一致
+    return sorted((np.flatnonzero(mask) + 1).tolist())
+
+def test_grid_cell_maintained_on_ingest_and_orm(events, app):
+    assert MicroseismicEvent.query.filter(MicroseismicEvent.grid_cell.is_(None)).count() == 0
+    event = MicroseismicEvent(event_time=datetime(2025, 6, 1), coord_x=-0.5, coord_y=149.9, coord_z=0, energy=1)
+    db.session.add(event)
+    db.session.commit()
+    assert event.grid_cell == MicroseismicEvent.cell_id(-1, 2)
+
+def test_box_and_radius_match_brute_force(events):
+    coords = events
+    box = (-120.0, 30.0, -50.0, 180.0, 260.0, 60.0)
+    found = spatial_service.events_in_box(box, limit=N)
+    inside = np.all((coords >= box[:3]) & (coords <= box[3:]), axis=1)
+    assert _ids(found) == _brute(coords, inside)
+
+    center, radius = (40.0, -60.0, 10.0), 150.0
+    near = spatial_service.events_near_point(center, radius, limit=N)
+    distance = np.linalg.norm(coords - center, axis=1)
+    assert _ids(e for e, _ in near) == _brute(coords, distance <= radius)
+    assert [d for _, d in near] == sorted(d for _, d in near)
+
+    # 时间过滤与数量限制
+    late = spatial_service.events_in_box(box, start=datetime(2025, 5, 1) + timedelta(minutes=N // 2), limit=5)
+    assert len(late) == 5 and all(e.id > N // 2 for e in late)
+
+def test_distance_to_trajectory(events, app, monkeypatch):
+    site = DrillingSite(name='1# 钻场')
+    db.session.add(site)
+    db.session.flush()
+    hole = Borehole(drilling_site_id=site.id, borehole_no='ZK-1')
+    db.session.add(hole)
+    db.session.flush()
+    vertices = [(-300.0, -300.0, 0.0), (0.0, 0.0, -20.0), (300.0, 100.0, -40.0)]
+    depths = [0.0, 425.0, 742.0]
+    for md, (e, n, z) in zip(depths, vertices):
+        db.session.add(BoreholeTrajectory(borehole_id=hole.id, measured_depth=md, coord_e=e, coord_n=n, coord_z=z))
+    db.session.commit()
+
+    found = spatial_service.events_near_trajectory(hole.id, 40.0, limit=N)
+    distance, _ = spatial_service.distance_to_polyline(events, np.array(vertices), np.array(depths))
+    assert _ids(e for e, _, _ in found) == _brute(events, distance <= 40.0)
+    assert all(d <= 40.0 and 0.0 <= md <= 742.0 for _, d, md in found)
+
+    # 分批读取候选，只保留最近的 limit 条
+    monkeypatch.setattr(spatial_service, 'CANDIDATE_CHUNK', 50)
+    nearest = spatial_service.events_near_trajectory(hole.id, 40.0, limit=10)
+    assert [e.id for e, _, _ in nearest] == [e.id for e, _, _ in found[:10]]
+    assert [d for _, d, _ in nearest] == pytest.approx(sorted(distance[distance <= 40.0])[:10])
+
+def test_microseismic_points_endpoint(events, client, app):
+    user = User(username='spatial_user')
+    user.set_password('pass')
+    db.session.add(user)
+    db.session.commit()
+    token = client.post('/api/v1/auth/login', json={'username': 'spatial_user', 'password': 'pass'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    assert len(client.get('/api/v1/visualization/microseismic-points', headers=headers).get_json()) == 200
+    resp = client.get('/api/v1/visualization/microseismic-points?center=0,0,0&radius=80&limit=10', headers=headers)
+    points = resp.get_json()
+    assert resp.status_code == 200 and 0 < len(points) <= 10 and all(p['distance'] <= 80 for p in points)
+    resp = client.get('/api/v1/visualization/microseismic-points?bbox=0,0,100,100&min_energy=2500', headers=headers)
+    assert resp.status_code == 200 and all(p['energy'] >= 2500 and 0 <= p['x'] <= 100 for p in resp.get_json())
+    assert client.get('/api/v1/visualization/microseismic-points?bbox=1,2,3', headers=headers).status_code == 400
+
+def test_voxel_aggregate_matches_loop():
+    rng = np.random.default_rng(3)
+    coords = rng.uniform(-95, 95, size=(5000, 3))
+    energy = rng.uniform(0, 10, 5000)
+    energy[:10] = np.nan
+    result = lod_service.voxel_aggregate(coords, energy, 20.0)
+    expected = {}
+    for point, e in zip(coords, energy):
+        key = tuple(int(v) for v in np.floor(point / 20.0))
+        count, total, peak = expected.get(key, (0, 0.0, np.nan))
+        expected[key] = (count + 1, total + np.nan_to_num(e), np.fmax(peak, e))
+    assert len(result["count"]) == len(expected) and result["count"].sum() == 5000
+    for index, count, total, peak in zip(result["index"], result["count"], result["energy_sum"], result["energy_max"]):
+        exp = expected[tuple(index.tolist())]
+        assert count == exp[0] and total == pytest.approx(exp[1]) and peak == exp[2]
+    assert np.allclose(result["center"], (result["index"] + 0.5) * 20.0)
+
+def test_microseismic_lod_switches_and_caches(events, app):
+    lod_service.clear_cache()
+    app.config['LOD_POINT_THRESHOLD'] = 100
+    small = visualization_service.get_microseismic_lod({'lod': 'auto', 'bbox': '0,0,60,60'})
+    assert small['mode'] == 'points' and len(small['points']) == small['total'] <= 100
+
+    full = visualization_service.get_microseismic_lod({'lod': 'auto'})
+    assert full['mode'] == 'voxels' and full['total'] == N and not full['cached']
+    assert full['voxel_size'] == 20.0  # 1000 m / 64 向上取整
+    assert sum(v['count'] for v in full['voxels']) == N
+    assert visualization_service.get_microseismic_lod({'lod': 'auto'})['cached']
+
+    # 新事件写入后缓存失效
+    db.session.add(MicroseismicEvent(event_time=datetime(2025, 7, 1), coord_x=1, coord_y=1, coord_z=1, energy=1))
+    db.session.commit()
+    again = visualization_service.get_microseismic_lod({'lod': 'auto'})
+    assert not again['cached'] and again['total'] == N + 1
+
+    coarse = visualization_service.get_microseismic_lod({'lod': 'voxels', 'voxel_size': '250'})
+    assert coarse['voxel_size'] == 250.0 and len(coarse['voxels']) <= 4 * 4 * 2
+    with pytest.raises(ValueError):
+        lod_service.microseismic_lod({'lod': 'voxels', 'center': '0,0,0', 'radius': '5'})
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from app import db
+from app.models import DrillingSite, Borehole, BoreholeTrajectory, User
+from app.services import trajectory_service
+
+def test_minimum_curvature_matches_circular_arc():
+    """恒定造斜率的圆弧：最小曲率法精确"""
+    radius = 300.0
+    md = np.arange(1, 31) * 10.0
+    dip = np.degrees(md / radius)  # 自水平起向上造斜，方位正东
+    offsets = trajectory_service.minimum_curvature(md, dip, np.full_like(md, 90.0))
+    # 孔口至首测点按首测点方向直线延伸，之后为圆弧
+    theta0, theta = md[0] / radius, md / radius
+    head = md[0] * np.array([np.cos(theta0), np.sin(theta0)])
+    east = head[0] + radius * (np.sin(theta) - np.sin(theta0))
+    up = head[1] + radius * (np.cos(theta0) - np.cos(theta))
+    assert np.allclose(offsets[:, 0], east) and np.allclose(offsets[:, 2], up)
+    assert np.allclose(offsets[:, 1], 0.0)
+
+def test_minimum_curvature_groups_are_independent():
+    md = np.array([5.0, 10.0, 20.0, 4.0, 8.0])
+    dip = np.array([0.0, 0.0, 0.0, -90.0, -90.0])
+    azimuth = np.array([0.0, 0.0, 0.0, 0.0, 0.0])
+    offsets = trajectory_service.minimum_curvature(md, dip, azimuth, group=np.array([1, 1, 1, 2, 2]))
+    assert np.allclose(offsets, [(0, 5, 0), (0, 10, 0), (0, 20, 0), (0, 0, -4), (0, 0, -8)])
+
+def test_compute_trajectories_persists_from_site_collar(app, client):
+    site = DrillingSite(name='1# 钻场', coord_e=1000.0, coord_n=2000.0, coord_z=-500.0)
+    db.session.add(site)
+    db.session.flush()
+    flat, up = (Borehole(drilling_site_id=site.id, borehole_no=no) for no in ('ZK-1', 'ZK-2'))
+    db.session.add_all([flat, up])
+    db.session.flush()
+    for i in range(1, 4):
+        db.session.add(BoreholeTrajectory(borehole_id=flat.id, measured_depth=10.0 * i, dip_angle=0.0, grid_azimuth=90.0))
+        db.session.add(BoreholeTrajectory(borehole_id=up.id, measured_depth=5.0 * i, dip_angle=90.0, grid_azimuth=0.0))
+    # 缺少测斜数据的测点保持不变
+    db.session.add(BoreholeTrajectory(borehole_id=up.id, measured_depth=20.0, coord_e=1.0, coord_n=1.0, coord_z=1.0))
+    db.session.commit()
+
+    stats = trajectory_service.compute_trajectories(site_id=site.id)
+    db.session.commit()
+    assert stats['boreholes'] == 2 and stats['stations'] == 6
+    rows = {(r.borehole_id, r.measured_depth): (r.coord_e, r.coord_n, r.coord_z) for r in BoreholeTrajectory.query}
+    assert rows[(flat.id, 30.0)] == pytest.approx((1030.0, 2000.0, -500.0))
+    assert rows[(up.id, 15.0)] == pytest.approx((1000.0, 2000.0, -485.0))
+    assert rows[(up.id, 20.0)] == (1.0, 1.0, 1.0)
+
+    user = User(username='trajectory_admin', role='ADMIN')
+    user.set_password('pass')
+    db.session.add(user)
+    db.session.commit()
+    token = client.post('/api/v1/auth/login', json={'username': 'trajectory_admin', 'password': 'pass'}).get_json()['token']
+    resp = client.post('/api/v1/processing/trajectories', json={'borehole_ids': [flat.id]},
+                       headers={'Authorization': f'Bearer {token}'})
+    assert resp.status_code == 200 and resp.get_json()['stations'] == 3
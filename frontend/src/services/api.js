@@ -51,20 +51,31 @@ const api = {
   getDrillingDesign() {
     return apiClient.get('/visualize/drilling_design');
   },
+  // 二进制轨迹 (浏览器自动解压 gzip)，用 three-utils 的 decodeSceneBuffer 解析
+  getDrillingDesignBinary() {
+    return apiClient.get('/visualize/drilling_design', { params: { format: 'binary' }, responseType: 'arraybuffer' });
+  },
   getBoreholeFractureData(boreholeId) {
     return apiClient.get(`/visualization/fracture-data/${boreholeId}`);
   },
-  getMicroseismicPoints() {
-    return apiClient.get('/visualization/microseismic-points');
+  // 钻场 / 工作面下全部钻孔的压裂段位置 (params: { site_id } 或 { working_face_id })
+  getFractureSegments(params) {
+    return apiClient.get('/visualization/fracture-segments', { params });
+  },
+  getTrajectoryDeviation(params) {
+    return apiClient.get('/visualization/trajectory-deviation', { params });
   },
-  getPressureTrendData(range) {
-    return apiClient.get('/trends/pressure', { params: { range } });
+  getMicroseismicPoints(params) {
+    return apiClient.get('/visualization/microseismic-points', { params });
+  },
+  getPressureTrendData(range, maxPoints) {
+    return apiClient.get('/trends/pressure', { params: { range, max_points: maxPoints } });
   },
   getMicroseismicFrequency(range) {
     return apiClient.get('/trends/microseismic_frequency', { params: { range } });
   },
-  getDeformationTrend(range) {
-    return apiClient.get('/trends/deformation', { params: { range } });
+  getDeformationTrend(range, maxPoints) {
+    return apiClient.get('/trends/deformation', { params: { range, max_points: maxPoints } });
   },
 
   // 5.4 压裂效果评价模块
@@ -85,6 +96,9 @@ const api = {
   queryData(params) {
     return apiClient.post('/query', params);
   },
+  exportQuery(params, format) {
+    return apiClient.post('/query/export', params, { params: { format }, responseType: 'blob' });
+  },
 
   // Data Management
   getManageableTables() {
@@ -1,11 +1,36 @@
 import * as THREE from 'three';
 
+const SCENE_MAGIC = 'MVSB';
+
+/**
+ * 解析 /visualize/drilling_design?format=binary 的响应 (布局见后端 scene_binary)
+ * 返回 JSON 头，头中 buffers 替换为指向原 ArrayBuffer 的 Float32Array 视图 (不复制、不逐点解析)
+ */
+export const decodeSceneBuffer = (arrayBuffer) => {
+  const view = new DataView(arrayBuffer);
+  const magic = String.fromCharCode(...new Uint8Array(arrayBuffer, 0, 4));
+  if (magic !== SCENE_MAGIC) throw new Error('Unsupported scene buffer');
+  const headerLength = view.getUint32(8, true);
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(arrayBuffer, 12, headerLength)));
+  const bodyStart = 12 + headerLength;
+  header.buffers = header.buffers.map(b => new Float32Array(arrayBuffer, bodyStart + b.offset, b.count));
+  return header;
+};
+
 /**
- * 将轨迹点数组转换为管状 3D 钻孔 (实钻态 - 96mm)
+ * 将轨迹点转换为管状 3D 钻孔 (实钻态 - 96mm)
+ * points 为 {x, y, z} 数组，或按 xyz 交错排列的 Float32Array (二进制轨迹)
  */
 export const createTrajectoryLine = (points, color = 0x3b82f6) => {
-  if (points.length < 2) return new THREE.Group();
-  const curvePoints = points.map(p => new THREE.Vector3(p.x, p.y, p.z));
+  const curvePoints = [];
+  if (points instanceof Float32Array) {
+    for (let i = 0; i + 2 < points.length; i += 3) {
+      curvePoints.push(new THREE.Vector3(points[i], points[i + 1], points[i + 2]));
+    }
+  } else {
+    points.forEach(p => curvePoints.push(new THREE.Vector3(p.x, p.y, p.z)));
+  }
+  if (curvePoints.length < 2) return new THREE.Group();
   const curve = new THREE.CatmullRomCurve3(curvePoints);
   
   // 半径 0.048m = 48mm, 直径 96mm
@@ -49,6 +74,37 @@ export const createDesignTrajectory = (start, length, azimuth, dip, color = 0x94
   return line;
 };
 
+/**
+ * 轨迹偏差 -> 逐点颜色 (Float32Array，rgb 交错)
+ * 0 为绿色，达到精度要求 tolerance 时为黄色，2 倍及以上为红色；无偏差数据 (null) 的测点为灰色
+ */
+export const deviationColors = (values, tolerance = 0.5) => {
+  const colors = new Float32Array(values.length * 3);
+  const color = new THREE.Color();
+  values.forEach((v, i) => {
+    if (v === null || v === undefined) {
+      color.set(0x64748b);
+    } else {
+      // 色相 120° (绿) -> 60° (黄) -> 0° (红)
+      const t = Math.min(v / (2 * tolerance), 1);
+      color.setHSL((1 - t) / 3, 0.9, 0.5);
+    }
+    colors.set([color.r, color.g, color.b], i * 3);
+  });
+  return colors;
+};
+
+/**
+ * 按偏差着色的实钻轨迹线 (对应 /visualization/trajectory-deviation)
+ * positions 为二进制场景中该钻孔的位置缓冲区，deviation 数组与其测点一一对应
+ */
+export const createDeviationLine = (positions, deviation, tolerance = 0.5) => {
+  const geometry = new THREE.BufferGeometry();
+  geometry.setAttribute('position', new THREE.BufferAttribute(positions, 3));
+  geometry.setAttribute('color', new THREE.BufferAttribute(deviationColors(deviation, tolerance), 3));
+  return new THREE.Line(geometry, new THREE.LineBasicMaterial({ vertexColors: true }));
+};
+
 /**
  * 创建巷道骨架
  */
@@ -171,4 +227,39 @@ export const createFractureSphere = (position, radius = 5, color = 0x22c55e) =>
 
   group.position.set(position.x, position.y, position.z);
   return group;
-};
\ No newline at end of file
+};
+/**
+ * 创建微震点云 (对应 /visualization/microseismic-points?lod=...)
+ * points 模式：所有事件合并为一个 THREE.Points；voxels 模式：每个体素一个球体实例，半径随事件数增大
+ */
+export const createMicroseismicCloud = (result, offset, color = 0xf59e0b) => {
+  if (result.mode === 'voxels') {
+    const voxels = result.voxels;
+    const geometry = new THREE.SphereGeometry(0.5, 12, 12);
+    const material = new THREE.MeshPhongMaterial({ color, transparent: true, opacity: 0.6 });
+    const mesh = new THREE.InstancedMesh(geometry, material, voxels.length);
+    const maxCount = Math.max(1, ...voxels.map(v => v.count));
+    const matrix = new THREE.Matrix4();
+    voxels.forEach((v, i) => {
+      const scale = result.voxel_size * (0.3 + 0.7 * Math.cbrt(v.count / maxCount));
+      matrix.makeScale(scale, scale, scale);
+      matrix.setPosition(v.x - offset.x, v.y - offset.y, v.z - offset.z);
+      mesh.setMatrixAt(i, matrix);
+    });
+    mesh.userData = { type: 'microseismic', mode: 'voxels', voxels };
+    return mesh;
+  }
+
+  const points = result.points || result;
+  const positions = new Float32Array(points.length * 3);
+  points.forEach((p, i) => {
+    positions[i * 3] = p.x - offset.x;
+    positions[i * 3 + 1] = p.y - offset.y;
+    positions[i * 3 + 2] = p.z - offset.z;
+  });
+  const geometry = new THREE.BufferGeometry();
+  geometry.setAttribute('position', new THREE.BufferAttribute(positions, 3));
+  const cloud = new THREE.Points(geometry, new THREE.PointsMaterial({ color, size: 2, sizeAttenuation: true }));
+  cloud.userData = { type: 'microseismic', mode: 'points', points };
+  return cloud;
+};